@@ -0,0 +1,33 @@
+import argparse
+from datetime import datetime, timedelta
+from controllers.backfillcontroller import BackfillController
+
+
+def parse_args(argv=None):
+    default_end = datetime.now().strftime('%Y-%m-%d')
+    default_start = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
+
+    parser = argparse.ArgumentParser(
+        description='Предзагрузка истории курсов ЦБ в таблицу currency_history'
+    )
+    parser.add_argument('--start', default=default_start, help='Первая дата (YYYY-MM-DD)')
+    parser.add_argument('--end', default=default_end, help='Последняя дата (YYYY-MM-DD)')
+    parser.add_argument('--db', default='currencies.db', help='Путь к базе данных')
+    parser.add_argument('--workers', type=int, default=8, help='Число параллельных запросов')
+    parser.add_argument('--batch-size', type=int, default=30, help='Дат в одной транзакции')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Загрузить заново даты, отмеченные как загруженные')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    controller = BackfillController(args.db, max_workers=args.workers, batch_size=args.batch_size)
+
+    print(f"Загрузка истории курсов с {args.start} по {args.end}")
+    stats = controller.backfill(args.start, args.end, resume=not args.no_resume)
+    return 1 if stats['failed_dates'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
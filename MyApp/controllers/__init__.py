@@ -2,3 +2,4 @@ from .databasecontroller import DatabaseController
 from .currencycontroller import CurrencyController
 from .usercontroller import UserController
 from .pages import PagesController
+from .backfillcontroller import BackfillController
@@ -0,0 +1,143 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from models.currency_parser import CurrencyParser
+from controllers.databasecontroller import DatabaseController
+import tracing
+
+
+class BackfillController:
+    STATUS_LOADED = 'loaded'
+    STATUS_EMPTY = 'empty'
+
+    def __init__(self, db_path: str = 'currencies.db', max_workers: int = 8, batch_size: int = 30,
+                 parser: CurrencyParser = None, db: DatabaseController = None):
+        self.parser = parser if parser is not None else CurrencyParser()
+        self.db = db if db is not None else DatabaseController(db_path)
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+    @staticmethod
+    def date_range(start_date: str, end_date: str):
+        """Список дат YYYY-MM-DD от start_date до end_date включительно"""
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        if end < start:
+            raise ValueError('Дата окончания раньше даты начала')
+
+        return [(start + timedelta(days=i)).strftime('%Y-%m-%d')
+                for i in range((end - start).days + 1)]
+
+    def backfill(self, start_date: str, end_date: str, resume: bool = True, verbose: bool = True):
+        """Загрузить архив курсов всех валют за диапазон дат.
+
+        При resume=True уже загруженные даты пропускаются, поэтому прерванную
+        загрузку можно перезапустить. Возвращает словарь со статистикой.
+        """
+        dates = self.date_range(start_date, end_date)
+        done = self.db.get_synced_dates(start_date, end_date) if resume else {}
+        pending = [date for date in dates if date not in done]
+
+        stats = self.load_dates(pending, verbose=verbose)
+        stats['total_dates'] = len(dates)
+        stats['skipped_dates'] = len(dates) - len(pending)
+
+        if verbose:
+            self._print_summary(stats)
+        return stats
+
+    @tracing.traced()
+    def load_dates(self, dates: list, verbose: bool = False):
+        """Загрузить архивы за указанные даты.
+
+        Архивы запрашиваются параллельно, результаты пишутся пачками по batch_size дат
+        в одной транзакции вместе с отметкой в history_sync. Дата без публикации
+        отмечается как пустая, только если она уже прошла: архив за сегодня может
+        появиться позже.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        stats = {
+            'total_dates': len(dates),
+            'skipped_dates': 0,
+            'loaded_dates': 0,
+            'empty_dates': 0,
+            'failed_dates': [],
+            'rows': 0,
+            'elapsed': 0.0,
+            'interrupted': False,
+        }
+        if not dates:
+            return stats
+
+        started = time.perf_counter()
+        rows, synced = [], {}
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(dates)))
+
+        try:
+            futures = {tracing.submit(executor, self.parser.get_archive_rates, date): date
+                       for date in dates}
+
+            for future in as_completed(futures):
+                date = futures[future]
+                try:
+                    rates = future.result()
+                except Exception as e:
+                    print(f"Ошибка загрузки архива за {date}: {e}")
+                    stats['failed_dates'].append(date)
+                    continue
+
+                if rates is None:
+                    if date < today:
+                        synced[date] = self.STATUS_EMPTY
+                    stats['empty_dates'] += 1
+                else:
+                    rates['RUB'] = 1.0
+                    rows.extend((code, date, value) for code, value in rates.items())
+                    synced[date] = self.STATUS_LOADED
+                    stats['loaded_dates'] += 1
+
+                if len(synced) >= self.batch_size:
+                    stats['rows'] += self._flush(rows, synced)
+                    rows, synced = [], {}
+                    if verbose:
+                        self._print_progress(stats, time.perf_counter() - started)
+        except KeyboardInterrupt:
+            stats['interrupted'] = True
+            executor.shutdown(wait=False, cancel_futures=True)
+        finally:
+            stats['rows'] += self._flush(rows, synced)
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        stats['elapsed'] = time.perf_counter() - started
+        return stats
+
+    def _flush(self, rows: list, synced: dict):
+        """Записать накопленную пачку и вернуть число сохраненных строк"""
+        if not synced:
+            return 0
+        self.db.save_currency_history_batch(rows, synced)
+        return len(rows)
+
+    @staticmethod
+    def _print_progress(stats: dict, elapsed: float):
+        processed = stats['loaded_dates'] + stats['empty_dates']
+        pending = stats['total_dates']
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"  {processed}/{pending} дат, {stats['rows']} записей, {rate:.1f} дат/с")
+
+    @staticmethod
+    def _print_summary(stats: dict):
+        processed = stats['loaded_dates'] + stats['empty_dates']
+        elapsed = stats['elapsed']
+        dates_per_sec = processed / elapsed if elapsed > 0 else 0.0
+        rows_per_sec = stats['rows'] / elapsed if elapsed > 0 else 0.0
+
+        print("-" * 50)
+        if stats['interrupted']:
+            print("Загрузка прервана, повторный запуск продолжит с места остановки")
+        print(f"Всего дат: {stats['total_dates']}, пропущено (уже загружены): {stats['skipped_dates']}")
+        print(f"Загружено: {stats['loaded_dates']}, без публикации: {stats['empty_dates']}, "
+              f"ошибок: {len(stats['failed_dates'])}")
+        print(f"Записей: {stats['rows']} за {elapsed:.2f} сек "
+              f"({dates_per_sec:.1f} дат/с, {rows_per_sec:.0f} записей/с)")
+        print("-" * 50)
@@ -1,10 +1,17 @@
 from models.currency_parser import CurrencyParser
-from models.currency import CurenciesList
+from models.currency import CurrenciesList
 from controllers.databasecontroller import DatabaseController
+from controllers.backfillcontroller import BackfillController
+from datetime import datetime, timedelta
 import json
+import metrics
+import tracing
 
 
 class CurrencyController:
+    # Сколько архивных дат можно загрузить синхронно при одном запросе истории
+    MAX_SYNC_FETCHES = 7
+
     def __init__(self):
         self.parser = CurrencyParser()
         self.db = DatabaseController()
@@ -12,23 +19,57 @@ class CurrencyController:
         self._currencies_cache = {}
         self._available_cache = None
 
+    @tracing.traced()
     def get_current_rates(self):
         """Получить текущие курсы выбранных валют"""
         try:
             currencies = self.parser.get_currencies(self.selected_currencies)
             self._currencies_cache = currencies
-
-            for code, currency in currencies.items():
-                self.db.save_currency_history(code, currency.price)
-
-            return currencies
         except Exception as e:
             print(f"Ошибка получения курсов: {e}")
             return self._currencies_cache if self._currencies_cache else {}
 
+        # Ошибка записи в базу не должна отменять только что полученные курсы
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+            self.db.save_currency_history_batch(
+                [(code, today, currency.price) for code, currency in currencies.items()]
+            )
+        except Exception as e:
+            print(f"Ошибка сохранения курсов: {e}")
+
+        return currencies
+
+    @tracing.traced()
+    def get_rates_for(self, currency_codes: list):
+        """Получить курсы для набора валют (например, подписок пользователя).
+
+        Все валюты берутся из одного снимка текущих курсов, а отсутствующие в нем
+        запрашиваются одним общим запросом, а не по одной
+        """
+        codes = list(dict.fromkeys(currency_codes))
+        if not codes:
+            return {}
+
+        snapshot = self.get_current_rates()
+        rates = {code: snapshot[code] for code in codes if code in snapshot}
+
+        missing = [code for code in codes if code not in rates]
+        if missing:
+            try:
+                rates.update(self.parser.get_currencies(missing))
+            except Exception as e:
+                print(f"Ошибка получения курсов {missing}: {e}")
+
+        return {code: rates[code] for code in codes if code in rates}
+
+    @tracing.traced()
     def get_available_currencies(self):
         """Получить список всех доступных валют"""
-        if self._available_cache is None:
+        if self._available_cache is not None:
+            metrics.cache_hit('controller_available')
+        else:
+            metrics.cache_miss('controller_available')
             try:
                 self._available_cache = self.parser.get_all_available_currencies()
             except:
@@ -53,24 +94,58 @@ class CurrencyController:
         """Обновить список отслеживаемых валют"""
         self.selected_currencies = currencies_list
 
+    @tracing.traced()
     def get_currency_history(self, currency_code: str, days: int = 90):
-        """Получить историю курса валюты"""
-        db_history = self.db.get_currency_history(currency_code, days)
+        """Получить историю курса валюты за последние days дней.
+
+        Из архива ЦБ запрашиваются только прошедшие даты, которых нет в currency_history
+        и которые не отмечены в history_sync (выходные и праздники запоминаются как пустые дни).
+        Сегодняшний курс сохраняет get_current_rates, поэтому сегодня пропуском не считается.
+        За один запрос загружается не больше MAX_SYNC_FETCHES самых свежих дат, остальные
+        догружаются следующими запросами или командой backfill.py
+        """
+        today = datetime.now()
+        start_date = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        end_date = today.strftime('%Y-%m-%d')
+        yesterday = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+
+        db_history = self.db.get_currency_history_range(currency_code, start_date, end_date)
+        missing = self._find_history_gaps(db_history, start_date, yesterday) if days > 1 else []
+
+        if not missing:
+            metrics.cache_hit('history')
+            return db_history or self._fallback_history(currency_code, days)
+
+        metrics.cache_miss('history')
+        try:
+            recent = sorted(missing, reverse=True)[:self.MAX_SYNC_FETCHES]
+            loader = BackfillController(parser=self.parser, db=self.db, max_workers=4)
+            stats = loader.load_dates(recent)
+            if stats['loaded_dates'] > 0:
+                db_history = self.db.get_currency_history_range(currency_code, start_date, end_date)
+        except Exception as e:
+            print(f"Ошибка получения истории для {currency_code}: {e}")
 
-        if len(db_history) >= days:
-            return db_history
+        return db_history or self._fallback_history(currency_code, days)
 
+    def _fallback_history(self, currency_code: str, days: int):
+        """Последние сохраненные курсы, а если их нет - резервная история парсера"""
         try:
-            api_history = self.parser.get_currency_history(currency_code, days)
+            history = self.db.get_currency_history(currency_code, days)
+        except Exception as e:
+            print(f"Ошибка чтения истории для {currency_code}: {e}")
+            history = []
+        return history or self.parser.get_fallback_history(currency_code, days)
 
-            for item in api_history:
-                self.db.save_currency_history(currency_code, item["value"])
+    def _find_history_gaps(self, db_history: list, start_date: str, end_date: str):
+        """Даты окна, для которых нет ни курса, ни отметки о загрузке архива"""
+        known = {item["date"] for item in db_history}
+        known.update(self.db.get_synced_dates(start_date, end_date))
 
-            return api_history
-        except Exception as e:
-            print(f"Ошибка получения истории для {currency_code}: {e}")
-            return db_history
+        return [date for date in BackfillController.date_range(start_date, end_date)
+                if date not in known]
 
+    @tracing.traced()
     def get_currency_history_for_user(self, user_id: int):
         """Получить историю курсов для валют, на которые подписан пользователь"""
         from controllers.usercontroller import UserController
@@ -86,12 +161,14 @@ class CurrencyController:
 
         return history
 
+    @tracing.traced()
     def refresh_currencies(self):
         """Принудительное обновление курсов"""
         self._currencies_cache = {}
         self._available_cache = None
         return self.get_current_rates()
 
+    @tracing.traced()
     def get_currency_info(self, currency_code: str):
         """Получает информацию о конкретной валюте"""
         currencies = self.get_current_rates()
@@ -1,6 +1,8 @@
 import sqlite3
 from datetime import datetime
 from models import User
+import metrics
+import tracing
 
 
 class DatabaseController:
@@ -39,6 +41,13 @@ class DatabaseController:
                 )
             ''')
 
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS history_sync (
+                    date DATE PRIMARY KEY,
+                    status TEXT NOT NULL
+                )
+            ''')
+
             cursor.execute('SELECT COUNT(*) FROM users')
             if cursor.fetchone()[0] == 0:
                 cursor.execute('INSERT INTO users (id, name) VALUES (1, "Андрей")')
@@ -47,6 +56,8 @@ class DatabaseController:
 
             conn.commit()
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def get_all_users(self):
         """Получить всех пользователей"""
         with sqlite3.connect(self.db_path) as conn:
@@ -66,6 +77,8 @@ class DatabaseController:
 
             return users
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def get_user(self, user_id: int):
         """Получить пользователя по ID"""
         with sqlite3.connect(self.db_path) as conn:
@@ -83,6 +96,8 @@ class DatabaseController:
                 return user
             return None
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def add_user(self, name: str):
         """Добавить нового пользователя"""
         with sqlite3.connect(self.db_path) as conn:
@@ -95,6 +110,8 @@ class DatabaseController:
             conn.commit()
             return new_id
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def update_user_subscription(self, user_id: int, currency_code: str, subscribe: bool):
         """Обновить подписку пользователя"""
         with sqlite3.connect(self.db_path) as conn:
@@ -121,6 +138,8 @@ class DatabaseController:
             conn.commit()
             return True
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def delete_user(self, user_id: int):
         """Удалить пользователя"""
         with sqlite3.connect(self.db_path) as conn:
@@ -130,21 +149,62 @@ class DatabaseController:
             conn.commit()
             return cursor.rowcount > 0
 
-    def save_currency_history(self, currency_code: str, value: float):
-        """Сохранить историю курса валюты"""
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
+    def save_currency_history(self, currency_code: str, value: float, date: str = None):
+        """Сохранить историю курса валюты (по умолчанию - за сегодня)"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            today = datetime.now().strftime('%Y-%m-%d')
+            if date is None:
+                date = datetime.now().strftime('%Y-%m-%d')
 
             try:
                 cursor.execute('''
                     INSERT OR REPLACE INTO currency_history (currency_code, date, value)
                     VALUES (?, ?, ?)
-                ''', (currency_code, today, value))
+                ''', (currency_code, date, value))
                 conn.commit()
             except Exception as e:
                 print(f"Ошибка сохранения истории: {e}")
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
+    def save_currency_history_batch(self, rows: list, synced_dates: dict = None):
+        """Сохранить пачку курсов одной транзакцией.
+
+        rows - список кортежей (код валюты, дата, курс)
+        synced_dates - словарь {дата: статус}, который фиксируется в history_sync
+        в той же транзакции, чтобы прерванная загрузка могла продолжиться с места остановки
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO currency_history (currency_code, date, value)
+                VALUES (?, ?, ?)
+            ''', rows)
+
+            if synced_dates:
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO history_sync (date, status)
+                    VALUES (?, ?)
+                ''', list(synced_dates.items()))
+
+            conn.commit()
+
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
+    def get_synced_dates(self, start_date: str, end_date: str):
+        """Получить даты из диапазона, архив за которые уже загружен, со статусами"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT date, status FROM history_sync
+                WHERE date BETWEEN ? AND ?
+            ''', (start_date, end_date))
+            return dict(cursor.fetchall())
+
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def get_currency_history(self, currency_code: str, days: int = 90):
         """Получить историю курса валюты"""
         with sqlite3.connect(self.db_path) as conn:
@@ -175,6 +235,22 @@ class DatabaseController:
 
             return history
 
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
+    def get_currency_history_range(self, currency_code: str, start_date: str, end_date: str):
+        """Получить историю курса валюты за диапазон дат (от новых к старым)"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT date, value FROM currency_history
+                WHERE currency_code = ? AND date BETWEEN ? AND ?
+                ORDER BY date DESC
+            ''', (currency_code, start_date, end_date))
+
+            return [{"date": row[0], "value": row[1]} for row in cursor.fetchall()]
+
+    @tracing.traced()
+    @metrics.timed(metrics.DB_LATENCY)
     def update_user_subscriptions(self, user_id: int, subscriptions: list):
         """Обновить все подписки пользователя"""
         with sqlite3.connect(self.db_path) as conn:
@@ -2,6 +2,8 @@ from jinja2 import Environment, PackageLoader
 from models import Author
 from controllers.currencycontroller import CurrencyController
 from controllers.usercontroller import UserController
+import metrics
+import tracing
 
 
 class PagesController:
@@ -11,6 +13,8 @@ class PagesController:
         self.user_ctrl = UserController()
         self.main_author = Author('Новиков Вячеслав', 'P3122')
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/')
     def render_index(self):
         """Рендеринг главной страницы"""
         template = self.env.get_template("index.html")
@@ -29,6 +33,8 @@ class PagesController:
             navigation=self._get_navigation()
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/user')
     def render_user(self, user_id: int):
         """Рендеринг страницы пользователя"""
         template = self.env.get_template("user.html")
@@ -41,10 +47,7 @@ class PagesController:
 
         currencies_data = {}
         if user.subscriptions:
-            for currency_code in user.subscriptions:
-                currency_info = self.currency_ctrl.get_currency_info(currency_code)
-                if currency_info:
-                    currencies_data[currency_code] = currency_info
+            currencies_data = self.currency_ctrl.get_rates_for(user.subscriptions)
 
         history = {}
         if user.subscriptions:
@@ -68,6 +71,8 @@ class PagesController:
             navigation=self._get_navigation()
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/currencies')
     def render_currencies(self):
         """Рендеринг страницы валют"""
         template = self.env.get_template("currencies.html")
@@ -138,6 +143,8 @@ class PagesController:
             '''
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/author')
     def render_author(self):
         """Рендеринг страницы об авторе"""
         template = self.env.get_template("author.html")
@@ -147,6 +154,8 @@ class PagesController:
             navigation=self._get_navigation()
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/users')
     def render_users(self):
         """Рендеринг страницы пользователей"""
         template = self.env.get_template("users.html")
@@ -178,6 +187,8 @@ class PagesController:
             navigation=self._get_navigation()
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/report')
     def render_report1(self):
         """Рендеринг отчета 1"""
         template = self.env.get_template("report1.html")
@@ -187,6 +198,8 @@ class PagesController:
             navigation=self._get_navigation()
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, '/report2')
     def render_report2(self):
         """Рендеринг отчета 2"""
         template = self.env.get_template("report2.html")
@@ -196,6 +209,8 @@ class PagesController:
             navigation=self._get_navigation()
         )
 
+    @tracing.traced()
+    @metrics.timed(metrics.ROUTE_LATENCY, 'not_found')
     def render_404(self):
         """Рендеринг страницы 404"""
         return self._render_error("Страница не найдена")
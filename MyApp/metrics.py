@@ -0,0 +1,225 @@
+import functools
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Серии обновляются без блокировок: блокировка стоит дороже самого замера, а сервер
+# обрабатывает запросы в одном потоке. При записи из нескольких потоков возможна
+# потеря единичного отсчета, что для метрик допустимо.
+
+class _CounterSeries:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def reset(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _HistogramSeries:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class Metric:
+    """Базовый класс метрики с набором серий по значениям меток"""
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *label_values):
+        """Получить серию для значений меток (создается при первом обращении)"""
+        if len(label_values) != len(self.label_names):
+            raise ValueError(f'Метрика {self.name} ожидает метки {self.label_names}')
+
+        series = self._series.get(label_values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(label_values, self._new_series())
+        return series
+
+    def reset(self):
+        """Обнулить значения (серии сохраняются: на них ссылаются декораторы)"""
+        for series in list(self._series.values()):
+            series.reset()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for label_values, series in sorted(self._series.items()):
+            lines.extend(self._render_series(label_values, series))
+        return lines
+
+    def _render_series(self, label_values, series):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, *label_values, amount=1):
+        self.labels(*label_values).inc(amount)
+
+    def _render_series(self, label_values, series):
+        labels = _format_labels(self.label_names, label_values)
+        return [f'{self.name}{labels} {_format_value(series.value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value, *label_values):
+        self.labels(*label_values).observe(value)
+
+    def _render_series(self, label_values, series):
+        counts = list(series.counts)
+        total, count = series.sum, sum(counts)
+
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, label_values, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+
+        labels = _format_labels(self.label_names, label_values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    """Набор метрик приложения, отдаваемый на /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, label_names=()):
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+ROUTE_LATENCY = REGISTRY.histogram(
+    'myapp_route_duration_seconds', 'Время формирования страницы', ('route',))
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'myapp_cbr_request_duration_seconds', 'Время запроса к API ЦБ', ('endpoint',))
+UPSTREAM_FAILURES = REGISTRY.counter(
+    'myapp_cbr_request_failures_total', 'Неудачные запросы к API ЦБ', ('endpoint',))
+DB_LATENCY = REGISTRY.histogram(
+    'myapp_db_query_duration_seconds', 'Время операций с SQLite', ('query',))
+CACHE_REQUESTS = REGISTRY.counter(
+    'myapp_cache_requests_total', 'Обращения к кэшам (result=hit|miss)', ('cache', 'result'))
+TEMPLATE_LATENCY = REGISTRY.histogram(
+    'myapp_template_render_duration_seconds', 'Время рендеринга шаблона', ('template',))
+
+
+def timed(histogram: Histogram, *label_values, failures: Counter = None):
+    """Декоратор: время вызова записывается в histogram, исключения - в failures.
+
+    Если метки не указаны, используется имя функции. Серии метрик выбираются один раз
+    при декорировании, поэтому на вызов приходится только замер времени и запись в бакет.
+    """
+    def decorator(func):
+        labels = label_values or (func.__name__,)
+        series = histogram.labels(*labels)
+        failure_series = failures.labels(*labels) if failures is not None else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if failure_series is not None:
+                    failure_series.inc()
+                raise
+            finally:
+                series.observe(perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def cache_hit(cache: str):
+    CACHE_REQUESTS.labels(cache, 'hit').inc()
+
+
+def cache_miss(cache: str):
+    CACHE_REQUESTS.labels(cache, 'miss').inc()
@@ -2,27 +2,42 @@ import requests
 from datetime import datetime, timedelta
 import json
 import time
+import metrics
+import tracing
 
 
 class CurrencyParser:
-    def __init__(self, api_url: str = 'https://www.cbr-xml-daily.ru/daily_json.js'):
+    def __init__(self, api_url: str = 'https://www.cbr-xml-daily.ru/daily_json.js',
+                 archive_url: str = 'https://www.cbr-xml-daily.ru/archive/{date}/daily_json.js'):
         self.api_url = api_url
+        self.archive_url = archive_url
         self._currencies_data = {}
         self._available_currencies_cache = None
         self._last_update_time = 0
         self._cache_duration = 300
 
+    @tracing.traced()
+    @metrics.timed(metrics.UPSTREAM_LATENCY, 'cbr', failures=metrics.UPSTREAM_FAILURES)
+    def _fetch_json(self, url: str, timeout: float):
+        """Запрос к API ЦБ. Возвращает None, если данных по адресу нет (404)"""
+        response = requests.get(url, timeout=timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    @tracing.traced()
     def get_all_available_currencies(self):
         """Получает список всех доступных валют"""
         current_time = time.time()
         if (self._available_currencies_cache is not None and
                 current_time - self._last_update_time < self._cache_duration):
+            metrics.cache_hit('available_currencies')
             return self._available_currencies_cache
 
+        metrics.cache_miss('available_currencies')
         try:
-            response = requests.get(self.api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._fetch_json(self.api_url, 10) or {}
 
             if "Valute" in data:
                 currencies = list(data["Valute"].keys())
@@ -36,6 +51,7 @@ class CurrencyParser:
             print(f"Ошибка при запросе API для списка валют: {e}")
             return ['USD', 'EUR', 'GBP', 'JPY', 'CNY', 'CHF', 'CAD', 'AUD', 'RUB']
 
+    @tracing.traced()
     def get_currency_history(self, currency_code: str, days: int = 30):
         """Получает историю курса валюты за последние дни"""
         try:
@@ -61,9 +77,8 @@ class CurrencyParser:
                 url = f"https://www.cbr-xml-daily.ru/archive/{date_str.replace('-', '/')}/daily_json.js"
 
                 try:
-                    response = requests.get(url, timeout=3)
-                    if response.status_code == 200:
-                        data = response.json()
+                    data = self._fetch_json(url, 3)
+                    if data:
                         if "Valute" in data and currency_code in data["Valute"]:
                             history.append({
                                 "date": date_str,
@@ -82,6 +97,27 @@ class CurrencyParser:
             print(f"Ошибка при получении истории для {currency_code}: {e}")
             return self._generate_mock_history(currency_code, days)
 
+    @tracing.traced()
+    def get_archive_rates(self, date_str: str):
+        """Получает курсы всех валют из архива ЦБ за дату в формате YYYY-MM-DD.
+        Возвращает None, если в этот день курсы не публиковались (выходной или праздник)"""
+        url = self.archive_url.format(date=date_str.replace('-', '/'))
+        data = self._fetch_json(url, 3)
+        if data is None:
+            return None
+
+        rates = {}
+        for code, currency_info in data.get("Valute", {}).items():
+            rates[code] = currency_info["Value"]
+        return rates
+
+    def get_fallback_history(self, currency_code: str, days: int = 30):
+        """История на случай, когда ни в базе, ни в архиве ЦБ данных нет"""
+        if currency_code == 'RUB':
+            return [{"date": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d"), "value": 1.0}
+                    for i in range(days)]
+        return self._generate_mock_history(currency_code, days)
+
     def _generate_mock_history(self, currency_code: str, days: int):
         """Генерирует фиктивные данные для истории, если реальные данные недоступны"""
         history = []
@@ -106,14 +142,13 @@ class CurrencyParser:
 
         return history
 
+    @tracing.traced()
     def get_currencies(self, currency_codes: list):
         """Получает данные для списка валют"""
-        from .currency import CurenciesList
+        from .currency import CurrenciesList
 
         try:
-            response = requests.get(self.api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._fetch_json(self.api_url, 10) or {}
 
             currencies = {}
             not_found = []
@@ -121,7 +156,7 @@ class CurrencyParser:
             if "Valute" in data:
                 for code in currency_codes:
                     if code == 'RUB':
-                        currency = CurenciesList(
+                        currency = CurrenciesList(
                             name_curr='RUB',
                             currency_id='R00001',
                             name='Российский рубль',
@@ -131,7 +166,7 @@ class CurrencyParser:
                         currencies['RUB'] = currency
                     elif code in data["Valute"]:
                         currency_info = data["Valute"][code]
-                        currency = CurenciesList(
+                        currency = CurrenciesList(
                             name_curr=code,
                             currency_id=currency_info["ID"],
                             name=currency_info["Name"],
@@ -162,7 +197,7 @@ class CurrencyParser:
 
     def _create_mock_currency(self, currency_code: str):
         """Создает фиктивную валюту если она не найдена в API"""
-        from .currency import CurenciesList
+        from .currency import CurrenciesList
 
         mock_data = {
             'USD': ('Доллар США', 90.5, 89.8),
@@ -182,7 +217,7 @@ class CurrencyParser:
 
         if currency_code in mock_data:
             name, value, previous = mock_data[currency_code]
-            return CurenciesList(
+            return CurrenciesList(
                 name_curr=currency_code,
                 currency_id=f'MOCK{currency_code}',
                 name=name,
@@ -190,7 +225,7 @@ class CurrencyParser:
                 previous=previous
             )
         else:
-            return CurenciesList(
+            return CurrenciesList(
                 name_curr=currency_code,
                 currency_id=f'UNKNOWN{currency_code}',
                 name=f'Валюта {currency_code}',
@@ -198,6 +233,7 @@ class CurrencyParser:
                 previous=49.5
             )
 
+    @tracing.traced()
     def get_currency_info(self, currency_code: str):
         """Получает информацию о конкретной валюте"""
         currencies = self.get_currencies([currency_code])
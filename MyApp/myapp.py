@@ -1,14 +1,30 @@
 
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-from jinja2 import Environment, PackageLoader, select_autoescape
+from jinja2 import Environment, PackageLoader, Template, select_autoescape
+from time import perf_counter
 import sqlite3
 from controllers.pages import PagesController
+import metrics
+import tracing
+
+
+class TimedTemplate(Template):
+    """Шаблон, записывающий время рендеринга в метрики"""
+
+    def render(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            metrics.TEMPLATE_LATENCY.observe(perf_counter() - start, self.name or 'inline')
+
 
 env = Environment(
     loader=PackageLoader("myapp"),
     autoescape=select_autoescape()
 )
+env.template_class = TimedTemplate
 
 pages_ctrl = PagesController(env)
 
@@ -18,6 +34,18 @@ class CurrencyHTTPRequestHandler(BaseHTTPRequestHandler):
         parsed_path = urlparse(self.path)
         query_params = parse_qs(parsed_path.query)
 
+        if parsed_path.path == '/metrics':
+            self._send_text(metrics.REGISTRY.render(), 'text/plain; version=0.0.4; charset=utf-8')
+            return
+
+        if parsed_path.path == '/traces':
+            if query_params.get('format', ['json'])[0] == 'chrome':
+                body = tracing.TRACER.export_chrome()
+            else:
+                body = tracing.TRACER.export_json()
+            self._send_text(body, 'application/json; charset=utf-8')
+            return
+
         try:
             if parsed_path.path == '/':
                 html_content = pages_ctrl.render_index()
@@ -160,6 +188,14 @@ class CurrencyHTTPRequestHandler(BaseHTTPRequestHandler):
             self.send_response(404)
             self.end_headers()
 
+    def _send_text(self, text: str, content_type: str):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def _redirect(self, location: str):
         self.send_response(303)
         self.send_header('Location', location)
@@ -244,6 +280,8 @@ def main():
     print("  /report        - Отчет 1")
     print("  /report2       - Отчет 2")
     print("  /debug         - Отладочная информация")
+    print("  /metrics       - Метрики в формате Prometheus")
+    print("  /traces        - Трассы запросов (?format=chrome для chrome://tracing)")
 
     try:
         handler = CurrencyHTTPRequestHandler
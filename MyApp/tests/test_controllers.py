@@ -9,8 +9,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from controllers.currencycontroller import CurrencyController
 from controllers.usercontroller import UserController
 from controllers.databasecontroller import DatabaseController
+from controllers.backfillcontroller import BackfillController
 from models.user import User
-from models.currency import CurenciesList
+from models.currency import CurrenciesList
 
 
 class TestCurrencyController(unittest.TestCase):
@@ -29,14 +30,14 @@ class TestCurrencyController(unittest.TestCase):
         mock_parser_class.return_value = mock_parser
 
         # Мокаем возвращаемые данные
-        mock_currency_usd = MagicMock(spec=CurenciesList)
+        mock_currency_usd = MagicMock(spec=CurrenciesList)
         mock_currency_usd.name_curr = 'USD'
         mock_currency_usd.id = 'R01235'
         mock_currency_usd.name = 'Доллар США'
         mock_currency_usd.price = 90.5
         mock_currency_usd.previous = 89.8
 
-        mock_currency_eur = MagicMock(spec=CurenciesList)
+        mock_currency_eur = MagicMock(spec=CurrenciesList)
         mock_currency_eur.name_curr = 'EUR'
         mock_currency_eur.id = 'R01239'
         mock_currency_eur.name = 'Евро'
@@ -135,6 +136,114 @@ class TestCurrencyController(unittest.TestCase):
         self.assertEqual(currencies['USD'].name, "Доллар США")
         mock_get.assert_called_once_with(parser.api_url, timeout=10)
 
+    def test_get_rates_for_single_snapshot(self):
+        """Тест: курсы подписок берутся из одного снимка, недостающие - одним запросом"""
+        mock_usd = MagicMock(spec=CurrenciesList)
+        mock_usd.price = 90.5
+        mock_chf = MagicMock(spec=CurrenciesList)
+        mock_chf.price = 105.1
+        mock_aud = MagicMock(spec=CurrenciesList)
+        mock_aud.price = 60.1
+
+        self.controller.selected_currencies = ['USD', 'EUR']
+        self.controller.parser.get_currencies.side_effect = [
+            {'USD': mock_usd},
+            {'CHF': mock_chf, 'AUD': mock_aud},
+        ]
+
+        result = self.controller.get_rates_for(['USD', 'CHF', 'AUD', 'USD'])
+
+        self.assertEqual(list(result), ['USD', 'CHF', 'AUD'])
+        self.assertEqual(self.controller.parser.get_currencies.call_count, 2)
+        self.controller.parser.get_currencies.assert_called_with(['CHF', 'AUD'])
+        self.mock_db.save_currency_history_batch.assert_called_once()
+
+    def test_get_current_rates_db_error(self):
+        """Тест: ошибка записи в базу не отменяет свежие курсы"""
+        mock_usd = MagicMock(spec=CurrenciesList)
+        mock_usd.price = 90.5
+        self.controller._currencies_cache = {'USD': MagicMock()}
+        self.controller.parser.get_currencies.return_value = {'USD': mock_usd}
+        self.mock_db.save_currency_history_batch.side_effect = Exception("database is locked")
+
+        result = self.controller.get_current_rates()
+
+        self.assertIs(result['USD'], mock_usd)
+        self.assertIs(self.controller._currencies_cache['USD'], mock_usd)
+
+    def test_get_currency_history_fetches_only_gaps(self):
+        """Тест: из архива запрашиваются только отсутствующие даты"""
+        from datetime import datetime, timedelta
+        today = datetime.now()
+        dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(4)]
+
+        self.mock_db.get_currency_history_range.return_value = [
+            {"date": dates[0], "value": 90.0},
+            {"date": dates[1], "value": 89.0},
+        ]
+        # Один из пропусков - известный день без публикации
+        self.mock_db.get_synced_dates.return_value = {dates[2]: 'empty'}
+        self.controller.parser.get_archive_rates.return_value = {'USD': 88.0}
+
+        self.controller.get_currency_history('USD', 4)
+
+        self.controller.parser.get_archive_rates.assert_called_once_with(dates[3])
+        self.mock_db.save_currency_history_batch.assert_called_once()
+
+    def test_get_currency_history_no_gaps(self):
+        """Тест: при полной истории в базе API не вызывается"""
+        from datetime import datetime, timedelta
+        today = datetime.now()
+        history = [{"date": (today - timedelta(days=i)).strftime('%Y-%m-%d'), "value": 90.0}
+                   for i in range(3)]
+        self.mock_db.get_currency_history_range.return_value = history
+        self.mock_db.get_synced_dates.return_value = {}
+
+        result = self.controller.get_currency_history('USD', 3)
+
+        self.assertEqual(result, history)
+        self.controller.parser.get_archive_rates.assert_not_called()
+
+    def test_get_currency_history_skips_today(self):
+        """Тест: еще не опубликованный сегодняшний архив не запрашивается при каждом показе"""
+        from datetime import datetime, timedelta
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        history = [{"date": yesterday, "value": 90.0}]
+        self.mock_db.get_currency_history_range.return_value = history
+        self.mock_db.get_synced_dates.return_value = {}
+
+        result = self.controller.get_currency_history('USD', 2)
+
+        self.assertEqual(result, history)
+        self.controller.parser.get_archive_rates.assert_not_called()
+
+    def test_get_currency_history_caps_sync_fetches(self):
+        """Тест: за один запрос загружаются только самые свежие пропущенные даты"""
+        from datetime import datetime, timedelta
+        self.mock_db.get_currency_history_range.return_value = []
+        self.mock_db.get_synced_dates.return_value = {}
+        self.controller.parser.get_archive_rates.return_value = None
+
+        self.controller.get_currency_history('USD', 90)
+
+        fetched = sorted(call.args[0] for call in self.controller.parser.get_archive_rates.call_args_list)
+        expected = sorted((datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+                          for i in range(1, CurrencyController.MAX_SYNC_FETCHES + 1))
+        self.assertEqual(fetched, expected)
+
+    def test_get_currency_history_fallback(self):
+        """Тест: без данных в базе и в архиве возвращается резервная история"""
+        self.mock_db.get_currency_history_range.return_value = []
+        self.mock_db.get_synced_dates.return_value = {}
+        self.mock_db.get_currency_history.return_value = []
+        self.controller.parser.get_archive_rates.side_effect = Exception("нет сети")
+        self.controller.parser.get_fallback_history.return_value = [{"date": "2025-01-01", "value": 90.0}]
+
+        result = self.controller.get_currency_history('USD', 5)
+
+        self.assertEqual(result, [{"date": "2025-01-01", "value": 90.0}])
+        self.controller.parser.get_fallback_history.assert_called_once_with('USD', 5)
+
     def test_list_currencies_integration(self):
         """Тест из задания - получение списка валют"""
         mock_db = MagicMock()
@@ -144,14 +253,14 @@ class TestCurrencyController(unittest.TestCase):
         controller.db = mock_db
 
         # Настраиваем мок для возврата тестовых данных
-        mock_currency_usd = MagicMock(spec=CurenciesList)
+        mock_currency_usd = MagicMock(spec=CurrenciesList)
         mock_currency_usd.name_curr = 'USD'
         mock_currency_usd.id = 'R01235'
         mock_currency_usd.name = 'Доллар США'
         mock_currency_usd.price = 90.5
         mock_currency_usd.previous = 89.8
 
-        mock_currency_eur = MagicMock(spec=CurenciesList)
+        mock_currency_eur = MagicMock(spec=CurrenciesList)
         mock_currency_eur.name_curr = 'EUR'
         mock_currency_eur.id = 'R01239'
         mock_currency_eur.name = 'Евро'
@@ -254,6 +363,61 @@ class TestUserController(unittest.TestCase):
         self.mock_db.get_user.assert_called_once_with(999)
 
 
+class TestBackfillController(unittest.TestCase):
+
+    def setUp(self):
+        """Настройка перед каждым тестом"""
+        self.mock_db = MagicMock()
+        self.mock_db.get_synced_dates.return_value = {}
+        self.controller = BackfillController(max_workers=2, batch_size=2)
+        self.controller.db = self.mock_db
+        self.controller.parser = MagicMock()
+
+    def test_backfill_batches_and_marks_empty_dates(self):
+        """Тест пакетной записи и отметки дат без публикации"""
+        def archive_side_effect(date):
+            if date == '2025-01-04':
+                return None
+            return {'USD': 90.0, 'EUR': 98.0}
+
+        self.controller.parser.get_archive_rates.side_effect = archive_side_effect
+
+        stats = self.controller.backfill('2025-01-02', '2025-01-04', verbose=False)
+
+        self.assertEqual(stats['loaded_dates'], 2)
+        self.assertEqual(stats['empty_dates'], 1)
+        self.assertEqual(stats['rows'], 6)  # USD, EUR и RUB за два дня
+
+        synced = {}
+        for call_args in self.mock_db.save_currency_history_batch.call_args_list:
+            synced.update(call_args[0][1])
+        self.assertEqual(synced, {
+            '2025-01-02': 'loaded',
+            '2025-01-03': 'loaded',
+            '2025-01-04': 'empty',
+        })
+        self.assertEqual(self.mock_db.save_currency_history_batch.call_count, 2)
+
+    def test_backfill_resumes_from_checkpoint(self):
+        """Тест продолжения загрузки: уже загруженные даты не запрашиваются"""
+        self.mock_db.get_synced_dates.return_value = {'2025-01-02': 'loaded'}
+        self.controller.parser.get_archive_rates.return_value = {'USD': 90.0}
+
+        stats = self.controller.backfill('2025-01-02', '2025-01-03', verbose=False)
+
+        self.controller.parser.get_archive_rates.assert_called_once_with('2025-01-03')
+        self.assertEqual(stats['skipped_dates'], 1)
+
+    def test_backfill_failed_date_is_not_marked(self):
+        """Тест: дата с ошибкой загрузки не отмечается и будет запрошена повторно"""
+        self.controller.parser.get_archive_rates.side_effect = Exception("timeout")
+
+        stats = self.controller.backfill('2025-01-02', '2025-01-02', verbose=False)
+
+        self.assertEqual(stats['failed_dates'], ['2025-01-02'])
+        self.mock_db.save_currency_history_batch.assert_not_called()
+
+
 class TestDatabaseController(unittest.TestCase):
 
     @patch('sqlite3.connect')
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        """Отдельный реестр для каждого теста"""
+        self.registry = metrics.Registry()
+
+    def test_histogram_render(self):
+        """Тест вывода гистограммы в формате Prometheus"""
+        histogram = self.registry.histogram('test_seconds', 'Тест', ('route',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, '/')
+        histogram.observe(0.5, '/')
+        histogram.observe(5.0, '/')
+
+        text = self.registry.render()
+
+        self.assertIn('# TYPE test_seconds histogram', text)
+        self.assertIn('test_seconds_bucket{route="/",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{route="/",le="1.0"} 2', text)
+        self.assertIn('test_seconds_bucket{route="/",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{route="/"} 3', text)
+
+    def test_timed_counts_failures(self):
+        """Тест декоратора: время пишется всегда, ошибки - в счетчик"""
+        histogram = self.registry.histogram('calls_seconds', 'Тест', ('call',))
+        failures = self.registry.counter('calls_failures_total', 'Тест', ('call',))
+
+        @metrics.timed(histogram, failures=failures)
+        def flaky(fail):
+            if fail:
+                raise RuntimeError("fail")
+            return 42
+
+        self.assertEqual(flaky(False), 42)
+        with self.assertRaises(RuntimeError):
+            flaky(True)
+
+        self.assertEqual(histogram.labels('flaky').count, 2)
+        self.assertEqual(failures.labels('flaky').value, 1)
+
+    def test_reset_keeps_decorated_series(self):
+        """Тест: после сброса декорированные функции продолжают писать в реестр"""
+        histogram = self.registry.histogram('reset_seconds', 'Тест', ('call',))
+
+        @metrics.timed(histogram)
+        def call():
+            pass
+
+        call()
+        self.registry.reset()
+        call()
+
+        self.assertIn('reset_seconds_count{call="call"} 1', self.registry.render())
+
+    @patch('requests.get')
+    def test_parser_upstream_failure_counted(self, mock_get):
+        """Тест: ошибка запроса к ЦБ попадает в счетчик отказов"""
+        from models.currency_parser import CurrencyParser
+        mock_get.side_effect = Exception("timeout")
+        before = metrics.UPSTREAM_FAILURES.labels('cbr').value
+
+        CurrencyParser().get_currencies(['USD'])
+
+        self.assertEqual(metrics.UPSTREAM_FAILURES.labels('cbr').value, before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
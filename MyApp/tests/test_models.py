@@ -82,14 +82,10 @@ class TestPagesController(unittest.TestCase):
         mock_currency_eur.price = 98.2
         mock_currency_eur.previous = 97.5
 
-        def get_currency_info_side_effect(code):
-            if code == 'USD':
-                return mock_currency_usd
-            elif code == 'EUR':
-                return mock_currency_eur
-            return None
-
-        self.pages_ctrl.currency_ctrl.get_currency_info.side_effect = get_currency_info_side_effect
+        self.pages_ctrl.currency_ctrl.get_rates_for.return_value = {
+            'USD': mock_currency_usd,
+            'EUR': mock_currency_eur
+        }
 
         # Мокаем историю
         self.pages_ctrl.currency_ctrl.get_currency_history.return_value = [
@@ -106,6 +102,8 @@ class TestPagesController(unittest.TestCase):
 
         # Проверяем вызовы
         self.pages_ctrl.user_ctrl.get_user.assert_called_once_with(1)
+        self.pages_ctrl.currency_ctrl.get_rates_for.assert_called_once_with(['USD', 'EUR'])
+        self.pages_ctrl.currency_ctrl.get_currency_info.assert_not_called()
         self.mock_env.get_template.assert_called_once_with("user.html")
         mock_template.render.assert_called_once()
 
@@ -0,0 +1,82 @@
+import unittest
+import json
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tracing
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        """Трассируем все запросы и начинаем с пустого буфера"""
+        self._rate = tracing.TRACER.sample_rate
+        tracing.TRACER.sample_rate = 1.0
+        tracing.TRACER.clear()
+
+    def tearDown(self):
+        tracing.TRACER.sample_rate = self._rate
+        tracing.TRACER.clear()
+
+    def test_nested_spans(self):
+        """Тест вложенности спанов и экспорта в JSON"""
+        @tracing.traced('inner')
+        def inner(code):
+            return code
+
+        @tracing.traced('outer')
+        def outer():
+            return [inner('USD'), inner('EUR')]
+
+        outer()
+
+        traces = json.loads(tracing.TRACER.export_json())
+        self.assertEqual(len(traces), 1)
+        spans = traces[0]['spans']
+        self.assertEqual([span['name'] for span in spans], ['outer', 'inner', 'inner'])
+        self.assertEqual(spans[1]['parent_id'], spans[0]['span_id'])
+        self.assertEqual(spans[1]['args'], ["'USD'"])
+
+    def test_not_sampled(self):
+        """Тест: запрос вне выборки не создает спанов"""
+        tracing.TRACER.sample_rate = 0.0
+
+        @tracing.traced('outer')
+        def outer():
+            with tracing.span('block'):
+                return 1
+
+        outer()
+
+        self.assertEqual(len(tracing.TRACER.traces), 0)
+
+    def test_chrome_export_with_thread(self):
+        """Тест: спаны из рабочих потоков попадают в трассу родителя"""
+        @tracing.traced('worker')
+        def worker(x):
+            return x
+
+        with tracing.span('root'):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [tracing.submit(executor, worker, i) for i in range(2)]
+                [future.result() for future in futures]
+
+        events = json.loads(tracing.TRACER.export_chrome())['traceEvents']
+        self.assertEqual(sorted(event['name'] for event in events), ['root', 'worker', 'worker'])
+        self.assertTrue(all(event['ph'] == 'X' for event in events))
+
+
+    def test_sample_rate_from_env(self):
+        """Тест: некорректная доля выборки из окружения не ломает запуск"""
+        self.assertEqual(tracing._sample_rate_from_env(None), 0.1)
+        self.assertEqual(tracing._sample_rate_from_env('abc'), 0.1)
+        self.assertEqual(tracing._sample_rate_from_env('nan'), 0.1)
+        self.assertEqual(tracing._sample_rate_from_env('0.5'), 0.5)
+        self.assertEqual(tracing._sample_rate_from_env('5'), 1.0)
+        self.assertEqual(tracing._sample_rate_from_env('-1'), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
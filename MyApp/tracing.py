@@ -0,0 +1,185 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import random
+import threading
+from collections import deque
+from time import perf_counter_ns
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_NOT_SAMPLED = object()
+_span_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ('span_id', 'trace_id', 'parent', 'name', 'args', 'thread_id',
+                 'start_ns', 'end_ns', 'error', 'children')
+
+    def __init__(self, name: str, parent=None, args=()):
+        self.span_id = next(_span_ids)
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.name = name
+        self.args = args
+        self.thread_id = threading.get_ident()
+        self.start_ns = perf_counter_ns()
+        self.end_ns = None
+        self.error = None
+        self.children = []
+
+    @property
+    def duration_ms(self):
+        end_ns = self.end_ns if self.end_ns is not None else perf_counter_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def walk(self):
+        """Обход спана и всех вложенных спанов"""
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def to_dict(self):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent is not None else None,
+            'name': self.name,
+            'args': list(self.args),
+            'thread_id': self.thread_id,
+            'start_us': self.start_ns // 1000,
+            'duration_ms': round(self.duration_ms, 3),
+            'error': self.error,
+        }
+
+
+class Tracer:
+    """Сбор трасс с вероятностной выборкой.
+
+    Решение о выборке принимается один раз для корневого спана: если запрос не попал
+    в выборку, вложенные вызовы только проверяют метку в контексте и не создают спанов.
+    """
+
+    def __init__(self, sample_rate: float = 0.1, max_traces: int = 100):
+        self.sample_rate = sample_rate
+        self.traces = deque(maxlen=max_traces)
+
+    def should_sample(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def finish(self, span: Span):
+        span.end_ns = perf_counter_ns()
+        if span.parent is None:
+            self.traces.append(span)
+        else:
+            span.parent.children.append(span)
+
+    def clear(self):
+        self.traces.clear()
+
+    def export_json(self):
+        """Трассы в JSON: список трасс с плоским списком спанов"""
+        traces = []
+        for root in list(self.traces):
+            traces.append({
+                'trace_id': root.trace_id,
+                'name': root.name,
+                'duration_ms': round(root.duration_ms, 3),
+                'spans': [span.to_dict() for span in root.walk()],
+            })
+        return json.dumps(traces, ensure_ascii=False, indent=2)
+
+    def export_chrome(self):
+        """Трассы в формате Chrome Trace Event (chrome://tracing, Perfetto)"""
+        events = []
+        pid = os.getpid()
+        for root in list(self.traces):
+            for span in root.walk():
+                events.append({
+                    'name': span.name,
+                    'cat': 'myapp',
+                    'ph': 'X',
+                    'ts': span.start_ns / 1000,
+                    'dur': span.duration_ms * 1000,
+                    'pid': pid,
+                    'tid': span.thread_id,
+                    'args': {'trace_id': span.trace_id, 'args': list(span.args),
+                             'error': span.error},
+                })
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, ensure_ascii=False)
+
+
+DEFAULT_SAMPLE_RATE = 0.1
+
+
+def _sample_rate_from_env(value, default=DEFAULT_SAMPLE_RATE):
+    """Доля трассируемых запросов из переменной окружения: некорректное значение
+    не должно ронять приложение при запуске, поэтому заменяется на default"""
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return default
+    if rate != rate:
+        return default
+    return min(1.0, max(0.0, rate))
+
+
+TRACER = Tracer(sample_rate=_sample_rate_from_env(os.environ.get('MYAPP_TRACE_SAMPLE_RATE')))
+
+
+def _describe_args(args):
+    return tuple(repr(arg)[:50] for arg in args if isinstance(arg, (str, int, float)))
+
+
+class span:
+    """Контекстный менеджер для участка кода внутри трассы"""
+
+    def __init__(self, name: str, *args):
+        self.name = name
+        self.args = args
+        self._span = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is None:
+            if not TRACER.should_sample():
+                self._token = _current_span.set(_NOT_SAMPLED)
+                return None
+        elif parent is _NOT_SAMPLED:
+            return None
+
+        self._span = Span(self.name, parent, _describe_args(self.args))
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is not None:
+            _current_span.reset(self._token)
+        if self._span is not None:
+            if exc is not None:
+                self._span.error = repr(exc)
+            TRACER.finish(self._span)
+        return False
+
+
+def traced(name: str = None):
+    """Декоратор: вызов функции записывается как спан текущей трассы"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is _NOT_SAMPLED:
+                return func(*args, **kwargs)
+            with span(span_name, *args):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submit(executor, func, *args):
+    """executor.submit с передачей текущей трассы в рабочий поток"""
+    return executor.submit(contextvars.copy_context().run, func, *args)
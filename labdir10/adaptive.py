@@ -0,0 +1,194 @@
+import heapq
+import math
+
+# Узлы и веса квадратуры Гаусса–Кронрода G7-K15 на [-1, 1] (QUADPACK, qk15).
+# Узлы с нечетными индексами и центр - узлы 7-точечной формулы Гаусса.
+KRONROD_NODES = (
+    0.991455371120812639206854697526329,
+    0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013,
+    0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+)
+KRONROD_WEIGHTS = (
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+)
+GAUSS_WEIGHTS = (
+    0.129484966168869693270611432679082,
+    0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975,
+    0.417959183673469387755102040816327,
+)
+
+
+def gauss_kronrod_15(f, a, b):
+    """
+    Вычисляет интеграл f на [a, b] по формуле Кронрода на 15 точках.
+
+    Возвращает:
+    Кортеж (значение, оценка ошибки). Ошибка оценивается как разность
+    с 7-точечной формулой Гаусса, построенной на части тех же узлов.
+    """
+    center = (a + b) / 2
+    half = (b - a) / 2
+
+    f_center = f(center)
+    kronrod = f_center * KRONROD_WEIGHTS[7]
+    gauss = f_center * GAUSS_WEIGHTS[3]
+
+    for j in range(7):
+        dx = half * KRONROD_NODES[j]
+        pair = f(center - dx) + f(center + dx)
+        kronrod += KRONROD_WEIGHTS[j] * pair
+        if j % 2 == 1:
+            gauss += GAUSS_WEIGHTS[j // 2] * pair
+
+    return kronrod * half, abs((kronrod - gauss) * half)
+
+
+def _simpson(f, a, fa, b, fb):
+    m = (a + b) / 2
+    fm = f(m)
+    return m, fm, (b - a) / 6 * (fa + 4 * fm + fb)
+
+
+def _integrate_simpson(f, a, b, tol, max_depth):
+    """Адаптивный метод Симпсона с поправкой Ричардсона (без рекурсии)"""
+    fa, fb = f(a), f(b)
+    m, fm, whole = _simpson(f, a, fa, b, fb)
+    n_evals = 3
+
+    total = 0.0
+    error = 0.0
+    stack = [(a, fa, b, fb, m, fm, whole, tol, 0)]
+
+    while stack:
+        a, fa, b, fb, m, fm, whole, tol_part, depth = stack.pop()
+        lm, flm, left = _simpson(f, a, fa, m, fm)
+        rm, frm, right = _simpson(f, m, fm, b, fb)
+        n_evals += 2
+
+        delta = left + right - whole
+        if depth >= max_depth or abs(delta) <= 15 * tol_part:
+            total += left + right + delta / 15
+            error += abs(delta) / 15
+        else:
+            stack.append((a, fa, m, fm, lm, flm, left, tol_part / 2, depth + 1))
+            stack.append((m, fm, b, fb, rm, frm, right, tol_part / 2, depth + 1))
+
+    return total, error, n_evals
+
+
+def _integrate_gauss_kronrod(f, a, b, tol, max_intervals):
+    """
+    Глобально-адаптивная схема (как QAG в QUADPACK): делится пополам
+    отрезок с наибольшей оценкой ошибки, пока суммарная ошибка больше tol.
+    """
+    value, error = gauss_kronrod_15(f, a, b)
+    n_evals = 15
+    heap = [(-error, a, b, value)]
+    total_value, total_error = value, error
+
+    while total_error > tol and len(heap) < max_intervals:
+        neg_error, left, right, part_value = heapq.heappop(heap)
+        middle = (left + right) / 2
+        value_l, error_l = gauss_kronrod_15(f, left, middle)
+        value_r, error_r = gauss_kronrod_15(f, middle, right)
+        n_evals += 30
+
+        total_value += value_l + value_r - part_value
+        total_error += error_l + error_r + neg_error
+        heapq.heappush(heap, (-error_l, left, middle, value_l))
+        heapq.heappush(heap, (-error_r, middle, right, value_r))
+
+    # Пересчитываем сумму по отрезкам, чтобы не накапливать ошибку округления
+    total_value = math.fsum(item[3] for item in heap)
+    total_error = math.fsum(-item[0] for item in heap)
+    return total_value, total_error, n_evals, len(heap)
+
+
+def integrate_adaptive(f, a, b, tol=1e-10, *, method='gauss_kronrod',
+                       max_depth=50, max_intervals=10000, full_output=False):
+    """
+    Вычисляет интеграл функции f от a до b с заданной точностью,
+    дробя отрезок только там, где это нужно.
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    tol - допустимая абсолютная ошибка
+    method - 'gauss_kronrod' (G7-K15 с глобальным делением) или 'simpson'
+    max_depth - максимальная глубина деления для метода Симпсона
+    max_intervals - максимальное число отрезков для метода Гаусса–Кронрода
+    full_output - вернуть дополнительно словарь со статистикой
+
+    Возвращает:
+    Кортеж (значение интеграла, оценка ошибки), а при full_output=True -
+    (значение, ошибка, {'n_evals': ..., 'n_intervals': ...})
+
+    >>> value, error = integrate_adaptive(math.sin, 0, math.pi)
+    >>> round(value, 12), error < 1e-10
+    (2.0, True)
+    """
+    if a == b:
+        info = {'n_evals': 0, 'n_intervals': 0}
+        return (0.0, 0.0, info) if full_output else (0.0, 0.0)
+
+    if method == 'gauss_kronrod':
+        value, error, n_evals, n_intervals = _integrate_gauss_kronrod(f, a, b, tol, max_intervals)
+    elif method == 'simpson':
+        value, error, n_evals = _integrate_simpson(f, a, b, tol, max_depth)
+        n_intervals = None
+    else:
+        raise ValueError(f"Неизвестный метод: {method}")
+
+    if full_output:
+        return value, error, {'n_evals': n_evals, 'n_intervals': n_intervals}
+    return value, error
+
+
+def compare_with_midpoint():
+    """
+    Сравнивает число вычислений функции у integrate и integrate_adaptive
+    при одинаковой достигнутой точности.
+    """
+    from integrate import integrate
+
+    cases = [
+        ("sin, [0, pi]", math.sin, 0, math.pi, 2.0),
+        ("log2, [1, 2]", math.log2, 1, 2, 2 - 1 / math.log(2)),
+    ]
+
+    print("Сравнение integrate и integrate_adaptive:")
+    print("-" * 70)
+    for title, f, a, b, exact in cases:
+        for method in ('gauss_kronrod', 'simpson'):
+            value, error, info = integrate_adaptive(f, a, b, 1e-10, method=method,
+                                                    full_output=True)
+            print(f"{title}: {method:14s} вычислений = {info['n_evals']:7d}, "
+                  f"ошибка = {abs(value - exact):.2e} (оценка {error:.2e})")
+
+        n_iter = 1000000
+        result = integrate(f, a, b, n_iter)
+        print(f"{title}: {'midpoint':14s} вычислений = {n_iter:7d}, "
+              f"ошибка = {abs(result - exact):.2e}")
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    compare_with_midpoint()
@@ -0,0 +1,332 @@
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+
+import benchmark
+from integrate import integrate, gil_disabled, NUMPY_EQUIVALENTS
+from jit import compile_integrand
+from serialization import can_ship
+
+try:
+    import cython_integrate
+except ImportError:
+    cython_integrate = None
+
+MODEL_PATH = os.environ.get(
+    'LABDIR10_COST_MODEL',
+    os.path.join(os.path.expanduser('~'), '.cache', 'labdir10', 'cost_model.json'))
+# LABDIR10_CALIBRATE=1 - калибровать и сохранять модель при первом integrate_auto
+CALIBRATE_ENV = 'LABDIR10_CALIBRATE'
+CALIBRATION_N_ITERS = (2000, 50000)
+PROBE_CALLS = 32
+
+
+def _python_sin(x):
+    return math.sin(x)
+
+
+# Бэкенды из benchmark.BACKENDS: имя -> (функция (f, a, b, n_iter, n_jobs, method),
+# параллельный, через процессы)
+BACKENDS = {name: (run, parallel, name in benchmark.PROCESS_BACKENDS)
+            for name, (run, parallel) in benchmark.BACKENDS.items()}
+
+# Виды подынтегральных функций, для которых модель строится отдельно:
+# 'native' - функции math с векторным/C-аналогом, 'python' - произвольный Python-код
+KINDS = {'native': math.sin, 'python': _python_sin}
+
+
+def job_counts():
+    """1, 2, 4, ... до числа ядер включительно"""
+    cpu_count = os.cpu_count() or 1
+    counts = {cpu_count}
+    n_jobs = 1
+    while n_jobs < cpu_count:
+        counts.add(n_jobs)
+        n_jobs *= 2
+    return sorted(counts)
+
+
+def machine_signature():
+    """Описание машины и доступных бэкендов; модель с другой подписью пересчитывается"""
+    return {
+        'node': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'backends': sorted(BACKENDS),
+    }
+
+
+class CostModel:
+    """
+    Линейная модель времени вызова: время = накладные расходы + n_iter * цена вычисления,
+    отдельно для каждого вида функции, бэкенда и числа исполнителей.
+    """
+
+    def __init__(self, entries, signature=None):
+        self.entries = entries
+        self.signature = signature or machine_signature()
+
+    def predict(self, kind, backend, n_jobs, n_iter, ratio=1.0):
+        overhead, per_eval = self.entries[kind][f"{backend}:{n_jobs}"]
+        return overhead + n_iter * per_eval * ratio
+
+    def best(self, kind, n_iter, ratio=1.0, allowed=None):
+        """
+        Самый быстрый по прогнозу вариант.
+
+        Возвращает:
+        Кортеж (бэкенд, n_jobs, прогноз времени в секундах)
+        """
+        candidates = []
+        for key in self.entries[kind]:
+            backend, n_jobs = key.rsplit(':', 1)
+            if allowed is not None and backend not in allowed:
+                continue
+            if backend not in BACKENDS:
+                continue
+            candidates.append((self.predict(kind, backend, int(n_jobs), n_iter, ratio),
+                               backend, int(n_jobs)))
+        predicted, backend, n_jobs = min(candidates)
+        return backend, n_jobs, predicted
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'signature': self.signature, 'entries': self.entries}, file, indent=2)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(data['entries'], data['signature'])
+
+
+# Осторожные оценки для модели без калибровки: (накладные расходы, цена вычисления)
+# в секундах на один исполнитель. Параллельные бэкенды выбираются только там,
+# где их запуск точно окупается; потоки со стандартным GIL вычисления не ускоряют.
+DEFAULT_COSTS = {
+    'native': {'serial': (0.0, 2e-7), 'vectorized': (1e-4, 2e-8), 'jit': (1e-3, 2e-8),
+               'threads': (1e-3, 2e-7), 'processes': (5e-2, 2e-7), 'mp': (5e-2, 2e-7),
+               'cython': (0.0, 1e-7), 'cython_parallel': (1e-4, 2e-8)},
+    'python': {'serial': (0.0, 3e-7), 'vectorized': (1e-4, 3e-7), 'jit': (1e-3, 3e-7),
+               'threads': (1e-3, 3e-7), 'processes': (5e-2, 3e-7), 'mp': (5e-2, 3e-7),
+               'cython': (0.0, 3e-7), 'cython_parallel': (1e-4, 3e-7)},
+}
+
+
+def default_model():
+    """
+    Модель по умолчанию из DEFAULT_COSTS - без замеров и без записи на диск.
+
+    Возвращает:
+    CostModel
+    """
+    entries = {}
+    for kind, costs in DEFAULT_COSTS.items():
+        entries[kind] = {}
+        for backend, (_, parallel, _) in BACKENDS.items():
+            # Бэкенд без оценки модель по умолчанию не выбирает
+            if backend not in costs:
+                continue
+            overhead, per_eval = costs[backend]
+            scales = parallel and (backend != 'threads' or gil_disabled())
+            for n_jobs in (job_counts() if parallel else (1,)):
+                entries[kind][f"{backend}:{n_jobs}"] = [overhead, per_eval / n_jobs if scales else per_eval]
+    return CostModel(entries)
+
+
+def _measure(run, f, n_iter, n_jobs, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(f, 0.0, 1.0, n_iter, n_jobs, 'midpoint')
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def calibrate(n_iters=CALIBRATION_N_ITERS, repeat=3, verbose=False):
+    """
+    Замеряет все бэкенды с каждым числом исполнителей из job_counts на двух n_iter
+    и по двум точкам находит накладные расходы и цену одного вычисления.
+
+    Возвращает:
+    CostModel
+    """
+    small, large = n_iters
+    entries = {}
+    for kind, f in KINDS.items():
+        entries[kind] = {}
+        for backend, (run, parallel, _) in BACKENDS.items():
+            for n_jobs in (job_counts() if parallel else (1,)):
+                run(f, 0.0, 1.0, small, n_jobs, 'midpoint')
+                small_time = _measure(run, f, small, n_jobs, repeat)
+                large_time = _measure(run, f, large, n_jobs, repeat)
+
+                per_eval = max(0.0, (large_time - small_time) / (large - small))
+                overhead = max(0.0, small_time - small * per_eval)
+                entries[kind][f"{backend}:{n_jobs}"] = [overhead, per_eval]
+
+                if verbose:
+                    print(f"{kind:6s} {backend:16s} n_jobs = {n_jobs:2d}: "
+                          f"накладные = {overhead * 1e6:9.1f} мкс, "
+                          f"вычисление = {per_eval * 1e9:8.1f} нс")
+    return CostModel(entries)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def load_cost_model(path=MODEL_PATH):
+    """Модель из файла path, если он есть и снят на этой машине, иначе None"""
+    try:
+        model = CostModel.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return model if model.signature == machine_signature() else None
+
+
+def get_cost_model(path=MODEL_PATH, recalibrate=False):
+    """
+    Модель для этой машины: из памяти, из файла path или default_model().
+
+    Калибровка (несколько секунд) запускается только по явной просьбе -
+    recalibrate=True, python autotune.py --recalibrate или переменная окружения
+    LABDIR10_CALIBRATE=1 (тогда при первом обращении без сохраненной модели);
+    ее результат сохраняется в path.
+    """
+    global _model
+    with _model_lock:
+        if _model is not None and not recalibrate:
+            return _model
+
+        model = None if recalibrate else load_cost_model(path)
+        if model is None and (recalibrate or os.environ.get(CALIBRATE_ENV) == '1'):
+            model = calibrate()
+            model.save(path)
+
+        _model = model or default_model()
+        return _model
+
+
+def _kind(f):
+    try:
+        return 'native' if f in NUMPY_EQUIVALENTS else 'python'
+    except TypeError:
+        return 'python'
+
+
+def _cost_ratio(f, a, b):
+    """Во сколько раз вызов f дороже вызова _python_sin (по PROBE_CALLS вызовам)"""
+    points = [a + (b - a) * (i + 0.5) / PROBE_CALLS for i in range(PROBE_CALLS)]
+
+    start = time.perf_counter()
+    for x in points:
+        _python_sin(x)
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for x in points:
+        f(x)
+    elapsed = time.perf_counter() - start
+
+    return max(0.1, elapsed / reference) if reference > 0 else 1.0
+
+
+def _compiles(f):
+    try:
+        compile_integrand(f)
+    except ValueError:
+        return False
+    return True
+
+
+def choose_backend(f, a, b, n_iter, model=None):
+    """
+    Бэкенд и число исполнителей, которые по модели быстрее всего посчитают интеграл f.
+
+    Функции, которые нельзя передать в процесс (см. serialization.can_ship), считаются
+    только без процессов; cython_parallel рассматривается только для функций,
+    которые он вычисляет на C, а jit - только для тех, что он компилирует. Для произвольных функций цена вычисления
+    масштабируется по пробному замеру f, если n_iter достаточно велико.
+
+    Возвращает:
+    Кортеж (бэкенд, n_jobs, прогноз времени в секундах)
+    """
+    model = model or get_cost_model()
+    kind = _kind(f)
+
+    allowed = set(BACKENDS)
+    if not can_ship(f):
+        allowed -= {name for name, (_, _, uses_processes) in BACKENDS.items() if uses_processes}
+    if cython_integrate is not None and cython_integrate._resolve_c_integrand(f) is None:
+        allowed.discard('cython_parallel')
+    if not _compiles(f):
+        allowed.discard('jit')
+
+    ratio = _cost_ratio(f, a, b) if kind == 'python' and n_iter >= 100 * PROBE_CALLS else 1.0
+    return model.best(kind, n_iter, ratio, allowed)
+
+
+def integrate_auto(f, a, b, n_iter=1000, *, method='midpoint', model=None):
+    """
+    Вычисляет интеграл функции f от a до b бэкендом, который по модели
+    стоимости этой машины будет самым быстрым для данного n_iter.
+
+    При первом вызове модель читается с диска (MODEL_PATH, переменная окружения
+    LABDIR10_COST_MODEL); если ее нет или она снята на другой машине, используется
+    осторожная default_model(). Калибровка запускается только явно (см. get_cost_model).
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - количество разбиений
+    method - квадратурная формула (см. integrate)
+    model - CostModel (по умолчанию get_cost_model())
+
+    Возвращает:
+    Приближенное значение интеграла (число)
+    """
+    backend, n_jobs, _ = choose_backend(f, a, b, n_iter, model)
+    run = BACKENDS[backend][0]
+    return run(f, a, b, n_iter, n_jobs, method)
+
+
+def measure_autotune():
+    """
+    Печатает выбор integrate_auto для разных n_iter и сравнивает его время
+    с последовательным integrate.
+    """
+    model = get_cost_model()
+
+    print("Выбор integrate_auto:")
+    print("-" * 70)
+
+    for f in (math.sin, _python_sin):
+        for n_iter in (100, 10000, 1000000):
+            backend, n_jobs, predicted = choose_backend(f, 0, math.pi, n_iter, model)
+
+            start = time.perf_counter()
+            integrate_auto(f, 0, math.pi, n_iter, model=model)
+            auto_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            integrate(f, 0, math.pi, n_iter)
+            serial_time = time.perf_counter() - start
+
+            print(f"{f.__name__:12s} n_iter = {n_iter:8d}: {backend:16s} n_jobs = {n_jobs:2d}, "
+                  f"прогноз = {predicted:8.4f} сек, факт = {auto_time:8.4f} сек, "
+                  f"integrate = {serial_time:8.4f} сек")
+
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    if '--recalibrate' in sys.argv:
+        calibrate(verbose=True).save()
+    measure_autotune()
@@ -0,0 +1,186 @@
+import concurrent.futures
+import contextlib
+import functools
+import itertools
+import math
+import timeit
+
+from integrate import integrate, integrate_process
+from pool import get_shared_pool
+from serialization import shipped
+
+BACKENDS = ('process', 'thread', 'serial')
+
+
+def _integrate_group(f, items, method, reduction='naive'):
+    """
+    Вычисляет пачку интегралов одной функции в рабочем процессе.
+    f передается (и сериализуется) один раз на всю пачку.
+    """
+    return [(index, integrate(f, a, b, n_iter, method, reduction)) for index, a, b, n_iter in items]
+
+
+def _group_by_function(window, default_n_iter):
+    """Группирует задачи окна по функции с сохранением номеров задач"""
+    groups = {}
+    for index, task in window:
+        f, a, b, *rest = task
+        n_iter = rest[0] if rest else default_n_iter
+        try:
+            hash(f)
+            key = f
+        except TypeError:
+            key = id(f)
+        groups.setdefault(key, (f, []))[1].append((index, a, b, n_iter))
+    return groups.values()
+
+
+class _Shipments:
+    """
+    Функции пачек, подготовленные для передачи в процессы (serialization.shipped).
+
+    Блок общей памяти функции закрывается, как только завершится последняя
+    отправленная с ней пачка, поэтому длинный поток задач с разными lambda
+    не держит открытыми блоки (и дескрипторы файлов) уже посчитанных функций.
+    """
+
+    def __init__(self):
+        # id(f) -> [f, объект для передачи, ExitStack, пачек в работе];
+        # f хранится, чтобы ее id не достался другой функции, пока запись жива
+        self._functions = {}
+
+    def acquire(self, f):
+        """Объект для передачи f в процесс; еще одна пачка с f в работе"""
+        entry = self._functions.get(id(f))
+        if entry is None:
+            resources = contextlib.ExitStack()
+            entry = self._functions[id(f)] = [f, resources.enter_context(shipped(f)), resources, 0]
+        entry[3] += 1
+        return entry[1]
+
+    def release(self, f):
+        """Пачка с f завершилась; после последней блок f закрывается"""
+        entry = self._functions[id(f)]
+        entry[3] -= 1
+        if entry[3] == 0:
+            del self._functions[id(f)]
+            entry[2].close()
+
+    def close(self):
+        for entry in self._functions.values():
+            entry[2].close()
+        self._functions.clear()
+
+
+def _finished(future, pending, shipments):
+    """Результаты завершенной пачки; пачка снимается с учета"""
+    f = pending.pop(future)
+    if shipments is not None:
+        shipments.release(f)
+    return future.result()
+
+
+def integrate_many(tasks, *, backend='process', n_jobs=2, n_iter=1000, method='midpoint',
+                   batch_size=None, window=10000, pool=None, reduction='naive'):
+    """
+    Вычисляет много интегралов сразу и отдает результаты по мере готовности.
+
+    Задачи читаются окнами по window штук, внутри окна группируются по функции
+    и режутся на пачки; одна пачка - одна задача для исполнителя, поэтому
+    функция сериализуется один раз на пачку, а не на каждый интеграл.
+    Все пачки выполняются на одном общем пуле процессов (pool.get_shared_pool).
+
+    Аргументы:
+    tasks - итерируемый набор кортежей (f, a, b) или (f, a, b, n_iter)
+    backend - 'process', 'thread' или 'serial'
+    n_jobs - количество параллельных исполнителей
+    n_iter - количество разбиений для задач, где оно не указано
+    method - квадратурная формула (см. integrate)
+    batch_size - интегралов в одной пачке (по умолчанию - чтобы на исполнителя
+                 пришлось около четырех пачек)
+    window - сколько задач читать из tasks за раз
+    pool - WorkerPool для backend='process' (по умолчанию общий пул)
+    reduction - способ суммирования (см. integrate)
+
+    Возвращает:
+    Генератор пар (номер задачи, значение интеграла) в порядке готовности.
+
+    >>> sorted(integrate_many([(math.sin, 0, math.pi), (math.cos, 0, math.pi / 2)],
+    ...                       backend='serial', n_iter=10000))[0][1] > 1.99
+    True
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд: {backend}. Доступны: {', '.join(BACKENDS)}")
+
+    executor = submit = None
+    if backend == 'process':
+        submit = functools.partial((pool or get_shared_pool()).submit, n_jobs)
+    elif backend == 'thread':
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+        submit = executor.submit
+
+    numbered = enumerate(tasks)
+    # Пачки в работе: future -> функция пачки
+    pending = {}
+    shipments = _Shipments() if backend == 'process' else None
+
+    try:
+        while True:
+            window_tasks = list(itertools.islice(numbered, window))
+            if not window_tasks:
+                break
+
+            for f, items in _group_by_function(window_tasks, n_iter):
+                size = batch_size or max(1, math.ceil(len(items) / (n_jobs * 4)))
+                for first in range(0, len(items), size):
+                    batch = items[first:first + size]
+                    if submit is None:
+                        yield from _integrate_group(f, batch, method, reduction)
+                    else:
+                        function = f if shipments is None else shipments.acquire(f)
+                        pending[submit(_integrate_group, function, batch, method, reduction)] = f
+
+                # Не держим в очереди больше пачек, чем нужно для загрузки исполнителей
+                while len(pending) > n_jobs * 4:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield from _finished(future, pending, shipments)
+
+        for future in concurrent.futures.as_completed(list(pending)):
+            yield from _finished(future, pending, shipments)
+    finally:
+        for future in pending:
+            future.cancel()
+        if backend == 'thread':
+            executor.shutdown()
+        if shipments is not None:
+            shipments.close()
+
+
+def measure_batch_performance(n_tasks=2000):
+    """
+    Сравнивает integrate_many с последовательными вызовами integrate_process
+    на наборе из n_tasks небольших интегралов.
+    """
+    tasks = [(math.sin if i % 2 else math.cos, 0, 1 + i / n_tasks, 200) for i in range(n_tasks)]
+
+    print(f"{n_tasks} интегралов по 200 разбиений:")
+    print("-" * 50)
+
+    single = min(timeit.repeat(
+        lambda: [integrate_process(f, a, b, n_jobs=2, n_iter=n) for f, a, b, n in tasks[:200]],
+        repeat=3, number=1)) * n_tasks / 200
+    many = min(timeit.repeat(lambda: list(integrate_many(tasks, n_jobs=2)), repeat=3, number=1))
+
+    print(f"integrate_process по одному (оценка): {single:8.3f} сек")
+    print(f"integrate_many:                       {many:8.3f} сек")
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_batch_performance()
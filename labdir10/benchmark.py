@@ -0,0 +1,209 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+from integrate import integrate, integrate_vectorized, integrate_async
+from integrate import integrate_process, integrate_processes_mp
+from jit import integrate_jit
+
+try:
+    from cython_integrate import integrate_cython, integrate_cython_parallel
+except ImportError:
+    integrate_cython = integrate_cython_parallel = None
+
+REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_report.json')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+REGRESSION_THRESHOLD = 0.2
+
+
+def _polynomial(x):
+    return 3 * x * x - 2 * x + 1
+
+
+# Подынтегральные функции: имя -> (f, a, b); все функции уровня модуля,
+# чтобы их можно было передать в процессы
+INTEGRANDS = {
+    'sin': (math.sin, 0, math.pi),
+    'log2': (math.log2, 1, 2),
+    'poly': (_polynomial, 0, 1),
+}
+
+# Бэкенды: имя -> (функция (f, a, b, n_iter, n_jobs, method='midpoint'), параллельный ли бэкенд);
+# по этой же таблице integrate_auto выбирает бэкенд (autotune.BACKENDS)
+BACKENDS = {
+    'serial': (lambda f, a, b, n_iter, n_jobs, method='midpoint': integrate(f, a, b, n_iter, method), False),
+    'vectorized': (lambda f, a, b, n_iter, n_jobs, method='midpoint':
+                   integrate_vectorized(f, a, b, n_iter, method=method), False),
+    'jit': (lambda f, a, b, n_iter, n_jobs, method='midpoint': integrate_jit(f, a, b, n_iter, method=method),
+            False),
+    'threads': (lambda f, a, b, n_iter, n_jobs, method='midpoint':
+                integrate_async(f, a, b, n_jobs=n_jobs, n_iter=n_iter, method=method, mode='thread'), True),
+    'processes': (lambda f, a, b, n_iter, n_jobs, method='midpoint':
+                  integrate_process(f, a, b, n_jobs=n_jobs, n_iter=n_iter, method=method), True),
+    'mp': (lambda f, a, b, n_iter, n_jobs, method='midpoint':
+           integrate_processes_mp(f, a, b, n_jobs=n_jobs, n_iter=n_iter, method=method), True),
+}
+if integrate_cython is not None:
+    BACKENDS['cython'] = (lambda f, a, b, n_iter, n_jobs, method='midpoint':
+                          integrate_cython(f, a, b, n_iter, method), False)
+    BACKENDS['cython_parallel'] = (lambda f, a, b, n_iter, n_jobs, method='midpoint':
+                                   integrate_cython_parallel(f, a, b, n_iter, n_threads=n_jobs, method=method),
+                                   True)
+# Бэкенды, которые передают f в рабочие процессы
+PROCESS_BACKENDS = ('processes', 'mp')
+
+N_ITERS = (1000, 100000, 1000000)
+N_JOBS = (1, 2, 4)
+QUICK = {'n_iters': (1000, 10000), 'n_jobs_values': (1, 2), 'repeat': 3}
+
+
+def run_case(backend, integrand, n_iter, n_jobs=1, repeat=5):
+    """
+    Замеряет один вариант repeat раз (после одного прогревочного запуска).
+
+    Возвращает:
+    Словарь с параметрами варианта, медианой и межквартильным размахом времени (сек),
+    числом вычислений функции в секунду и ошибкой результата относительно integrate
+    с тем же n_iter.
+    """
+    run, _ = BACKENDS[backend]
+    f, a, b = INTEGRANDS[integrand]
+
+    result = run(f, a, b, n_iter, n_jobs)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(f, a, b, n_iter, n_jobs)
+        times.append(time.perf_counter() - start)
+
+    median = statistics.median(times)
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else [median] * 3
+    return {
+        'backend': backend,
+        'integrand': integrand,
+        'n_iter': n_iter,
+        'n_jobs': n_jobs,
+        'median': median,
+        'iqr': quartiles[2] - quartiles[0],
+        'min': min(times),
+        'evals_per_sec': n_iter / median if median > 0 else float('inf'),
+        'result': result,
+    }
+
+
+def case_key(case):
+    return case['backend'], case['integrand'], case['n_iter'], case['n_jobs']
+
+
+def run_suite(backends=None, integrands=None, n_iters=N_ITERS, n_jobs_values=N_JOBS, repeat=5,
+              verbose=False):
+    """
+    Перебирает бэкенд × подынтегральная функция × n_iter × n_jobs.
+    Последовательные бэкенды замеряются только с n_jobs = 1.
+
+    Возвращает:
+    Список словарей run_case
+    """
+    results = []
+    for backend in backends or BACKENDS:
+        parallel = BACKENDS[backend][1]
+        for integrand in integrands or INTEGRANDS:
+            for n_iter in n_iters:
+                for n_jobs in (n_jobs_values if parallel else (1,)):
+                    case = run_case(backend, integrand, n_iter, n_jobs, repeat)
+                    results.append(case)
+                    if verbose:
+                        print(format_case(case))
+    return results
+
+
+def format_case(case):
+    return (f"{case['backend']:16s} {case['integrand']:5s} n_iter = {case['n_iter']:8d} "
+            f"n_jobs = {case['n_jobs']:2d}: медиана = {case['median']:9.5f} сек "
+            f"(IQR {case['iqr']:.5f}), {case['evals_per_sec']:12.0f} вычислений/сек")
+
+
+def make_report(results):
+    """Отчет с описанием окружения, пригодный для сохранения в JSON"""
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+
+def save_report(report, path=REPORT_PATH):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Сравнивает медианы с сохраненным базовым отчетом.
+
+    Вариант считается регрессией, если его медиана больше базовой более чем
+    на threshold (доля) плюс межквартильный размах базового замера - так
+    обычный шум измерений не принимается за замедление.
+
+    Возвращает:
+    Список пар (текущий замер, базовый замер) для замедлившихся вариантов
+    """
+    base_cases = {case_key(case): case for case in baseline['results']}
+    regressions = []
+    for case in results:
+        base = base_cases.get(case_key(case))
+        if base is None:
+            continue
+        if case['median'] > base['median'] * (1 + threshold) + base['iqr']:
+            regressions.append((case, base))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры бэкендов integrate")
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS),
+                        help="бэкенд (можно указать несколько раз; по умолчанию все)")
+    parser.add_argument('--integrand', action='append', choices=sorted(INTEGRANDS))
+    parser.add_argument('--quick', action='store_true', help="маленькие n_iter и мало повторов")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=REPORT_PATH, help="куда записать отчет JSON")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="базовый отчет для сравнения")
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить замер как базовый")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    options = dict(QUICK) if args.quick else {'repeat': args.repeat}
+    results = run_suite(args.backend, args.integrand, verbose=True, **options)
+    report = make_report(results)
+    save_report(report, args.output)
+    print(f"Отчет: {args.output}")
+
+    if args.save_baseline:
+        save_report(report, args.baseline)
+        print(f"Базовый отчет: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+
+    regressions = find_regressions(results, load_report(args.baseline), args.threshold)
+    for case, base in regressions:
+        print(f"РЕГРЕССИЯ {format_case(case)}; было {base['median']:.5f} сек")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
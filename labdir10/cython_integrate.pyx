@@ -1,7 +1,231 @@
+import array
 import math
+import rules
+from summation import make_grid_sum, reduce_sum
 
+cimport openmp
+from cython.parallel cimport prange
+from libc.math cimport sin, cos, tan, exp, log, log2, sqrt, fabs
+
+ctypedef double (*c_func)(double) noexcept nogil
+
+
+cdef double c_sin(double x) noexcept nogil:
+    return sin(x)
+
+
+cdef double c_cos(double x) noexcept nogil:
+    return cos(x)
+
+
+cdef double c_tan(double x) noexcept nogil:
+    return tan(x)
+
+
+cdef double c_exp(double x) noexcept nogil:
+    return exp(x)
+
+
+cdef double c_log(double x) noexcept nogil:
+    return log(x)
+
+
+cdef double c_log2(double x) noexcept nogil:
+    return log2(x)
+
+
+cdef double c_sqrt(double x) noexcept nogil:
+    return sqrt(x)
+
+
+# Реестр C-функций: имя -> номер в таблице _C_TABLE
+C_INTEGRANDS = {'sin': 0, 'cos': 1, 'tan': 2, 'exp': 3, 'log': 4, 'log2': 5, 'sqrt': 6}
+_PY_TO_C = {math.sin: 'sin', math.cos: 'cos', math.tan: 'tan', math.exp: 'exp',
+            math.log: 'log', math.log2: 'log2', math.sqrt: 'sqrt'}
+
+cdef c_func _C_TABLE[7]
+_C_TABLE[0] = c_sin
+_C_TABLE[1] = c_cos
+_C_TABLE[2] = c_tan
+_C_TABLE[3] = c_exp
+_C_TABLE[4] = c_log
+_C_TABLE[5] = c_log2
+_C_TABLE[6] = c_sqrt
+
+
+class Polynomial:
+    """
+    Многочлен c[0] * x^n + ... + c[n]; считается на C без GIL,
+    а при вызове из Python работает как обычная функция.
+    """
+
+    def __init__(self, coefficients):
+        self.coefficients = [float(c) for c in coefficients]
+
+    def __call__(self, x):
+        result = 0.0
+        for c in self.coefficients:
+            result = result * x + c
+        return result
+
+    def __repr__(self):
+        return f"Polynomial({self.coefficients})"
+
+
+cdef int _threads(int n_threads) noexcept nogil:
+    return n_threads if n_threads > 0 else openmp.omp_get_max_threads()
+
+
+# Сетка делится на блоки по BLOCK_SIZE точек независимо от числа потоков,
+# а суммы блоков складываются по порядку (summation.reduce_sum) - результат
+# не зависит от того, как prange распределил блоки по потокам
+cdef long BLOCK_SIZE = 4096
+
+
+cdef inline double _add(double total, double value, double* compensation, bint compensated) noexcept nogil:
+    # Суммирование Ноймайера (см. summation.neumaier_sum), если compensated
+    cdef double t = total + value
+    if compensated:
+        if fabs(total) >= fabs(value):
+            compensation[0] += (total - t) + value
+        else:
+            compensation[0] += (value - t) + total
+    return t
+
+
+cdef double _c_block_sum(c_func f, double start, double step, long first, long last,
+                         bint compensated) noexcept nogil:
+    cdef double total = 0.0
+    cdef double compensation = 0.0
+    cdef long i
+
+    for i in range(first, last):
+        total = _add(total, f(start + i * step), &compensation, compensated)
+
+    return total + compensation
+
+
+cdef double _poly_block_sum(double[::1] coefficients, double start, double step, long first, long last,
+                            bint compensated) noexcept nogil:
+    cdef double total = 0.0
+    cdef double compensation = 0.0
+    cdef double x, y
+    cdef long i
+    cdef Py_ssize_t j
+
+    for i in range(first, last):
+        x = start + i * step
+        y = 0.0
+        for j in range(coefficients.shape[0]):
+            y = y * x + coefficients[j]
+        total = _add(total, y, &compensation, compensated)
+
+    return total + compensation
+
+
+cdef void _c_grid_sums(c_func f, double start, double step, long count, double[::1] partials,
+                       bint compensated, int n_threads) noexcept nogil:
+    cdef Py_ssize_t block
+    cdef long first
+
+    for block in prange(partials.shape[0], num_threads=n_threads, schedule='static'):
+        first = block * BLOCK_SIZE
+        partials[block] = _c_block_sum(f, start, step, first, min(first + BLOCK_SIZE, count), compensated)
+
+
+cdef void _poly_grid_sums(double[::1] coefficients, double start, double step, long count,
+                          double[::1] partials, bint compensated, int n_threads) noexcept nogil:
+    cdef Py_ssize_t block
+    cdef long first
+
+    for block in prange(partials.shape[0], num_threads=n_threads, schedule='static'):
+        first = block * BLOCK_SIZE
+        partials[block] = _poly_block_sum(coefficients, start, step, first,
+                                          min(first + BLOCK_SIZE, count), compensated)
+
+
+def _resolve_c_integrand(func):
+    """Номер C-функции для func или None, если func не из реестра"""
+    if isinstance(func, str):
+        return C_INTEGRANDS.get(func)
+    try:
+        name = _PY_TO_C.get(func)
+    except TypeError:
+        return None
+    return C_INTEGRANDS.get(name) if name is not None else None
+
+
+def grid_sum(func, double start, double step, long count, int n_threads=1, reduction='naive'):
+    """
+    Сумма func(start + i * step) для i от 0 до count - 1 (см. rules.python_grid_sum),
+    сложенная способом reduction (см. summation.reduce_sum).
+
+    Функции из реестра C_INTEGRANDS и Polynomial считаются без GIL блоками
+    по BLOCK_SIZE точек в n_threads потоках; внутри блока при reduction,
+    отличном от 'naive', используется суммирование Ноймайера.
+    """
+    cdef double total = 0.0
+    cdef long i
+    cdef double[::1] coefficients
+    cdef double[::1] partials
+    cdef c_func c_integrand
+    cdef bint compensated = reduction != 'naive'
+
+    python_grid_sum = make_grid_sum(reduction)
+    index = _resolve_c_integrand(func)
+    if index is not None or isinstance(func, Polynomial):
+        block_sums = array.array('d', bytes(8 * ((count + BLOCK_SIZE - 1) // BLOCK_SIZE)))
+        partials = block_sums
+        if index is not None:
+            c_integrand = _C_TABLE[<int>index]
+            with nogil:
+                _c_grid_sums(c_integrand, start, step, count, partials, compensated, _threads(n_threads))
+        else:
+            coefficients = array.array('d', func.coefficients)
+            with nogil:
+                _poly_grid_sums(coefficients, start, step, count, partials, compensated, _threads(n_threads))
+        return reduce_sum(block_sums, reduction)
+
+    if compensated:
+        return python_grid_sum(func, start, step, count)
+
+    for i in range(count):
+        total += func(start + i * step)
+
+    return total
+
+
+def _reduced_grid_sum(reduction, int n_threads=1):
+    """grid_sum с заданными n_threads и reduction для rules.integrate_rule"""
+    def reduced_grid_sum(f, double start, double step, long count):
+        return grid_sum(f, start, step, count, n_threads, reduction)
+
+    return reduced_grid_sum
+
+
+def integrate_cython_parallel(func, double a, double b, long n_iter=1000, int n_threads=0,
+                              method='midpoint', reduction='naive'):
+    """
+    Интегрирование с циклом prange без GIL для функций из реестра C_INTEGRANDS
+    (sin, cos, tan, exp, log, log2, sqrt - по имени или как math.*) и Polynomial.
+    Остальные функции вычисляются обычным циклом с вызовом Python.
+    Результат не зависит от n_threads (см. grid_sum).
+
+    n_threads - число потоков OpenMP (0 - по числу ядер)
+    reduction - способ суммирования (см. integrate)
+    """
+    if isinstance(func, str):
+        if func not in C_INTEGRANDS:
+            raise ValueError(f"Неизвестная функция: {func}. Доступны: {', '.join(C_INTEGRANDS)}")
+        func = getattr(math, func)
+
+    return rules.integrate_rule(func, a, b, n_iter, method, grid_sum=_reduced_grid_sum(reduction, n_threads))
+
+
+def integrate_cython_pure(func, double a, double b, int n_iter=1000, method='midpoint', reduction='naive'):
+    if method != 'midpoint' or reduction != 'naive':
+        return rules.integrate_rule(func, a, b, n_iter, method, grid_sum=_reduced_grid_sum(reduction))
 
-def integrate_cython_pure(func, double a, double b, int n_iter=1000):
     cdef double h = (b - a) / n_iter
     cdef double total = 0.0
     cdef int i
@@ -16,7 +240,10 @@ def integrate_cython_pure(func, double a, double b, int n_iter=1000):
     return total
 
 
-def integrate_cython_optimized(func, double a, double b, int n_iter=1000):
+def integrate_cython_optimized(func, double a, double b, int n_iter=1000, method='midpoint', reduction='naive'):
+    if method != 'midpoint' or reduction != 'naive':
+        return rules.integrate_rule(func, a, b, n_iter, method, grid_sum=_reduced_grid_sum(reduction))
+
     cdef double h = (b - a) / n_iter
     cdef double total = 0.0
     cdef int i
@@ -29,5 +256,5 @@ def integrate_cython_optimized(func, double a, double b, int n_iter=1000):
     return total * h
 
 
-def integrate_cython(f, a, b, n_iter=1000):
-    return integrate_cython_optimized(f, a, b, n_iter)
\ No newline at end of file
+def integrate_cython(f, a, b, n_iter=1000, method='midpoint', reduction='naive'):
+    return integrate_cython_optimized(f, a, b, n_iter, method, reduction)
@@ -0,0 +1,259 @@
+import collections
+import functools
+import itertools
+import math
+import threading
+import time
+import types
+import weakref
+
+from rules import integrate_rule
+from summation import make_grid_sum, reduce_sum
+
+CACHED_METHODS = ('midpoint', 'trapezoid', 'simpson')
+REFINEMENT_FACTOR = {'midpoint': 3, 'trapezoid': 2, 'simpson': 2}
+
+
+class EvaluationCache:
+    """
+    Кэш значений функций по ключу (функция, x) с ограниченным размером
+    и вытеснением давно не использованных значений (LRU).
+
+    Счетчики hits, misses и evictions показывают, сколько вычислений удалось
+    не делать. Кэш живет в одном процессе: в рабочих процессах integrate_process
+    у каждого процесса будет своя копия.
+
+    >>> cache = EvaluationCache(maxsize=2)
+    >>> square = cache.wrap(lambda x: x * x)
+    >>> square(3.0), square(3.0), cache.hits, cache.misses
+    (9.0, 9.0, 1, 1)
+    """
+
+    def __init__(self, maxsize=1 << 20):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._values = collections.OrderedDict()
+        self._functions = {}
+        self._numbers = itertools.count()
+        self._lock = threading.Lock()
+
+    def _function_key(self, f):
+        """
+        Номер, который f получает при первом обращении к кэшу.
+
+        Кэш держит f только через weakref и не продлевает ей жизнь. Когда f
+        удаляется, номер забывается: новая функция с тем же id получит новый
+        номер, а не чужие значения (они вытеснятся из LRU как давно не нужные).
+        Объекты без поддержки weakref кэш держит обычной ссылкой.
+        """
+        # obj.method каждый раз создает новый объект метода, ключом служит пара (obj, метод)
+        if isinstance(f, types.MethodType):
+            return self._function_key(f.__self__), self._function_key(f.__func__)
+        if isinstance(f, types.BuiltinMethodType) and not isinstance(f.__self__, (types.ModuleType, type(None))):
+            return self._function_key(f.__self__), f.__name__
+
+        entry = self._functions.get(id(f))
+        if entry is None:
+            number = next(self._numbers)
+            try:
+                ref = weakref.ref(f, functools.partial(self._forget, id(f), number))
+            except TypeError:
+                ref = f
+            entry = self._functions[id(f)] = (ref, number)
+        return entry[1]
+
+    def _forget(self, key, number, ref):
+        # Вызывается сборщиком мусора, возможно, под self._lock - поэтому без блокировки
+        entry = self._functions.get(key)
+        if entry is not None and entry[1] == number:
+            del self._functions[key]
+
+    def evaluate(self, f, x):
+        """f(x) из кэша или с вычислением и сохранением"""
+        with self._lock:
+            key = (self._function_key(f), x)
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+
+        value = f(x)
+
+        with self._lock:
+            self.misses += 1
+            self._values[key] = value
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def wrap(self, f):
+        """Функция с тем же поведением, что и f, но с вычислениями через кэш"""
+        return CachedFunction(f, self)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._values),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._values)
+
+
+class CachedFunction:
+    """Обертка f, которая вычисляет значения через EvaluationCache"""
+
+    def __init__(self, f, cache):
+        self.f = f
+        self.cache = cache
+
+    def __call__(self, x):
+        return self.cache.evaluate(self.f, x)
+
+    def __repr__(self):
+        return f"CachedFunction({self.f!r})"
+
+
+default_cache = EvaluationCache()
+
+
+def _node(a, b, p, q):
+    """
+    Точка a + (b - a) * p / q, где дробь p / q предварительно сокращается.
+
+    Одна и та же точка разных сеток (например, середина 1-го из 1 отрезков
+    и середина 2-го из 3 отрезков) дает одинаковую дробь и поэтому в точности
+    одинаковое число x - это и позволяет находить ее в кэше.
+    """
+    g = math.gcd(p, q)
+    return a + (b - a) * (p // g) / (q // g)
+
+
+def _nodes_and_weights(a, b, n_iter, method):
+    """Узлы (в виде сокращаемых дробей) и веса (без множителя шага) формулы"""
+    if method == 'midpoint':
+        return [(2 * i + 1, 2 * n_iter, 1) for i in range(n_iter)], (b - a) / n_iter
+    if method == 'trapezoid':
+        weights = [0.5] + [1] * (n_iter - 1) + [0.5]
+        return [(i, n_iter, weights[i]) for i in range(n_iter + 1)], (b - a) / n_iter
+
+    n_iter += n_iter % 2
+    nodes = []
+    for i in range(n_iter + 1):
+        weight = 1 if i in (0, n_iter) else (4 if i % 2 else 2)
+        nodes.append((i, n_iter, weight))
+    return nodes, (b - a) / n_iter / 3
+
+
+def integrate_cached(f, a, b, n_iter=1000, method='midpoint', cache=None, reduction='naive'):
+    """
+    Вычисляет интеграл, беря значения f из кэша.
+
+    Для 'midpoint', 'trapezoid' и 'simpson' узлы строятся так, что совпадающие
+    точки сеток с разным n_iter совпадают и как числа: середины сетки n
+    входят в сетку 3n, узлы трапеций и Симпсона сетки n - в сетку 2n.
+    Остальные методы вычисляются обычным образом (с тем же reduction), но тоже через кэш.
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - количество разбиений
+    method - квадратурная формула (см. integrate)
+    cache - EvaluationCache (по умолчанию default_cache)
+    reduction - способ суммирования (см. summation.reduce_sum)
+
+    Возвращает:
+    Приближенное значение интеграла (число)
+
+    >>> cache = EvaluationCache()
+    >>> _ = integrate_cached(math.sin, 0, math.pi, 100, cache=cache)
+    >>> _ = integrate_cached(math.sin, 0, math.pi, 300, cache=cache)
+    >>> cache.hits
+    100
+    """
+    if cache is None:
+        cache = default_cache
+    if method not in CACHED_METHODS:
+        return integrate_rule(cache.wrap(f), a, b, n_iter, method, grid_sum=make_grid_sum(reduction))
+
+    nodes, scale = _nodes_and_weights(a, b, n_iter, method)
+    values = (weight * cache.evaluate(f, _node(a, b, p, q)) for p, q, weight in nodes)
+    return reduce_sum(values, reduction) * scale
+
+
+def integrate_refined(f, a, b, tol=1e-8, *, n_start=8, method='midpoint', max_iter=10 ** 7, cache=None):
+    """
+    Увеличивает n_iter (в 3 раза для средних прямоугольников, в 2 раза для
+    трапеций и Симпсона), пока два последних значения не совпадут с точностью tol.
+    Каждый шаг вычисляет f только в новых точках - остальные берутся из кэша.
+
+    Возвращает:
+    Кортеж (значение, оценка ошибки, последнее n_iter)
+    """
+    factor = REFINEMENT_FACTOR[method]
+    n_iter = n_start
+    previous = integrate_cached(f, a, b, n_iter, method, cache)
+
+    while n_iter * factor <= max_iter:
+        n_iter *= factor
+        current = integrate_cached(f, a, b, n_iter, method, cache)
+        error = abs(current - previous)
+        if error <= tol:
+            return current, error, n_iter
+        previous = current
+
+    return previous, float('inf'), n_iter
+
+
+def measure_cache():
+    """
+    Сравнивает последовательность уточнений n = 10, 30, ..., 10 * 3^7 без кэша
+    и с кэшем для «дорогой» функции (20 мкс на вызов).
+    """
+    from integrate import integrate
+
+    def expensive(x):
+        deadline = time.perf_counter() + 2e-5
+        while time.perf_counter() < deadline:
+            pass
+        return math.sin(x)
+
+    levels = [10 * 3 ** k for k in range(8)]
+    cache = EvaluationCache()
+
+    start = time.perf_counter()
+    for n_iter in levels:
+        integrate(expensive, 0, math.pi, n_iter)
+    plain_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for n_iter in levels:
+        integrate_cached(expensive, 0, math.pi, n_iter, cache=cache)
+    cached_time = time.perf_counter() - start
+
+    print("Уточнение n_iter = 10, 30, ..., 21870:")
+    print("-" * 50)
+    print(f"без кэша: {plain_time:8.4f} сек")
+    print(f"с кэшем:  {cached_time:8.4f} сек, {cache.stats()}")
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_cache()
@@ -1,22 +1,61 @@
 import math
 import concurrent.futures
 import multiprocessing
+import sys
+import sysconfig
+import time
 import timeit
 
+import rules
+from pool import get_shared_pool
+from scheduler import split_work
+from summation import make_grid_sum, reduce_sum
+from evalcache import integrate_cached
+from serialization import can_ship, shipped
 
-def integrate(f, a, b, n_iter=1000):
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+N_ITER_VALUES = [100, 1000, 10000, 100000, 1000000]
+ASYNC_MODES = ('auto', 'thread', 'vectorized', 'process')
+
+
+def gil_disabled():
+    """True, если интерпретатор собран без GIL (free-threaded CPython 3.13+) и GIL выключен"""
+    if hasattr(sys, '_is_gil_enabled'):
+        return not sys._is_gil_enabled()
+    return bool(sysconfig.get_config_var('Py_GIL_DISABLED'))
+
+
+def integrate(f, a, b, n_iter=1000, method='midpoint', reduction='naive', cache=None):
     """
-    Вычисляет интеграл функции f от a до b методом средних прямоугольников.
+    Вычисляет интеграл функции f от a до b методом средних прямоугольников
+    или другой квадратурной формулой из rules.
+
+    По умолчанию значения складываются обычным циклом; при большом n_iter
+    ошибка округления растет, и ее можно убрать компенсированным или попарным
+    суммированием (reduction, см. summation.reduce_sum).
 
     Аргументы:
     f - функция, которую интегрируем (например, math.sin)
     a - начало отрезка (число)
     b - конец отрезка (число)
     n_iter - количество разбиений отрезка (целое число)
+    method - 'midpoint', 'trapezoid', 'simpson', 'romberg' или 'gauss_legendre'
+    reduction - 'naive', 'kahan', 'neumaier', 'pairwise' или 'fsum'
+    cache - EvaluationCache: значения f берутся из кэша (см. evalcache.integrate_cached)
 
     Возвращает:
     Приближенное значение интеграла (число)
     """
+    if cache is not None:
+        return integrate_cached(f, a, b, n_iter, method, cache, reduction)
+    if reduction != 'naive':
+        return rules.integrate_rule(f, a, b, n_iter, method, grid_sum=make_grid_sum(reduction))
+    if method != 'midpoint':
+        return rules.integrate_rule(f, a, b, n_iter, method)
 
     h = (b - a) / n_iter
     total = 0.0
@@ -30,68 +69,247 @@ def integrate(f, a, b, n_iter=1000):
     return total
 
 
-def integrate_async(f, a, b, *, n_jobs=2, n_iter=1000):
+if np is not None:
+    # Скалярные функции math, для которых есть векторный аналог в NumPy
+    NUMPY_EQUIVALENTS = {
+        math.sin: np.sin, math.cos: np.cos, math.tan: np.tan,
+        math.exp: np.exp, math.log: np.log, math.log2: np.log2,
+        math.log10: np.log10, math.sqrt: np.sqrt, math.fabs: np.fabs,
+        math.atan: np.arctan, math.sinh: np.sinh, math.cosh: np.cosh,
+        math.tanh: np.tanh,
+    }
+else:
+    NUMPY_EQUIVALENTS = {}
+
+
+def _vector_kernel(f, x):
+    """
+    Подбирает способ вычисления f на массиве точек.
+
+    Сначала f вызывается на массиве целиком (NumPy ufunc или выражение над ними).
+    Если f принимает только скаляры, используется поэлементный обход; к нему же
+    переходит и векторный способ, если на очередном массиве f выдает ошибку.
+
+    Возвращает:
+    Кортеж (функция, которая по массиву точек возвращает массив значений,
+    значения f в точках x), чтобы пробный вызов не пропадал зря
+    """
+    f = NUMPY_EQUIVALENTS.get(f, f)
+
+    def scalar_kernel(points):
+        return np.fromiter(map(f, points.tolist()), dtype=float, count=len(points))
+
+    def vector_kernel(points):
+        try:
+            y = np.asarray(f(points), dtype=float)
+        except (TypeError, ValueError):
+            return None
+        return y if y.shape == points.shape else None
+
+    y = vector_kernel(x)
+    if y is None:
+        return scalar_kernel, scalar_kernel(x)
+
+    def kernel(points):
+        y = vector_kernel(points)
+        return scalar_kernel(points) if y is None else y
+
+    return kernel, y
+
+
+def _numpy_grid_sum(chunk_size, reduction='naive'):
+    """
+    Возвращает функцию суммирования f по равномерной сетке (см. rules.python_grid_sum),
+    которая вычисляет f блоками по chunk_size точек.
+    Внутри блока np.sum складывает попарно, суммы блоков складываются способом reduction.
+
+    Способ вычисления f выбирается по первому блоку хотя бы из двух точек:
+    на массиве из одной точки и скалярная функция (x if x > 0 else -x)
+    отрабатывает без ошибки, а romberg начинает с сетки из одной точки.
+    """
+    kernel = None
+
+    def grid_sum(func, start, step, count):
+        nonlocal kernel
+        block_sums = []
+        for first in range(0, count, chunk_size):
+            last = min(first + chunk_size, count)
+            x = start + np.arange(first, last, dtype=float) * step
+            if kernel is None:
+                chosen, y = _vector_kernel(func, x)
+                if len(x) >= 2:
+                    kernel = chosen
+            else:
+                y = kernel(x)
+            block_sums.append(float(np.sum(y)))
+        return reduce_sum(block_sums, reduction)
+
+    return grid_sum
+
+
+def integrate_vectorized(f, a, b, n_iter=1000, *, chunk_size=65536, method='midpoint', reduction='naive'):
+    """
+    Вычисляет интеграл функции f от a до b, вычисляя f сразу
+    на массиве точек с помощью NumPy.
+
+    Точки обрабатываются блоками по chunk_size, чтобы при больших n_iter
+    не держать в памяти весь массив. Функции math (sin, cos, log2, ...)
+    заменяются на соответствующие ufunc NumPy, функции, принимающие только
+    скаляры, вычисляются поэлементно. Без NumPy используется integrate.
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - количество разбиений отрезка
+    chunk_size - количество точек в одном блоке
+    method - квадратурная формула (см. integrate)
+    reduction - способ сложения сумм блоков (см. integrate)
+
+    Возвращает:
+    Приближенное значение интеграла (число)
+
+    >>> round(integrate_vectorized(math.sin, 0, math.pi, 1000), 5)
+    2.0
+    """
+    if np is None:
+        return integrate(f, a, b, n_iter, method, reduction)
+
+    return rules.integrate_rule(f, a, b, n_iter, method,
+                                grid_sum=_numpy_grid_sum(chunk_size, reduction))
+
+
+def _releases_gil(f):
+    """True, если f считается ufunc NumPy, которая отпускает GIL на массивах"""
+    if np is None:
+        return False
+    try:
+        return f in NUMPY_EQUIVALENTS or isinstance(f, np.ufunc)
+    except TypeError:
+        return False
+
+
+def async_mode(f):
+    """
+    Выбирает, как integrate_async будет считать f:
+    'thread' - обычные потоки, если GIL выключен или f нельзя передать в процесс;
+    'vectorized' - потоки с NumPy по кускам, если f отпускает GIL;
+    'process' - процессы из общего пула в остальных случаях.
+    """
+    if gil_disabled():
+        return 'thread'
+    if _releases_gil(f):
+        return 'vectorized'
+    if can_ship(f):
+        return 'process'
+    return 'thread'
+
+
+def integrate_async(f, a, b, *, n_jobs=2, n_iter=1000, method='midpoint', chunk_size=None, mode='auto',
+                    reduction='naive', timeout=None):
     """
     Вычисляет определенный интеграл функции f на отрезке [a, b]
     с использованием ThreadPoolExecutor (потоков).
 
+    Со стандартным GIL потоки, вызывающие Python-функцию, не работают параллельно,
+    поэтому при mode='auto' путь выбирается функцией async_mode: на free-threaded
+    сборке и для функций, отпускающих GIL (ufunc NumPy), используются потоки,
+    иначе задача передается integrate_process.
+
     Аргументы:
     f - функция, интеграл которой вычисляется.
     a - нижний предел интегрирования.
     b - верхний предел интегрирования.
     n_jobs - количество потоков для параллельного выполнения.
     n_iter - общее количество итераций.
+    method - квадратурная формула для каждой части (см. integrate).
+    chunk_size - разбиений в одном куске работы (см. scheduler.split_work).
+    mode - 'auto', 'thread', 'vectorized' или 'process'.
+    reduction - способ суммирования внутри частей и частичных сумм (см. integrate).
+    timeout - предельное время в секундах; если не успели, TimeoutError
+    (еще не начатые куски отменяются). Управляемое задание - jobs.IntegrationJob.
 
     Возвращает:
     Приближенное значение определенного интеграла.
     """
-    executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
-    step = (b - a) / n_jobs
+    if mode not in ASYNC_MODES:
+        raise ValueError(f"Неизвестный режим: {mode}. Доступны: {', '.join(ASYNC_MODES)}")
+    if mode == 'auto':
+        mode = async_mode(f)
 
-    futures = []
-    for i in range(n_jobs):
-        start = a + i * step
-        end = a + (i + 1) * step
-        futures.append(executor.submit(integrate, f, start, end, n_iter // n_jobs))
+    if mode == 'process':
+        return integrate_process(f, a, b, n_jobs=n_jobs, n_iter=n_iter, method=method,
+                                 chunk_size=chunk_size, reduction=reduction, timeout=timeout)
+
+    part_integrate = integrate_vectorized if mode == 'vectorized' else integrate
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
 
-    result = 0.0
-    for future in concurrent.futures.as_completed(futures):
-        result += future.result()
+    try:
+        futures = []
+        for start, end, part in split_work(a, b, n_iter, n_jobs=n_jobs, chunk_size=chunk_size):
+            futures.append(executor.submit(part_integrate, f, start, end, part,
+                                           method=method, reduction=reduction))
 
-    executor.shutdown()
-    return result
+        # Частичные суммы складываются в порядке кусков, поэтому результат не зависит от потоков
+        return reduce_sum(_wait_all(futures, timeout), reduction)
+    finally:
+        # Выполняется и при исключении в куске или по таймауту: потоки не остаются висеть
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
-def integrate_process(f, a, b, *, n_jobs=2, n_iter=1000):
+def integrate_process(f, a, b, *, n_jobs=2, n_iter=1000, method='midpoint', chunk_size=None, pool=None,
+                      reduction='naive', timeout=None):
     """
     Вычисляет определенный интеграл функции f на отрезке [a, b]
     с использованием ProcessPoolExecutor (процессов).
 
+    f передается в процессы через serialization.shipped, поэтому подходят
+    и lambda, и замыкания: функция отправляется в каждый процесс один раз.
+
     Аргументы:
     f - функция, интеграл которой вычисляется.
     a - нижний предел интегрирования.
     b - верхний предел интегрирования.
     n_jobs - количество процессов для параллельного выполнения.
     n_iter - общее количество итераций.
+    method - квадратурная формула для каждой части (см. integrate).
+    chunk_size - разбиений в одном куске работы (см. scheduler.split_work).
+    pool - WorkerPool, процессы которого используются (по умолчанию общий пул).
+    reduction - способ суммирования внутри частей и частичных сумм (см. integrate).
+    timeout - предельное время в секундах (см. integrate_async).
 
     Возвращает:
     Приближенное значение определенного интеграла.
     """
-    executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs)
-    step = (b - a) / n_jobs
+    pool = pool or get_shared_pool()
 
     futures = []
-    for i in range(n_jobs):
-        start = a + i * step
-        end = a + (i + 1) * step
-        futures.append(executor.submit(integrate, f, start, end, n_iter // n_jobs))
+    try:
+        with shipped(f) as function:
+            for start, end, part in split_work(a, b, n_iter, n_jobs=n_jobs, chunk_size=chunk_size):
+                futures.append(pool.submit(n_jobs, integrate, function, start, end, part, method, reduction))
 
-    result = 0.0
-    for future in concurrent.futures.as_completed(futures):
-        result += future.result()
+            return reduce_sum(_wait_all(futures, timeout), reduction)
+    finally:
+        # Пул общий и остается жить, но ненужные больше куски в нем не выполняются
+        for future in futures:
+            future.cancel()
 
-    executor.shutdown()
-    return result
+
+def _wait_all(futures, timeout=None):
+    """
+    Результаты futures по порядку. Если за timeout секунд готовы не все,
+    возбуждает TimeoutError; при ошибке в куске возбуждает ее сразу,
+    не дожидаясь остальных.
+    """
+    done, not_done = concurrent.futures.wait(futures, timeout=timeout,
+                                             return_when=concurrent.futures.FIRST_EXCEPTION)
+    if not_done:
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        raise TimeoutError(f"Интеграл не вычислен за {timeout} сек: готово {len(done)} из {len(futures)} кусков")
+    return [future.result() for future in futures]
 
 
 def worker(args):
@@ -99,21 +317,23 @@ def worker(args):
     Вспомогательная функция для вычисления части интеграла.
 
     Аргументы:
-    args - кортеж (f, start, end, n_iter)
+    args - кортеж (f, start, end, n_iter), дополнительно могут быть method и reduction
 
     Возвращает:
     Значение части интеграла.
     """
-    f, start, end, n_iter = args
-    return integrate(f, start, end, n_iter)
+    f, start, end, n_iter, *rest = args
+    return integrate(f, start, end, n_iter, *rest)
 
 
-def integrate_processes_mp(f, a, b, *, n_jobs=2, n_iter=1000):
+def integrate_processes_mp(f, a, b, *, n_jobs=2, n_iter=1000, method='midpoint', chunk_size=None, pool=None,
+                           reduction='naive', timeout=None):
     """
     Вычисляет определенный интеграл функции f на отрезке [a, b]
     с использованием multiprocessing.Pool.
     Использование multiProcessing будет давать очень близкий результат к noGIL
     noGIL установить не удалось
+    f передается в процессы так же, как в integrate_process.
 
     Аргументы:
     f - функция, интеграл которой вычисляется.
@@ -121,47 +341,125 @@ def integrate_processes_mp(f, a, b, *, n_jobs=2, n_iter=1000):
     b - верхний предел интегрирования.
     n_jobs - количество процессов для параллельного выполнения.
     n_iter - общее количество итераций.
+    method - квадратурная формула для каждой части (см. integrate).
+    chunk_size - разбиений в одном куске работы (см. scheduler.split_work).
+    pool - WorkerPool, процессы которого используются (по умолчанию общий пул).
+    reduction - способ суммирования внутри частей и частичных сумм (см. integrate).
+    timeout - предельное время в секундах; если не успели, TimeoutError.
+    Отменить уже отданные multiprocessing.Pool куски нельзя - они досчитаются
+    в пуле, а их результаты будут отброшены.
 
     Возвращает:
     Приближенное значение определенного интеграла.
     """
-    step = (b - a) / n_jobs
+    with shipped(f) as function:
+        tasks = []
+        for start, end, part in split_work(a, b, n_iter, n_jobs=n_jobs, chunk_size=chunk_size):
+            tasks.append((function, start, end, part, method, reduction))
+
+        # imap раздает куски по мере освобождения процессов, но отдает результаты по порядку
+        results = (pool or get_shared_pool()).imap(n_jobs, worker, tasks)
+        if timeout is None:
+            return reduce_sum(results, reduction)
+
+        deadline = time.monotonic() + timeout
+        values = []
+        try:
+            for _ in tasks:
+                values.append(results.next(max(0.0, deadline - time.monotonic())))
+        except multiprocessing.TimeoutError:
+            raise TimeoutError(f"Интеграл не вычислен за {timeout} сек: "
+                               f"готово {len(values)} из {len(tasks)} кусков") from None
+        return reduce_sum(values, reduction)
 
-    tasks = []
-    for i in range(n_jobs):
-        start = a + i * step
-        end = a + (i + 1) * step
-        tasks.append((f, start, end, n_iter // n_jobs))
 
-    with multiprocessing.Pool(processes=n_jobs) as pool:
-        results = pool.map(worker, tasks)
+def measure_performance():
+    """
+    Замеряет время выполнения integrate для разных n_iter.
+    Полный перебор бэкендов с сохранением отчета - в benchmark.py.
+    """
+    from benchmark import run_suite, format_case
 
-    return sum(results)
+    print("Замер времени выполнения функции integrate:")
+    print("-" * 50)
 
+    for case in run_suite(['serial'], ['sin'], n_iters=N_ITER_VALUES, n_jobs_values=(1,)):
+        print(f"{format_case(case)}, ошибка = {abs(2 - case['result']):.8f}")
 
-def measure_performance():
+    print("-" * 50)
+
+
+def measure_vectorized_performance():
     """
-    Замеряет время выполнения для разных n_iter.
+    Сравнивает integrate и integrate_vectorized на тех же n_iter,
+    что и measure_performance.
     """
-    print("Замер времени выполнения функции integrate:")
+    print("Сравнение integrate и integrate_vectorized:")
+    print("-" * 50)
+
+    for n_iter in N_ITER_VALUES:
+        loop_time = min(timeit.repeat(lambda: integrate(math.sin, 0, math.pi, n_iter),
+                                      repeat=3, number=1))
+        vector_time = min(timeit.repeat(lambda: integrate_vectorized(math.sin, 0, math.pi, n_iter),
+                                        repeat=3, number=1))
+        result = integrate_vectorized(math.sin, 0, math.pi, n_iter)
+
+        print(f"n_iter = {n_iter:8d}: цикл = {loop_time:8.4f} сек, "
+              f"NumPy = {vector_time:8.4f} сек, ускорение = {loop_time / vector_time:6.1f}x, "
+              f"ошибка = {abs(2 - result):.8f}")
+
+    print("-" * 50)
+
+
+def measure_async_scaling(n_iter=1000000):
+    """
+    Замеряет ускорение integrate_async относительно одного потока
+    в каждом режиме для 1, 2, 4, ... ядер до os.cpu_count() (autotune.job_counts).
+    """
+    from autotune import job_counts
+
+    print(f"Масштабирование integrate_async, n_iter = {n_iter}, "
+          f"GIL {'выключен' if gil_disabled() else 'включен'}:")
     print("-" * 50)
 
-    n_iter_values = [100, 1000, 10000, 100000, 1000000]
+    for mode in ('thread', 'vectorized', 'process'):
+        base_time = None
+        for n_jobs in job_counts():
+            elapsed = min(timeit.repeat(
+                lambda: integrate_async(math.sin, 0, math.pi, n_jobs=n_jobs, n_iter=n_iter, mode=mode),
+                repeat=3, number=1))
+            base_time = base_time or elapsed
+            print(f"{mode:10s} n_jobs = {n_jobs:2d}: время = {elapsed:8.4f} сек, "
+                  f"ускорение = {base_time / elapsed:5.2f}x")
+
+    print(f"Режим по умолчанию для math.sin: {async_mode(math.sin)}")
+    print("-" * 50)
 
-    for n_iter in n_iter_values:
-        timer = timeit.Timer(
-            stmt="integrate(math.sin, 0, math.pi, n_iter)",
-            setup="from __main__ import integrate, math",
-            globals={'n_iter': n_iter}
-        )
 
-        times = timer.repeat(repeat=5, number=1)
-        min_time = min(times)
+def measure_cython_parallel(n_iter=10000000):
+    """
+    Сравнивает integrate_cython_parallel (prange без GIL) с разным числом потоков
+    и integrate_processes_mp на одном большом интеграле.
+    """
+    try:
+        from cython_integrate import integrate_cython_parallel
+    except ImportError:
+        print("cython_integrate не собран: python setup.py build_ext --inplace")
+        return
+
+    print(f"Интеграл sin на [0, pi], n_iter = {n_iter}:")
+    print("-" * 50)
 
-        result = integrate(math.sin, 0, math.pi, n_iter)
+    mp_time = min(timeit.repeat(lambda: integrate_processes_mp(math.sin, 0, math.pi, n_jobs=4, n_iter=n_iter),
+                                repeat=3, number=1))
+    print(f"integrate_processes_mp (4 процесса): {mp_time:8.4f} сек")
 
-        print(f"n_iter = {n_iter:8d}: время = {min_time:8.4f} сек, "
-              f"результат = {result:10.8f}, ошибка = {abs(2 - result):.8f}")
+    for n_threads in (1, 2, 4, 8):
+        cython_time = min(timeit.repeat(
+            lambda: integrate_cython_parallel(math.sin, 0, math.pi, n_iter, n_threads=n_threads),
+            repeat=3, number=1))
+        print(f"integrate_cython_parallel ({n_threads} потоков): {cython_time:8.4f} сек, "
+              f"ускорение = {mp_time / cython_time:6.1f}x")
 
     print("-" * 50)
 
@@ -171,4 +469,7 @@ if __name__ == "__main__":
 
     doctest.testmod(verbose=True)
 
-    measure_performance()
\ No newline at end of file
+    measure_performance()
+    measure_vectorized_performance()
+    measure_async_scaling()
+    measure_cython_parallel()
\ No newline at end of file
@@ -0,0 +1,374 @@
+import ast
+import functools
+import inspect
+import keyword
+import linecache
+import math
+import textwrap
+import timeit
+
+import rules
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+JIT_BACKENDS = ('auto', 'numpy', 'numba', 'python')
+CHUNK_SIZE = 65536
+PROBE_POINTS = 5
+
+# Разрешенные функции: имя в выражении -> (имя в math, имя в NumPy)
+FUNCTIONS = {
+    'sin': ('sin', 'sin'), 'cos': ('cos', 'cos'), 'tan': ('tan', 'tan'),
+    'asin': ('asin', 'arcsin'), 'acos': ('acos', 'arccos'), 'atan': ('atan', 'arctan'),
+    'arcsin': ('asin', 'arcsin'), 'arccos': ('acos', 'arccos'), 'arctan': ('atan', 'arctan'),
+    'sinh': ('sinh', 'sinh'), 'cosh': ('cosh', 'cosh'), 'tanh': ('tanh', 'tanh'),
+    'exp': ('exp', 'exp'), 'log': ('log', 'log'), 'log2': ('log2', 'log2'),
+    'log10': ('log10', 'log10'), 'sqrt': ('sqrt', 'sqrt'), 'fabs': ('fabs', 'fabs'),
+    'abs': ('fabs', 'abs'), 'floor': ('floor', 'floor'), 'ceil': ('ceil', 'ceil'),
+}
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+MODULES = ('math', 'np', 'numpy')
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd)
+
+
+class _Restrictor(ast.NodeTransformer):
+    """
+    Проверяет, что выражение состоит только из переменной, чисел, арифметики
+    и функций из FUNCTIONS, и приводит math.sin / np.sin к sin.
+    Числовые переменные из замыкания или глобальных имен функции подставляются как константы.
+    """
+
+    def __init__(self, variable, constants):
+        self.variable = variable
+        self.constants = constants
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load) + OPERATORS):
+            raise ValueError(f"Недопустимая конструкция в подынтегральном выражении: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ValueError(f"Недопустимая константа: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        if node.id == self.variable:
+            return node
+        if node.id in CONSTANTS:
+            return ast.copy_location(ast.Constant(CONSTANTS[node.id]), node)
+        value = self.constants.get(node.id)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return ast.copy_location(ast.Constant(value), node)
+        raise ValueError(f"Неизвестное имя: {node.id}")
+
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id in MODULES and node.attr in CONSTANTS:
+            return ast.copy_location(ast.Constant(CONSTANTS[node.attr]), node)
+        raise ValueError(f"Недопустимое обращение к атрибуту: {ast.unparse(node)}")
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in MODULES:
+            name = func.attr
+        elif isinstance(func, ast.Name):
+            name = func.id
+        else:
+            raise ValueError(f"Недопустимый вызов: {ast.unparse(node)}")
+
+        if name not in FUNCTIONS or len(node.args) != 1 or node.keywords:
+            raise ValueError(f"Функция не поддерживается: {name}")
+        return ast.copy_location(ast.Call(ast.Name(name, ast.Load()), [self.visit(node.args[0])], []), node)
+
+
+def _lambda_body(f):
+    """
+    Выражение из тела lambda. lambda часто стоит внутри вызова, на одной строке
+    с другими или на нескольких строках, поэтому его текст берется по позициям
+    инструкций кода (co_positions, Python 3.11+), а не из inspect.getsource.
+    """
+    code = f.__code__
+    if not hasattr(code, 'co_positions'):
+        raise ValueError("Разбор lambda требует Python 3.11+; передайте выражение строкой")
+
+    spans = [(line, col, end_line, end_col) for line, end_line, col, end_col in code.co_positions()
+             if None not in (line, end_line, col, end_col) and (col, end_col) != (0, 0)]
+    lines = linecache.getlines(code.co_filename)
+    if not spans or not lines:
+        raise OSError("could not get source code")
+
+    first_line, first_col = min((line, col) for line, col, _, _ in spans)
+    last_line, last_col = max((end_line, end_col) for _, _, end_line, end_col in spans)
+
+    # Позиции заданы в байтах UTF-8
+    chunk = [line.encode() for line in lines[first_line - 1:last_line]]
+    if len(chunk) == 1:
+        text = chunk[0][first_col:last_col]
+    else:
+        text = chunk[0][first_col:] + b''.join(chunk[1:-1]) + chunk[-1][:last_col]
+    try:
+        return ast.parse(f"({text.decode()})", mode='eval').body
+    except SyntaxError as error:
+        raise ValueError("Не удалось выделить выражение lambda") from error
+
+
+def _expression_of(f):
+    """Выражение, имя переменной и известные числовые имена для lambda или def f(x): return ..."""
+    code = f.__code__
+    if code.co_argcount != 1 or code.co_kwonlyargcount or code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS):
+        raise ValueError("Функция должна принимать ровно один аргумент")
+
+    if f.__name__ == '<lambda>':
+        body = _lambda_body(f)
+    else:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(f)))
+        function = tree.body[0]
+        if not isinstance(function, ast.FunctionDef) or len(function.body) != 1 \
+                or not isinstance(function.body[0], ast.Return):
+            raise ValueError("Функция должна состоять из одного return")
+        body = function.body[0].value
+
+    closure = inspect.getclosurevars(f)
+    constants = dict(closure.globals)
+    constants.update(closure.nonlocals)
+    return body, code.co_varnames[0], constants
+
+
+def _parse_expression(expression):
+    """Дерево выражения из строки (ValueError, если это не выражение)"""
+    if not isinstance(expression, str):
+        raise ValueError(f"Выражение должно быть строкой: {expression!r}")
+    try:
+        return ast.parse(expression.strip(), mode='eval').body
+    except SyntaxError as error:
+        raise ValueError(f"Не удалось разобрать выражение: {expression}") from error
+
+
+def _numba_kernel(expression, variable):
+    """Скомпилированная Numba сумма выражения по равномерной сетке"""
+    namespace = {name: getattr(math, math_name) for name, (math_name, _) in FUNCTIONS.items()}
+    source = (f"def grid_sum(start, step, count):\n"
+              f"    total = 0.0\n"
+              f"    for i in range(count):\n"
+              f"        {variable} = start + i * step\n"
+              f"        total += {expression}\n"
+              f"    return total\n")
+    exec(source, namespace)
+    return numba.njit(namespace['grid_sum'])
+
+
+class CompiledIntegrand:
+    """
+    Подынтегральное выражение, скомпилированное в скалярную функцию (math),
+    векторную (NumPy) и, если установлен Numba, в машинный код суммы по сетке.
+
+    Объект вызывается как обычная функция одного аргумента и передается
+    в процессы по тексту выражения (в процессе компилируется заново).
+
+    >>> f = compile_integrand('x**3 + sin(x)')
+    >>> f(0.0), f.expression
+    (0.0, 'x ** 3 + sin(x)')
+    """
+
+    def __init__(self, expression, variable='x', backend='auto'):
+        if backend not in JIT_BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд: {backend}. Доступны: {', '.join(JIT_BACKENDS)}")
+        if not isinstance(variable, str) or not variable.isidentifier() or keyword.iskeyword(variable):
+            raise ValueError(f"Недопустимое имя переменной: {variable!r}")
+
+        # Текст выполняется через eval, а объект создается и при распаковке в рабочем
+        # процессе (__reduce__), поэтому выражение проверяется здесь, а не только в compile_integrand;
+        # компилируется проверенный и приведенный к FUNCTIONS текст self.expression
+        body = _Restrictor(variable, {}).visit(_parse_expression(expression))
+        self.expression = ast.unparse(body)
+        self.variable = variable
+        self.requested_backend = backend
+
+        math_namespace = {name: getattr(math, math_name) for name, (math_name, _) in FUNCTIONS.items()}
+        self.scalar = eval(f"lambda {variable}: {self.expression}", math_namespace)
+
+        self.vector = None
+        if np is not None:
+            numpy_namespace = {name: getattr(np, numpy_name) for name, (_, numpy_name) in FUNCTIONS.items()}
+            self.vector = eval(f"lambda {variable}: {self.expression}", numpy_namespace)
+
+        self._numba_grid_sum = None
+        if backend in ('auto', 'numba') and numba is not None:
+            self._numba_grid_sum = _numba_kernel(self.expression, variable)
+            self.backend = 'numba'
+        elif backend != 'python' and np is not None:
+            self.backend = 'numpy'
+        else:
+            self.backend = 'python'
+
+    def __call__(self, x):
+        return self.scalar(x)
+
+    def __reduce__(self):
+        return CompiledIntegrand, (self.expression, self.variable, self.requested_backend)
+
+    def __repr__(self):
+        return f"CompiledIntegrand({self.expression!r}, backend={self.backend!r})"
+
+    def grid_sum(self, f, start, step, count):
+        """Сумма выражения в точках start + i * step (см. rules.python_grid_sum); f не используется"""
+        if self.backend == 'numba':
+            return self._numba_grid_sum(float(start), float(step), int(count))
+        if self.backend == 'python':
+            return rules.python_grid_sum(self.scalar, start, step, count)
+
+        total = 0.0
+        for first in range(0, count, CHUNK_SIZE):
+            x = start + np.arange(first, min(first + CHUNK_SIZE, count), dtype=float) * step
+            total += float(np.sum(np.broadcast_to(self.vector(x), x.shape)))
+        return total
+
+
+def _function_name(f):
+    """Имя функции math или ufunc NumPy в обозначениях FUNCTIONS"""
+    name = getattr(f, '__name__', None)
+    if name in FUNCTIONS:
+        return name
+    for alias, (_, numpy_name) in FUNCTIONS.items():
+        if name == numpy_name:
+            return alias
+    return name
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_expression(expression, variable, backend):
+    return CompiledIntegrand(expression, variable, backend)
+
+
+def compile_integrand(f, backend='auto'):
+    """
+    Компилирует подынтегральное выражение.
+
+    Аргументы:
+    f - строка с выражением от x ('x**3 + sin(x)'), lambda или функция вида
+        def f(x): return <выражение> с арифметикой и функциями из FUNCTIONS
+        (как sin, math.sin или np.sin); числовые переменные из замыкания
+        подставляются как константы
+    backend - 'auto' (Numba, если установлен, иначе NumPy), 'numpy', 'numba' или 'python';
+              без Numba 'numba' тоже работает через NumPy (см. атрибут backend)
+
+    Возвращает:
+    CompiledIntegrand; если выражение не поддерживается - ValueError
+    """
+    if isinstance(f, CompiledIntegrand):
+        return f
+
+    if isinstance(f, str):
+        body, variable, constants = _parse_expression(f), 'x', {}
+    elif getattr(f, '__module__', None) in ('math', 'numpy') and _function_name(f) in FUNCTIONS:
+        body, variable, constants = ast.parse(f"{_function_name(f)}(x)", mode='eval').body, 'x', {}
+    else:
+        try:
+            body, variable, constants = _expression_of(f)
+        except (OSError, TypeError, AttributeError) as error:
+            raise ValueError(f"Нет исходного кода для {f!r}") from error
+
+    body = _Restrictor(variable, constants).visit(body)
+    return _compile_expression(ast.unparse(body), variable, backend)
+
+
+def integrate_jit(f, a, b, n_iter=1000, *, method='midpoint', backend='auto'):
+    """
+    Вычисляет интеграл, предварительно скомпилировав f (см. compile_integrand):
+    сумма по сетке считается NumPy по блокам или циклом Numba без вызовов Python.
+    Если f не удается скомпилировать или результат расходится с f
+    в пробных точках отрезка, используется integrate_vectorized.
+
+    Аргументы:
+    f - строка с выражением, lambda или функция одного аргумента
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - количество разбиений
+    method - квадратурная формула (см. integrate)
+    backend - см. compile_integrand
+
+    Возвращает:
+    Приближенное значение интеграла (число)
+
+    >>> round(integrate_jit('sin(x)', 0, math.pi, 1000, method='simpson'), 9)
+    2.0
+    """
+    try:
+        compiled = compile_integrand(f, backend)
+        if not isinstance(f, (str, CompiledIntegrand)):
+            _check_matches(compiled, f, a, b)
+    except ValueError:
+        if isinstance(f, str):
+            raise
+        from integrate import integrate_vectorized
+
+        return integrate_vectorized(f, a, b, n_iter, method=method)
+
+    return rules.integrate_rule(compiled, a, b, n_iter, method, grid_sum=compiled.grid_sum)
+
+
+def _check_matches(compiled, f, a, b):
+    """Сверяет скомпилированное выражение с f в нескольких точках [a, b] (ValueError при расхождении)"""
+    for i in range(PROBE_POINTS):
+        x = a + (b - a) * (i + 0.5) / PROBE_POINTS
+        try:
+            expected = float(f(x))
+        except (ValueError, ZeroDivisionError, OverflowError):
+            continue
+        except TypeError as error:
+            # Например, x ** 0.5 при x < 0 дает комплексное число, а сетка считается в float
+            raise ValueError(f"{f!r} не возвращает вещественное число в точке {x}") from error
+        try:
+            actual = float(compiled(x))
+        except (ArithmeticError, ValueError, TypeError) as error:
+            raise ValueError(f"Скомпилированное выражение не вычисляется в точке {x}") from error
+        if not math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-12):
+            raise ValueError(f"Скомпилированное выражение не совпадает с {f!r} в точке {x}")
+
+
+def measure_jit(n_iter=1000000):
+    """
+    Пропускная способность (вычислений в секунду) integrate с lambda
+    и integrate_jit с тем же выражением для типичных подынтегральных функций.
+    """
+    from integrate import integrate
+
+    integrands = {
+        'x**3 + sin(x)': lambda x: x ** 3 + math.sin(x),
+        'log2(x)': lambda x: math.log2(x),
+        'cos(x)': lambda x: math.cos(x),
+        'exp(-x*x)': lambda x: math.exp(-x * x),
+    }
+
+    print(f"Пропускная способность при n_iter = {n_iter}:")
+    print("-" * 70)
+
+    for expression, f in integrands.items():
+        plain_time = min(timeit.repeat(lambda: integrate(f, 1, 2, n_iter), repeat=3, number=1))
+        line = f"{expression:15s}: integrate = {n_iter / plain_time:12.0f}/сек"
+        for backend in ('numpy', 'numba'):
+            if backend == 'numba' and numba is None:
+                line += ", numba не установлен"
+                continue
+            integrate_jit(expression, 1, 2, 1000, backend=backend)
+            jit_time = min(timeit.repeat(lambda: integrate_jit(expression, 1, 2, n_iter, backend=backend),
+                                         repeat=3, number=1))
+            line += f", {backend} = {n_iter / jit_time:12.0f}/сек"
+        print(line)
+
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_jit()
@@ -0,0 +1,233 @@
+import concurrent.futures
+import contextlib
+import functools
+import math
+import threading
+import time
+
+from integrate import integrate, integrate_vectorized
+from pool import get_shared_pool
+from scheduler import split_work
+from serialization import shipped
+from summation import reduce_sum
+
+JOB_BACKENDS = ('thread', 'vectorized', 'process')
+POLL_INTERVAL = 0.05
+
+
+class IntegrationJob:
+    """
+    Интеграл, который считается в фоне по кускам (scheduler.split_work)
+    и которым можно управлять, пока он считается.
+
+    - deadline: timeout секунд на все задание; по его истечении задание
+      останавливается, а result() возбуждает TimeoutError;
+    - отмена: cancel() (или выход из with до завершения);
+    - прогресс: on_progress(готово кусков, всего кусков) после каждого куска,
+      а также атрибуты completed, total и progress.
+
+    Отмена кооперативная: еще не начатые куски не запускаются, а уже
+    выполняющиеся досчитываются, поэтому задание останавливается не позже,
+    чем закончится самый долгий текущий кусок (его размер задает chunk_size).
+    Собственный пул потоков задания закрывается при любом исходе; общий пул
+    процессов остается жить, но оставшиеся куски в нем отменяются.
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - количество разбиений
+    backend - 'thread', 'vectorized' (потоки с NumPy) или 'process'
+    n_jobs - количество потоков или процессов
+    method - квадратурная формула (см. integrate)
+    chunk_size - разбиений в одном куске работы
+    reduction - способ суммирования (см. integrate)
+    timeout - предельное время всего задания в секундах (None - без ограничения)
+    on_progress - функция (completed, total), вызывается из фонового потока
+    pool - WorkerPool для backend='process' (по умолчанию общий пул)
+
+    >>> with IntegrationJob(math.sin, 0, math.pi, 1000, backend='thread') as job:
+    ...     round(job.result(), 6), job.progress
+    (2.000001, 1.0)
+    """
+
+    def __init__(self, f, a, b, n_iter=1000, *, backend='process', n_jobs=2, method='midpoint',
+                 chunk_size=None, reduction='naive', timeout=None, on_progress=None, pool=None):
+        if backend not in JOB_BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд: {backend}. Доступны: {', '.join(JOB_BACKENDS)}")
+
+        chunks = list(split_work(a, b, n_iter, n_jobs=n_jobs, chunk_size=chunk_size))
+        self.total = len(chunks)
+        self.completed = 0
+        self.timeout = timeout
+        self.reduction = reduction
+        self.on_progress = on_progress
+        self.started = time.monotonic()
+        self._deadline = None if timeout is None else self.started + timeout
+        self._partials = [None] * self.total
+        self._value = None
+        self._error = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._resources = contextlib.ExitStack()
+
+        if backend == 'process':
+            self._executor = None
+            self._submit = functools.partial((pool or get_shared_pool()).submit, n_jobs)
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+            self._submit = self._executor.submit
+
+        part_integrate = integrate_vectorized if backend == 'vectorized' else integrate
+        self._futures = []
+        try:
+            if backend == 'process':
+                f = self._resources.enter_context(shipped(f))
+            for start, end, part in chunks:
+                self._futures.append(self._submit(part_integrate, f, start, end, part,
+                                                  method=method, reduction=reduction))
+            self._collector = threading.Thread(target=self._collect, daemon=True)
+            self._collector.start()
+        except BaseException:
+            self._release()
+            raise
+
+    def _collect(self):
+        index = {future: i for i, future in enumerate(self._futures)}
+        pending = set(self._futures)
+        try:
+            while pending and not self._cancelled.is_set():
+                wait_time = POLL_INTERVAL
+                if self._deadline is not None:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Интеграл не вычислен за {self.timeout} сек: "
+                                           f"готово {self.completed} из {self.total} кусков")
+                    wait_time = min(wait_time, remaining)
+
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=wait_time, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    self._partials[index[future]] = future.result()
+                    self.completed += 1
+                    if self.on_progress is not None:
+                        self.on_progress(self.completed, self.total)
+
+            if not self._cancelled.is_set():
+                # Порядок кусков тот же, что у integrate_async - и результат тот же
+                self._value = reduce_sum(self._partials, self.reduction)
+        except BaseException as error:
+            self._error = error
+        finally:
+            self._release()
+            self._finished.set()
+
+    def _release(self):
+        for future in self._futures:
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._resources.close()
+
+    @property
+    def progress(self):
+        """Доля готовых кусков (от 0 до 1)"""
+        return self.completed / self.total if self.total else 1.0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def done(self):
+        """True, если задание завершилось (успешно, с ошибкой, по таймауту или отменой)"""
+        return self._finished.is_set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Отменить задание: оставшиеся куски не запускаются.
+
+        Возвращает:
+        False, если задание уже завершилось, иначе True
+        """
+        if self.done():
+            return False
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+        return True
+
+    def wait(self, timeout=None):
+        """Ждать завершения не дольше timeout секунд; True, если задание завершилось"""
+        return self._finished.wait(timeout)
+
+    def result(self, timeout=None):
+        """
+        Значение интеграла. Ждет не дольше timeout секунд (само задание при этом
+        продолжается) и возбуждает TimeoutError, если не дождались.
+        Отмененное задание возбуждает concurrent.futures.CancelledError,
+        задание с ошибкой в куске или с истекшим deadline - эту ошибку.
+        """
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"Задание не завершилось за {timeout} сек "
+                               f"(готово {self.completed} из {self.total} кусков)")
+        if self._error is not None:
+            raise self._error
+        if self._cancelled.is_set():
+            raise concurrent.futures.CancelledError("Задание отменено")
+        return self._value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cancel()
+        self._finished.wait()
+
+    def __repr__(self):
+        if not self.done():
+            state = f"выполняется, {self.completed}/{self.total}"
+        elif self._error is not None:
+            state = f"ошибка {type(self._error).__name__}"
+        elif self._cancelled.is_set():
+            state = "отменено"
+        else:
+            state = f"готово, {self._value!r}"
+        return f"<IntegrationJob {state}>"
+
+
+def measure_job_overhead():
+    """Сравнивает integrate_async и IntegrationJob с отслеживанием прогресса на одних и тех же кусках."""
+    from integrate import integrate_async
+
+    n_iter = 1000000
+    chunk_size = n_iter // 64
+
+    start = time.perf_counter()
+    integrate_async(math.sin, 0, math.pi, n_jobs=2, n_iter=n_iter, chunk_size=chunk_size, mode='thread')
+    plain_time = time.perf_counter() - start
+
+    updates = []
+    start = time.perf_counter()
+    with IntegrationJob(math.sin, 0, math.pi, n_iter, backend='thread', chunk_size=chunk_size,
+                        on_progress=lambda completed, total: updates.append(completed)) as job:
+        job.result()
+    job_time = time.perf_counter() - start
+
+    print(f"Задание с прогрессом, n_iter = {n_iter}, кусков = {len(updates)}:")
+    print("-" * 50)
+    print(f"integrate_async: {plain_time:8.4f} сек")
+    print(f"IntegrationJob:  {job_time:8.4f} сек")
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_job_overhead()
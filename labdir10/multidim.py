@@ -0,0 +1,389 @@
+import math
+import timeit
+
+from pool import get_shared_pool
+from rules import gauss_legendre_nodes
+from serialization import shipped
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SEQUENCES = ('random', 'halton', 'sobol')
+PRODUCT_RULES = ('midpoint', 'gauss_legendre')
+CHUNK_SIZE = 1 << 16
+PRODUCT_MAX_DIM = 3
+
+# Направляющие числа Соболя (Joe, Kuo): для измерений 2..16 - (степень s,
+# коэффициенты a примитивного многочлена, начальные m_1..m_s)
+SOBOL_DIRECTIONS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+]
+SOBOL_MAX_DIM = len(SOBOL_DIRECTIONS) + 1
+SOBOL_BITS = 32
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для многомерного интегрирования нужен NumPy")
+
+
+def _first_primes(count):
+    primes = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def halton_points(start, count, dim):
+    """
+    Точки start..start + count - 1 последовательности Халтона в [0, 1)^dim
+    (обратные по основаниям 2, 3, 5, ... номера точек).
+    """
+    _require_numpy()
+    indices = np.arange(start, start + count, dtype=np.int64)
+    points = np.empty((count, dim))
+    for axis, base in enumerate(_first_primes(dim)):
+        n = indices.copy()
+        value = np.zeros(count)
+        factor = 1.0 / base
+        while n.any():
+            value += (n % base) * factor
+            n //= base
+            factor /= base
+        points[:, axis] = value
+    return points
+
+
+def sobol_directions(dim):
+    """Направляющие числа v_k (целые по SOBOL_BITS бит) для первых dim измерений"""
+    if dim > SOBOL_MAX_DIM:
+        raise ValueError(f"Последовательность Соболя реализована до {SOBOL_MAX_DIM} измерений; "
+                         f"используйте sequence='halton' или 'random'")
+
+    directions = [[1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]]
+    for s, a, initial in SOBOL_DIRECTIONS[:dim - 1]:
+        m = list(initial)
+        for k in range(s, SOBOL_BITS):
+            value = m[k - s] ^ (m[k - s] << s)
+            for j in range(1, s):
+                if (a >> (s - 1 - j)) & 1:
+                    value ^= m[k - j] << j
+            m.append(value)
+        directions.append([m[k] << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)])
+    return directions
+
+
+def sobol_points(start, count, dim, shift=None):
+    """
+    Точки start..start + count - 1 последовательности Соболя в [0, 1)^dim.
+    Точка с номером n - XOR направляющих чисел по единичным битам n, поэтому
+    любой диапазон номеров считается независимо. shift - цифровой сдвиг
+    (XOR с целым по каждому измерению) для рандомизированного QMC.
+    """
+    _require_numpy()
+    indices = np.arange(start, start + count, dtype=np.uint64)
+    points = np.empty((count, dim))
+    for axis, directions in enumerate(sobol_directions(dim)):
+        value = np.zeros(count, dtype=np.uint64)
+        for k, v in enumerate(directions):
+            value ^= ((indices >> np.uint64(k)) & np.uint64(1)) * np.uint64(v)
+        if shift is not None:
+            value ^= np.uint64(shift[axis])
+        points[:, axis] = value / float(1 << SOBOL_BITS)
+    return points
+
+
+def _evaluate(f, columns):
+    """
+    Значения f(x1, ..., xd) в точках, заданных столбцами координат.
+    Сначала f вызывается на массивах целиком, функции только для скаляров
+    вычисляются поэлементно.
+    """
+    try:
+        values = np.asarray(f(*columns), dtype=float)
+        if values.shape == columns[0].shape:
+            return values
+    except (TypeError, ValueError):
+        pass
+    return np.fromiter(map(f, *(column.tolist() for column in columns)),
+                       dtype=float, count=len(columns[0]))
+
+
+def _scale(points, bounds):
+    lower = np.array([a for a, _ in bounds], dtype=float)
+    width = np.array([b - a for a, b in bounds], dtype=float)
+    return [lower[axis] + width[axis] * points[:, axis] for axis in range(len(bounds))]
+
+
+def _volume(bounds):
+    return math.prod(b - a for a, b in bounds)
+
+
+def _product_nodes(a, b, n, rule, order):
+    """Узлы и веса одномерной составной формулы на [a, b] примерно из n точек"""
+    if rule == 'midpoint':
+        h = (b - a) / n
+        return a + (np.arange(n) + 0.5) * h, np.full(n, h)
+
+    nodes, weights = gauss_legendre_nodes(order)
+    panels = max(1, n // order)
+    width = (b - a) / panels
+    left = a + np.arange(panels)[:, None] * width
+    x = left + width * (1 + np.array(nodes)) / 2
+    w = np.broadcast_to(np.array(weights) * width / 2, x.shape)
+    return x.ravel(), w.ravel()
+
+
+def _product_chunk(f, grid, start, count):
+    """Сумма весов * f по точкам тензорной сетки с плоскими номерами start..start + count - 1"""
+    shape = tuple(len(nodes) for nodes, _ in grid)
+    indices = np.unravel_index(np.arange(start, start + count), shape)
+    columns = [grid[axis][0][index] for axis, index in enumerate(indices)]
+    weights = np.prod([grid[axis][1][index] for axis, index in enumerate(indices)], axis=0)
+    return float(np.dot(weights, _evaluate(f, columns)))
+
+
+def _run_chunks(func, f, tasks, n_jobs, pool):
+    """
+    Выполняет func(f, *task) для каждой задачи; результаты - в порядке задач.
+    В процессы f передается через serialization.shipped, поэтому подходят и lambda.
+    """
+    if n_jobs == 1:
+        return [func(f, *task) for task in tasks]
+    pool = pool or get_shared_pool()
+    futures = []
+    try:
+        with shipped(f) as function:
+            for task in tasks:
+                futures.append(pool.submit(n_jobs, func, function, *task))
+            return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _product_sum(f, bounds, n_per_dim, rule, order, n_jobs, chunk_size, pool):
+    grid = [_product_nodes(a, b, n_per_dim, rule, order) for a, b in bounds]
+    total = math.prod(len(nodes) for nodes, _ in grid)
+    tasks = [(grid, start, min(chunk_size, total - start)) for start in range(0, total, chunk_size)]
+    return math.fsum(_run_chunks(_product_chunk, f, tasks, n_jobs, pool))
+
+
+def integrate_product(f, bounds, n_per_dim=32, *, rule='midpoint', order=5, n_jobs=1,
+                      chunk_size=CHUNK_SIZE, pool=None):
+    """
+    Интеграл f(x1, ..., xd) по прямоугольной области тензорной (произведением)
+    формулой: одномерная формула по каждому измерению, n_per_dim^d точек.
+    Подходит для малых d; при больших d число точек растет слишком быстро.
+
+    Ошибка оценивается разностью с той же формулой на сетке вдвое реже.
+
+    Аргументы:
+    f - функция d аргументов (лучше принимающая массивы NumPy)
+    bounds - список пар (a, b) по каждому измерению
+    n_per_dim - точек по каждому измерению
+    rule - 'midpoint' или 'gauss_legendre'
+    order - порядок формулы Гаусса–Лежандра
+    n_jobs - количество процессов (1 - в текущем процессе)
+    chunk_size - точек сетки в одном куске работы
+    pool - WorkerPool (по умолчанию общий пул)
+
+    Возвращает:
+    Кортеж (значение, оценка ошибки)
+
+    >>> value, error = integrate_product(lambda x, y: x * y, [(0, 1), (0, 2)], 16)
+    >>> round(value, 12)
+    1.0
+    """
+    _require_numpy()
+    if rule not in PRODUCT_RULES:
+        raise ValueError(f"Неизвестная формула: {rule}. Доступны: {', '.join(PRODUCT_RULES)}")
+
+    value = _product_sum(f, bounds, n_per_dim, rule, order, n_jobs, chunk_size, pool)
+    coarse = _product_sum(f, bounds, max(1, n_per_dim // 2), rule, order, n_jobs, chunk_size, pool)
+    return value, abs(value - coarse)
+
+
+def _sample_chunk(f, bounds, sequence, start, count, randomization):
+    """
+    Сумма и сумма квадратов f по count точкам, начиная с номера start.
+    randomization - SeedSequence потока (random) или сдвиг реплики (halton, sobol).
+    """
+    dim = len(bounds)
+    if sequence == 'random':
+        points = np.random.default_rng(randomization).random((count, dim))
+    elif sequence == 'halton':
+        points = np.mod(halton_points(start, count, dim) + randomization, 1.0)
+    else:
+        points = sobol_points(start, count, dim, shift=randomization)
+
+    values = _evaluate(f, _scale(points, bounds))
+    return float(np.sum(values)), float(np.dot(values, values))
+
+
+def integrate_monte_carlo(f, bounds, n_samples=100000, *, sequence='random', replicates=8, n_jobs=1,
+                          seed=None, chunk_size=CHUNK_SIZE, pool=None):
+    """
+    Интеграл f(x1, ..., xd) методом Монте-Карло или квази-Монте-Карло.
+
+    sequence='random' - псевдослучайные точки; каждый кусок работы получает
+    свой независимый поток (SeedSequence.spawn), поэтому при заданном seed
+    результат не зависит от n_jobs. Ошибка - стандартная ошибка среднего.
+
+    sequence='halton' или 'sobol' - рандомизированный QMC: replicates реплик
+    по n_samples / replicates точек со случайным сдвигом (для Соболя - цифровым),
+    ошибка - стандартная ошибка среднего по репликам.
+
+    Аргументы:
+    f - функция d аргументов (лучше принимающая массивы NumPy)
+    bounds - список пар (a, b) по каждому измерению
+    n_samples - общее число точек
+    sequence - 'random', 'halton' или 'sobol'
+    replicates - число рандомизаций для QMC
+    n_jobs - количество процессов (1 - в текущем процессе)
+    seed - зерно генератора
+    chunk_size - точек в одном куске работы
+    pool - WorkerPool (по умолчанию общий пул)
+
+    Возвращает:
+    Кортеж (значение, оценка ошибки)
+
+    >>> value, error = integrate_monte_carlo(lambda x, y: x + y, [(0, 1), (0, 1)],
+    ...                                      4096, sequence='sobol', seed=1)
+    >>> abs(value - 1) < 1e-3
+    True
+    """
+    _require_numpy()
+    if sequence not in SEQUENCES:
+        raise ValueError(f"Неизвестная последовательность: {sequence}. Доступны: {', '.join(SEQUENCES)}")
+
+    dim = len(bounds)
+    volume = _volume(bounds)
+    seed_sequence = np.random.SeedSequence(seed)
+
+    if sequence == 'random':
+        ranges = [(start, min(chunk_size, n_samples - start)) for start in range(0, n_samples, chunk_size)]
+        streams = seed_sequence.spawn(len(ranges))
+        tasks = [(bounds, sequence, start, count, stream) for (start, count), stream in zip(ranges, streams)]
+        sums = _run_chunks(_sample_chunk, f, tasks, n_jobs, pool)
+
+        total = math.fsum(s for s, _ in sums)
+        total_sq = math.fsum(sq for _, sq in sums)
+        mean = total / n_samples
+        variance = max(0.0, (total_sq - total * mean) / max(1, n_samples - 1))
+        return volume * mean, volume * math.sqrt(variance / n_samples)
+
+    if sequence == 'sobol':
+        sobol_directions(dim)
+
+    per_replicate = max(1, n_samples // replicates)
+    rng = np.random.default_rng(seed_sequence)
+    tasks = []
+    for replicate in range(replicates):
+        if sequence == 'halton':
+            shift = rng.random(dim)
+        else:
+            shift = [int(value) for value in rng.integers(0, 1 << SOBOL_BITS, size=dim, dtype=np.uint64)]
+        for start in range(0, per_replicate, chunk_size):
+            tasks.append((replicate, (bounds, sequence, start, min(chunk_size, per_replicate - start), shift)))
+
+    sums = _run_chunks(_sample_chunk, f, [task for _, task in tasks], n_jobs, pool)
+    estimates = [0.0] * replicates
+    for (replicate, _), (total, _) in zip(tasks, sums):
+        estimates[replicate] += total
+    estimates = [volume * total / per_replicate for total in estimates]
+
+    mean = math.fsum(estimates) / replicates
+    if replicates < 2:
+        return mean, float('nan')
+    variance = math.fsum((e - mean) ** 2 for e in estimates) / (replicates - 1)
+    return mean, math.sqrt(variance / replicates)
+
+
+def integrate_nd(f, bounds, n_points=100000, *, method='auto', n_jobs=1, seed=None, pool=None):
+    """
+    Многомерный интеграл с выбором метода: при method='auto' тензорная формула
+    Гаусса–Лежандра для размерности до PRODUCT_MAX_DIM, иначе рандомизированный
+    QMC по Соболю (или Халтону, если измерений больше SOBOL_MAX_DIM).
+
+    Аргументы:
+    f - функция d аргументов
+    bounds - список пар (a, b) по каждому измерению
+    n_points - примерное общее число вычислений f
+    method - 'auto', 'product', 'random', 'halton' или 'sobol'
+    n_jobs - количество процессов
+    seed - зерно генератора для методов Монте-Карло
+    pool - WorkerPool (по умолчанию общий пул)
+
+    Возвращает:
+    Кортеж (значение, оценка ошибки)
+    """
+    dim = len(bounds)
+    if method == 'auto':
+        if dim <= PRODUCT_MAX_DIM:
+            method = 'product'
+        else:
+            method = 'sobol' if dim <= SOBOL_MAX_DIM else 'halton'
+
+    if method == 'product':
+        n_per_dim = max(1, round(n_points ** (1 / dim)))
+        return integrate_product(f, bounds, n_per_dim, rule='gauss_legendre', n_jobs=n_jobs, pool=pool)
+    return integrate_monte_carlo(f, bounds, n_points, sequence=method, n_jobs=n_jobs, seed=seed, pool=pool)
+
+
+def _gaussian(*x):
+    return np.exp(-sum(xi * xi for xi in x))
+
+
+def measure_multidim(n_points=1 << 16):
+    """
+    Сравнивает ошибку методов на exp(-|x|^2) по кубу [0, 1]^d
+    (точное значение (sqrt(pi) / 2 * erf(1))^d) для разных d.
+    """
+    _require_numpy()
+    exact_1d = math.sqrt(math.pi) / 2 * math.erf(1)
+
+    print(f"exp(-|x|^2) на [0, 1]^d, около {n_points} точек:")
+    print("-" * 70)
+
+    for dim in (2, 4, 8):
+        bounds = [(0, 1)] * dim
+        exact = exact_1d ** dim
+        for method in ('product', 'random', 'halton', 'sobol'):
+            if method == 'product' and dim > PRODUCT_MAX_DIM + 1:
+                continue
+            elapsed = min(timeit.repeat(lambda: integrate_nd(_gaussian, bounds, n_points, method=method, seed=0),
+                                        repeat=3, number=1))
+            value, error = integrate_nd(_gaussian, bounds, n_points, method=method, seed=0)
+            print(f"d = {dim} {method:8s}: время = {elapsed:7.4f} сек, ошибка = {abs(value - exact):.2e}, "
+                  f"оценка = {error:.2e}")
+        print()
+
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_multidim()
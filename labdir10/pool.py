@@ -0,0 +1,192 @@
+import atexit
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import threading
+import timeit
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker
+
+
+class WorkerPool:
+    """
+    Долгоживущий пул процессов для параллельных бэкендов integrate.
+
+    ProcessPoolExecutor и multiprocessing.Pool создаются при первом обращении
+    и переиспользуются между вызовами, поэтому запуск процессов оплачивается
+    один раз. Процессов запускается столько, сколько запрошено (но не больше
+    max_workers); если позже запрошено больше, пул пересоздается большего размера.
+    Прежний пул при этом не останавливается под руками у тех, кто его уже получил:
+    ProcessPoolExecutor завершает процессы сам, когда его отпустит последний
+    пользователь, а multiprocessing.Pool закрывается и ожидается в фоне.
+
+    Задачи лучше отправлять через submit и imap: они берут текущий пул под
+    блокировкой, а submit заменяет сломанный ProcessPoolExecutor (рабочий
+    процесс упал) новым.
+    Пул закрывается явно (shutdown), при выходе из with или при завершении программы.
+
+    >>> with WorkerPool(2) as pool:
+    ...     pool.submit(2, abs, -3).result()
+    3
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._executor_size = 0
+        self._mp_pool = None
+        self._mp_pool_size = 0
+        # Потоки, которые дожидаются закрытых прежних multiprocessing.Pool
+        self._retired = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _share_resource_tracker():
+        # Процессы, запущенные до старта resource_tracker, заводят свои трекеры;
+        # тогда подключенные в них блоки общей памяти (sampled.SharedArray)
+        # при завершении считаются утекшими. Запускаем общий трекер заранее.
+        if os.name == 'posix':
+            resource_tracker.ensure_running()
+
+    def _size(self, n_jobs):
+        return max(1, min(n_jobs, self.max_workers))
+
+    def executor(self, n_jobs=1):
+        """ProcessPoolExecutor на n_jobs процессов (но не больше max_workers)"""
+        size = self._size(n_jobs)
+        with self._lock:
+            if self._executor is None or self._executor_size < size:
+                self._share_resource_tracker()
+                # Прежний пул не останавливаем: его мог только что получить другой
+                # поток. Уже отправленные задачи досчитываются, а процессы
+                # завершаются, когда прежний пул никому не будет нужен.
+                self._executor_size = max(size, self._executor_size)
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self._executor_size)
+            return self._executor
+
+    def submit(self, n_jobs, fn, /, *args, **kwargs):
+        """
+        Отправляет fn(*args, **kwargs) в executor(n_jobs).
+
+        ProcessPoolExecutor не восстанавливается после падения рабочего процесса
+        и отказывает в новых задачах (BrokenProcessPool) - тогда он заменяется
+        новым и задача отправляется туда.
+
+        Возвращает:
+        concurrent.futures.Future
+        """
+        executor = self.executor(n_jobs)
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            return self.executor(n_jobs).submit(fn, *args, **kwargs)
+
+    def mp_pool(self, n_jobs=1):
+        """multiprocessing.Pool на n_jobs процессов (но не больше max_workers)"""
+        with self._lock:
+            return self._current_mp_pool(n_jobs)
+
+    def _current_mp_pool(self, n_jobs):
+        size = self._size(n_jobs)
+        if self._mp_pool is None or self._mp_pool_size < size:
+            self._share_resource_tracker()
+            if self._mp_pool is not None:
+                # Новые задачи в прежний пул не попадут (imap отправляет их под
+                # той же блокировкой), а уже отправленные досчитываются в фоне
+                self._mp_pool.close()
+                joiner = threading.Thread(target=self._mp_pool.join, daemon=True)
+                joiner.start()
+                self._retired.append(joiner)
+            self._mp_pool_size = max(size, self._mp_pool_size)
+            self._mp_pool = multiprocessing.Pool(processes=self._mp_pool_size)
+        return self._mp_pool
+
+    def imap(self, n_jobs, func, iterable):
+        """
+        multiprocessing.Pool.imap в mp_pool(n_jobs): куски раздаются по мере
+        освобождения процессов, результаты отдаются по порядку.
+        """
+        with self._lock:
+            return self._current_mp_pool(n_jobs).imap(func, iterable)
+
+    def shutdown(self):
+        """Остановить все процессы пула (повторный вызов безопасен)"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._mp_pool is not None:
+                self._mp_pool.close()
+                self._mp_pool.join()
+                self._mp_pool = None
+            retired, self._retired = self._retired, []
+        for joiner in retired:
+            joiner.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool():
+    """Общий пул, который по умолчанию используют integrate_process и integrate_processes_mp"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = WorkerPool()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
+
+
+def shutdown_shared_pool():
+    """Остановить общий пул; следующий вызов get_shared_pool создаст новый"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is not None:
+            _shared_pool.shutdown()
+            atexit.unregister(_shared_pool.shutdown)
+            _shared_pool = None
+
+
+def measure_pool_reuse():
+    """
+    Сравнивает время одного вызова при малом n_iter: новый пул на каждый вызов
+    (запуск процессов) и общий пул (только передача задач).
+    """
+    from integrate import integrate_process, integrate_processes_mp
+
+    print("Время одного вызова при n_iter = 1000, n_jobs = 2:")
+    print("-" * 50)
+
+    for backend in (integrate_process, integrate_processes_mp):
+        def fresh_call():
+            with WorkerPool(2) as pool:
+                backend(math.sin, 0, math.pi, n_jobs=2, n_iter=1000, pool=pool)
+
+        def shared_call():
+            backend(math.sin, 0, math.pi, n_jobs=2, n_iter=1000)
+
+        shared_call()
+        fresh_time = min(timeit.repeat(fresh_call, repeat=5, number=1))
+        shared_time = min(timeit.repeat(shared_call, repeat=5, number=1))
+
+        print(f"{backend.__name__:24s}: новый пул = {fresh_time * 1000:7.2f} мс, "
+              f"общий пул = {shared_time * 1000:7.2f} мс")
+
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    measure_pool_reuse()
@@ -0,0 +1,411 @@
+import collections
+import math
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import benchmark
+from integrate import integrate, NUMPY_EQUIVALENTS, np
+
+try:
+    import cloudpickle
+except ImportError:
+    cloudpickle = None
+
+MAX_WORKERS = 256
+SAMPLE_EVERY = 16
+IDLE_GAP = 1e-4
+IDLE_FACTOR = 2
+# Строка таблицы исполнителя (числа double в общей памяти)
+COLUMNS = ('pid', 'evaluations', 'timed_evaluations', 'timed_f_time', 'busy', 'idle', 'best_rate',
+           'first_start', 'last_start', 'last_evaluations', 'received_bytes', 'receptions')
+(PID, EVALUATIONS, TIMED_EVALUATIONS, TIMED_F_TIME, BUSY, IDLE, BEST_RATE,
+ FIRST_START, LAST_START, LAST_EVALUATIONS, RECEIVED_BYTES, RECEPTIONS) = range(len(COLUMNS))
+ROW = struct.Struct(f'{len(COLUMNS)}d')
+_pack_row = ROW.pack_into
+ATTACHED_TABLES = 4
+_NDARRAY = np.ndarray if np is not None else None
+
+# Таблицы сеансов этого процесса, таблицы, подключенные по имени, и состояние
+# потоков: [память таблицы, смещение строки, строка (список чисел Python),
+# вычисления после последней записи строки в таблицу, порог следующего замера]
+_owned = {}
+_tables = collections.OrderedDict()
+_rows = {}
+_tables_lock = threading.Lock()
+
+
+def _attach(name):
+    with _tables_lock:
+        block = _owned.get(name) or _tables.get(name)
+        if block is None:
+            block = shared_memory.SharedMemory(name=name)
+            _tables[name] = block
+            while len(_tables) > ATTACHED_TABLES:
+                _forget(*_tables.popitem(last=False))
+        return block
+
+
+def _forget(name, block):
+    """Отпускает строки таблицы name в этом процессе и закрывает блок"""
+    for key in [key for key in _rows if key[0] == name]:
+        del _rows[key]
+    block.close()
+
+
+def _row(name, directory):
+    """
+    Состояние текущего потока текущего процесса (см. _rows).
+    Номер строки занимается созданием файла в directory с O_EXCL - это
+    атомарно и для потоков, и для процессов.
+    """
+    key = (name, os.getpid(), threading.get_ident())
+    state = _rows.get(key)
+    if state is not None:
+        return state
+
+    block = _attach(name)
+    for slot in range(MAX_WORKERS):
+        try:
+            os.close(os.open(os.path.join(directory, str(slot)), os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            continue
+        row = [0.0] * len(COLUMNS)
+        row[PID] = os.getpid()
+        state = _rows[key] = [block.buf, slot * ROW.size, row, 0, 1]
+        _publish(state)
+        return state
+    raise RuntimeError(f"Больше {MAX_WORKERS} исполнителей в одном профиле")
+
+
+def _publish(state):
+    """Записывает строку потока в таблицу вместе с накопленными вычислениями"""
+    row = state[2]
+    row[EVALUATIONS] += state[3]
+    state[3] = 0
+    _pack_row(state[0], state[1], *row)
+
+
+def _live_rows(table):
+    """Строки потоков этого процесса с еще не записанными вычислениями: номер строки -> строка"""
+    pid = os.getpid()
+    rows = {}
+    for (name, owner, _), state in list(_rows.items()):
+        if name == table and owner == pid:
+            row = list(state[2])
+            row[EVALUATIONS] += state[3]
+            rows[state[1] // ROW.size] = row
+    return rows
+
+
+def _payload_size(f):
+    try:
+        return len(pickle.dumps(f))
+    except Exception:
+        pass
+    if cloudpickle is not None:
+        try:
+            return len(cloudpickle.dumps(f))
+        except Exception:
+            pass
+    return 0
+
+
+class ProfiledFunction:
+    """
+    Обертка f, которая считает вычисления и время в строку таблицы Profile.
+
+    Обычный вызов только увеличивает счетчик вычислений потока (число Python).
+    Вызов, на котором набирается sample_every вычислений, замеряет время f
+    и промежуток от предыдущего замера (по ним оцениваются время внутри f,
+    занятость и простой исполнителя) и записывает строку потока в общую память.
+    Вызов с массивом NumPy считается за x.size вычислений, а функции math
+    заменяются на ufunc NumPy, как в integrate_vectorized.
+    """
+
+    def __init__(self, f, table, directory, sample_every=SAMPLE_EVERY):
+        self.f = f
+        self.table = table
+        self.directory = directory
+        self.sample_every = sample_every
+        try:
+            self._vector_f = NUMPY_EQUIVALENTS.get(f, f)
+        except TypeError:
+            self._vector_f = f
+        self._local = threading.local()
+        self._size = None
+        self._restored = False
+
+    def __call__(self, *args):
+        try:
+            state = self._local.state
+        except AttributeError:
+            state = self._local.state = _row(self.table, self.directory)
+
+        x = args[0]
+        if type(x) is _NDARRAY:
+            n, f = x.size, self._vector_f
+        else:
+            n, f = 1, self.f
+        state[3] += n
+        if state[3] < state[4]:
+            return f(*args)
+        state[4] = self.sample_every
+        return self._timed(state, f, args, n)
+
+    @staticmethod
+    def _timed(state, f, args, n):
+        start = time.perf_counter()
+        value = f(*args)
+        elapsed = time.perf_counter() - start - _TIMER_OVERHEAD
+
+        row = state[2]
+        evaluations = row[EVALUATIONS] + state[3]
+        # Промежуток от предыдущего замера: вычисления f и цикл бэкенда.
+        # Простоем считается только промежуток заметно длиннее, чем заняли бы
+        # те же вычисления в самом быстром из уже замеренных промежутков.
+        last = row[LAST_START]
+        if last:
+            interval = start - last
+            done = evaluations - n - row[LAST_EVALUATIONS]
+            best = row[BEST_RATE]
+            expected = done * best
+            if best and interval > IDLE_FACTOR * expected and interval - expected > IDLE_GAP:
+                row[BUSY] += expected
+                row[IDLE] += interval - expected
+            else:
+                row[BUSY] += interval
+                if done and (not best or interval < expected):
+                    row[BEST_RATE] = interval / done
+        else:
+            row[FIRST_START] = start
+        row[LAST_START] = start
+        row[LAST_EVALUATIONS] = evaluations - n
+        row[TIMED_F_TIME] += max(0.0, elapsed)
+        row[TIMED_EVALUATIONS] += n
+        _publish(state)
+        return value
+
+    def __del__(self):
+        # В рабочем процессе копия обертки освобождается после куска работы:
+        # записываем в таблицу вычисления после последнего замера
+        if self._restored:
+            state = getattr(self._local, 'state', None)
+            if state is not None and state[3]:
+                _publish(state)
+
+    def __reduce__(self):
+        # Размер f в байтах считается один раз; рабочий процесс добавляет его
+        # к полученным байтам при каждой распаковке
+        if self._size is None:
+            self._size = _payload_size(self.f)
+        return _restore_profiled, (self.f, self.table, self.directory, self.sample_every, self._size)
+
+    def __repr__(self):
+        return f"ProfiledFunction({self.f!r})"
+
+
+def _timer_overhead(samples=1000):
+    """Сколько добавляет к замеру сама пара вызовов perf_counter"""
+    best = math.inf
+    for _ in range(samples):
+        start = time.perf_counter()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+_TIMER_OVERHEAD = _timer_overhead()
+
+
+def _restore_profiled(f, table, directory, sample_every, size):
+    profiled = ProfiledFunction(f, table, directory, sample_every)
+    profiled._restored = True
+    state = _row(table, directory)
+    row = state[2]
+    row[RECEIVED_BYTES] += size
+    row[RECEPTIONS] += 1
+    _publish(state)
+    return profiled
+
+
+class Profile:
+    """
+    Сеанс профилирования: функции, обернутые wrap, записывают статистику
+    в таблицу в общей памяти - по строке на каждый поток и процесс, который
+    их вызывает, поэтому работает с любым бэкендом, в том числе с пулами процессов.
+
+    Цена обертки (доли микросекунды на вызов) попадает во время вне f.
+    У потоков со стандартным GIL ожидание GIL попадает в простой или в замер f
+    (время внутри f не больше занятости исполнителя).
+    Бэкенды, которые вычисляют f сами (jit, cython_parallel для функций math),
+    обертку не вызывают - для них видна только векторная проверка или ничего.
+
+    >>> with Profile() as profile:
+    ...     _ = integrate(profile.wrap(math.sin), 0, math.pi, 1000)
+    >>> profile.report()['evaluations']
+    1000
+    """
+
+    def __init__(self, sample_every=SAMPLE_EVERY):
+        self.sample_every = sample_every
+        self.directory = tempfile.mkdtemp(prefix='labdir10-profile-')
+        self._block = shared_memory.SharedMemory(create=True, size=MAX_WORKERS * ROW.size)
+        self._block.buf[:MAX_WORKERS * ROW.size] = bytes(MAX_WORKERS * ROW.size)
+        with _tables_lock:
+            _owned[self._block.name] = self._block
+        self.table = self._block.name
+        self.started = time.perf_counter()
+        self.wall = None
+        self._report = None
+
+    def wrap(self, f):
+        return ProfiledFunction(f, self.table, self.directory, self.sample_every)
+
+    def _workers(self):
+        # Строки потоков этого процесса берутся вместе с еще не записанными
+        # вычислениями; другие процессы записывают их при замере и после куска работы
+        live = _live_rows(self.table)
+        workers = []
+        for slot in sorted(int(name) for name in os.listdir(self.directory)):
+            row = live.get(slot) or ROW.unpack_from(self._block.buf, slot * ROW.size)
+            workers.append(dict(zip(COLUMNS, row)))
+        return workers
+
+    def report(self):
+        """
+        Сводка по сеансу (после выхода из with - по всему сеансу,
+        внутри - на текущий момент).
+
+        Возвращает:
+        Словарь: wall - время сеанса, evaluations - вычислений f, f_time - время
+        внутри f (сумма по исполнителям, не больше их занятости), worker_overhead -
+        время исполнителей вне f (цикл, суммирование), idle - простой исполнителей
+        между вызовами f, startup - время до первого вызова f (запуск пула, передача
+        работы), serialized_bytes и shipments - байты f, переданные в процессы,
+        и число передач, workers - то же по каждому исполнителю.
+
+        Время до первого и после последнего вызова f простоем не считается.
+        Процесс пула записывает вычисления после своего последнего замера
+        (меньше sample_every), когда отпускает копию обертки после куска работы,
+        а если держит ее в кэше функций - при следующем замере. Сводка, снятая
+        сразу по окончании вычисления, может их не учесть.
+        """
+        if self._report is not None:
+            return self._report
+
+        wall = self.wall if self.wall is not None else time.perf_counter() - self.started
+        workers = []
+        for values in self._workers():
+            evaluations, timed = values['evaluations'], values['timed_evaluations']
+            mean_eval = values['timed_f_time'] / timed if timed else 0.0
+            # После последнего замера время вычислений известно только по оценке
+            measured = values['last_evaluations']
+            mean_call = values['busy'] / measured if measured else mean_eval
+            busy = min(wall, values['busy'] + (evaluations - measured) * mean_call)
+            workers.append({
+                'pid': int(values['pid']),
+                'evaluations': int(evaluations),
+                # У потоков со стандартным GIL замер f включает ожидание GIL
+                'f_time': min(mean_eval * evaluations, busy),
+                'busy': busy,
+                'idle': values['idle'],
+                'first_call': values['first_start'] - self.started if evaluations else None,
+                'serialized_bytes': int(values['received_bytes']),
+                'shipments': int(values['receptions']),
+            })
+
+        active = [worker for worker in workers if worker['evaluations']]
+        f_time = sum(worker['f_time'] for worker in active)
+        return {
+            'wall': wall,
+            'evaluations': sum(worker['evaluations'] for worker in workers),
+            'f_time': f_time,
+            'worker_overhead': sum(worker['busy'] for worker in active) - f_time,
+            'idle': sum(worker['idle'] for worker in active),
+            'startup': min((worker['first_call'] for worker in active), default=None),
+            'serialized_bytes': sum(worker['serialized_bytes'] for worker in workers),
+            'shipments': sum(worker['shipments'] for worker in workers),
+            'workers': active,
+        }
+
+    def close(self):
+        """Сохраняет сводку и освобождает общую память (повторный вызов безопасен)"""
+        if self._block is None:
+            return
+        self._report = self.report()
+        with _tables_lock:
+            _owned.pop(self.table, None)
+            _forget(self.table, self._block)
+        self._block.unlink()
+        self._block = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall = time.perf_counter() - self.started
+        self.close()
+
+
+def profile_backend(backend, f, a, b, n_iter=100000, n_jobs=2, sample_every=SAMPLE_EVERY):
+    """
+    Вычисляет интеграл бэкендом backend из benchmark.BACKENDS с профилированием f.
+
+    Возвращает:
+    Кортеж (значение интеграла, сводка Profile.report())
+    """
+    run, _ = benchmark.BACKENDS[backend]
+    with Profile(sample_every) as profile:
+        result = run(profile.wrap(f), a, b, n_iter, n_jobs)
+    return result, profile.report()
+
+
+def format_report(report):
+    startup = report['startup']
+    lines = [f"время {report['wall']:8.4f} сек, вычислений {report['evaluations']}, "
+             f"в f {report['f_time']:8.4f} сек, вне f {report['worker_overhead']:8.4f} сек, "
+             f"до первого вызова {'-' if startup is None else f'{startup:.4f}'} сек, "
+             f"передано {report['serialized_bytes']} байт за {report['shipments']} раз"]
+    for worker in report['workers']:
+        lines.append(f"    pid {worker['pid']:7d}: вычислений {worker['evaluations']:9d}, "
+                     f"занят {worker['busy']:8.4f} сек, простой {worker['idle']:8.4f} сек")
+    return "\n".join(lines)
+
+
+def measure_profiling():
+    """
+    Печатает разбивку времени по всем бэкендам benchmark и цену профилирования
+    для integrate (без профиля, каждый вызов замеряется, замеряется каждый 16-й).
+    """
+    n_iter = 200000
+    print(f"Профили бэкендов, sin, n_iter = {n_iter}:")
+    print("-" * 70)
+    for backend in benchmark.BACKENDS:
+        _, report = profile_backend(backend, math.sin, 0, math.pi, n_iter, sample_every=16)
+        print(f"{backend}: {format_report(report)}")
+    print("-" * 70)
+
+    start = time.perf_counter()
+    integrate(math.sin, 0, math.pi, n_iter)
+    plain_time = time.perf_counter() - start
+    print(f"integrate без профиля: {plain_time:8.4f} сек")
+    for sample_every in (1, 16):
+        start = time.perf_counter()
+        profile_backend('serial', math.sin, 0, math.pi, n_iter, sample_every=sample_every)
+        print(f"sample_every = {sample_every:2d}:       {time.perf_counter() - start:8.4f} сек")
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_profiling()
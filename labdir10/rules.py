@@ -0,0 +1,180 @@
+import functools
+import math
+
+METHODS = ('midpoint', 'trapezoid', 'simpson', 'romberg', 'gauss_legendre')
+
+
+def python_grid_sum(f, start, step, count):
+    """
+    Сумма значений f в точках start, start + step, ..., start + (count - 1) * step.
+
+    Все правила ниже выражаются через такие суммы по равномерным сеткам,
+    поэтому другой бэкенд (NumPy, Cython) подключается заменой этой функции.
+    """
+    total = 0.0
+    for i in range(count):
+        total += f(start + i * step)
+    return total
+
+
+@functools.lru_cache(maxsize=None)
+def gauss_legendre_nodes(order):
+    """
+    Узлы и веса формулы Гаусса–Лежандра порядка order на [-1, 1].
+
+    Корни многочлена Лежандра находятся методом Ньютона; результат кэшируется,
+    поэтому повторные вызовы с тем же порядком ничего не пересчитывают.
+
+    >>> nodes, weights = gauss_legendre_nodes(2)
+    >>> round(nodes[0], 12), round(weights[0], 12)
+    (0.57735026919, 1.0)
+    """
+    nodes = []
+    weights = []
+
+    for i in range(1, order + 1):
+        x = math.cos(math.pi * (i - 0.25) / (order + 0.5))
+        for _ in range(100):
+            p_prev, p = 1.0, x
+            for k in range(2, order + 1):
+                p_prev, p = p, ((2 * k - 1) * x * p - (k - 1) * p_prev) / k
+            derivative = order * (x * p - p_prev) / (x * x - 1) if order > 1 else 1.0
+            dx = p / derivative
+            x -= dx
+            if abs(dx) < 1e-15:
+                break
+
+        p_prev, p = 1.0, x
+        for k in range(2, order + 1):
+            p_prev, p = p, ((2 * k - 1) * x * p - (k - 1) * p_prev) / k
+        derivative = order * (x * p - p_prev) / (x * x - 1) if order > 1 else 1.0
+
+        nodes.append(x)
+        weights.append(2 / ((1 - x * x) * derivative * derivative))
+
+    return tuple(nodes), tuple(weights)
+
+
+def midpoint(f, a, b, n_iter, grid_sum=python_grid_sum):
+    h = (b - a) / n_iter
+    return grid_sum(f, a + h / 2, h, n_iter) * h
+
+
+def trapezoid(f, a, b, n_iter, grid_sum=python_grid_sum):
+    h = (b - a) / n_iter
+    return ((f(a) + f(b)) / 2 + grid_sum(f, a + h, h, n_iter - 1)) * h
+
+
+def simpson(f, a, b, n_iter, grid_sum=python_grid_sum):
+    """Формула Симпсона; нечетное n_iter увеличивается до четного"""
+    n_iter += n_iter % 2
+    h = (b - a) / n_iter
+    odd = grid_sum(f, a + h, 2 * h, n_iter // 2)
+    even = grid_sum(f, a + 2 * h, 2 * h, n_iter // 2 - 1)
+    return (f(a) + f(b) + 4 * odd + 2 * even) * h / 3
+
+
+def romberg(f, a, b, n_iter, grid_sum=python_grid_sum):
+    """
+    Метод Ромберга: экстраполяция Ричардсона по формулам трапеций
+    с 1, 2, 4, ... 2^k отрезками, где 2^k - ближайшая степень двойки >= n_iter.
+    """
+    levels = max(1, math.ceil(math.log2(max(n_iter, 2))))
+    h = b - a
+    row = [(f(a) + f(b)) * h / 2]
+
+    for level in range(1, levels + 1):
+        count = 2 ** (level - 1)
+        h /= 2
+        trapezoid_value = row[0] / 2 + grid_sum(f, a + h, 2 * h, count) * h
+
+        new_row = [trapezoid_value]
+        factor = 1
+        for j in range(1, level + 1):
+            factor *= 4
+            new_row.append(new_row[j - 1] + (new_row[j - 1] - row[j - 1]) / (factor - 1))
+        row = new_row
+
+    return row[-1]
+
+
+def gauss_legendre(f, a, b, n_iter, grid_sum=python_grid_sum, order=5):
+    """
+    Составная формула Гаусса–Лежандра: n_iter // order отрезков
+    по order узлов, то есть примерно n_iter вычислений функции.
+    """
+    nodes, weights = gauss_legendre_nodes(order)
+    panels = max(1, n_iter // order)
+    width = (b - a) / panels
+
+    total = 0.0
+    for node, weight in zip(nodes, weights):
+        total += weight * grid_sum(f, a + width * (1 + node) / 2, width, panels)
+
+    return total * width / 2
+
+
+RULES = {
+    'midpoint': midpoint,
+    'trapezoid': trapezoid,
+    'simpson': simpson,
+    'romberg': romberg,
+    'gauss_legendre': gauss_legendre,
+}
+
+
+def integrate_rule(f, a, b, n_iter=1000, method='midpoint', grid_sum=python_grid_sum):
+    """
+    Вычисляет интеграл функции f от a до b выбранной квадратурной формулой.
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - количество разбиений (для Ромберга округляется вверх до степени двойки)
+    method - 'midpoint', 'trapezoid', 'simpson', 'romberg' или 'gauss_legendre'
+    grid_sum - функция суммирования по равномерной сетке (см. python_grid_sum)
+
+    Возвращает:
+    Приближенное значение интеграла (число)
+
+    >>> round(integrate_rule(math.sin, 0, math.pi, 10, method='gauss_legendre'), 9)
+    2.0
+    """
+    try:
+        rule = RULES[method]
+    except KeyError:
+        raise ValueError(f"Неизвестный метод: {method}. Доступны: {', '.join(METHODS)}")
+
+    return rule(f, a, b, n_iter, grid_sum=grid_sum)
+
+
+def measure_methods():
+    """
+    Для каждого метода печатает ошибку в зависимости от числа вычислений функции.
+    """
+    print("Ошибка методов в зависимости от числа вычислений (sin на [0, pi]):")
+    print("-" * 60)
+
+    for method in METHODS:
+        for n_iter in (4, 16, 64, 256, 1024):
+            calls = [0]
+
+            def counted_sin(x):
+                calls[0] += 1
+                return math.sin(x)
+
+            result = integrate_rule(counted_sin, 0, math.pi, n_iter, method)
+            print(f"{method:15s} n_iter = {n_iter:5d}: вычислений = {calls[0]:5d}, "
+                  f"ошибка = {abs(result - 2):.2e}")
+        print()
+
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_methods()
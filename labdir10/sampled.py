@@ -0,0 +1,342 @@
+import contextlib
+import math
+import os
+import timeit
+from multiprocessing import shared_memory
+
+from pool import get_shared_pool
+from scheduler import split_work
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SharedArray:
+    """
+    Массив NumPy в блоке multiprocessing.shared_memory.
+
+    Рабочие процессы подключаются к блоку по имени (см. descriptor) и читают
+    или пишут данные без копирования и без передачи через каналы.
+    Блок удаляется при close() или выходе из with у владельца (создателя).
+
+    >>> with SharedArray.from_array([1.0, 2.0, 3.0]) as shared:
+    ...     float(shared.array.sum())
+    6.0
+    """
+
+    def __init__(self, shape, dtype='float64', name=None):
+        if np is None:
+            raise ImportError("Для работы с выборками нужен NumPy")
+
+        dtype = np.dtype(dtype)
+        self._owner = name is None
+        if self._owner:
+            size = max(1, math.prod(shape) * dtype.itemsize)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def from_array(cls, values):
+        """Новый блок с копией values"""
+        values = np.asarray(values, dtype=float)
+        shared = cls(values.shape, values.dtype)
+        shared.array[...] = values
+        return shared
+
+    @property
+    def descriptor(self):
+        """Кортеж, по которому рабочий процесс найдет этот массив (см. attached)"""
+        return ('shm', self._shm.name, self.array.shape, self.array.dtype.str)
+
+    def close(self):
+        if self.array is None:
+            return
+        self.array = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+SAMPLE_METHODS = ('trapezoid', 'simpson')
+BLOCK_SIZE = 1 << 20
+
+
+def source_descriptor(samples, dtype='float64', offset=0):
+    """
+    Описание источника выборки, которое можно передать в другой процесс:
+    ('shm', ...) для SharedArray, ('npy', путь) для файла .npy,
+    ('raw', путь, dtype, offset, длина) для файла без заголовка.
+    """
+    if isinstance(samples, SharedArray):
+        return samples.descriptor
+    if isinstance(samples, (str, os.PathLike)):
+        path = os.fspath(samples)
+        if path.endswith('.npy'):
+            return ('npy', path)
+        itemsize = np.dtype(dtype).itemsize
+        length = (os.path.getsize(path) - offset) // itemsize
+        return ('raw', path, np.dtype(dtype).str, offset, length)
+    raise TypeError(f"Неподдерживаемый источник выборки: {type(samples).__name__}")
+
+
+@contextlib.contextmanager
+def attached(source):
+    """Открывает источник по описанию и отдает массив без копирования данных"""
+    kind = source[0]
+    if kind == 'shm':
+        _, name, shape, dtype = source
+        shared = SharedArray(shape, dtype, name=name)
+        try:
+            yield shared.array
+        finally:
+            shared.close()
+    elif kind == 'npy':
+        yield np.load(source[1], mmap_mode='r')
+    elif kind == 'raw':
+        _, path, dtype, offset, length = source
+        yield np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(length,))
+    else:
+        raise ValueError(f"Неизвестный тип источника: {kind}")
+
+
+def _rule_sum(values, first, last, method, block=BLOCK_SIZE):
+    """
+    Взвешенная сумма отсчетов first..last включительно без множителя шага:
+    для трапеций веса 1/2, 1, ..., 1, 1/2; для Симпсона (first и last четные)
+    веса 1, 4, 2, ..., 4, 1. Отсчеты читаются блоками по block штук,
+    поэтому из файла в память одновременно попадает только один блок.
+    """
+    block += block % 2
+    total = 0.0
+    for i in range(first, last + 1, block):
+        chunk = values[i:min(i + block, last + 1)]
+        if method == 'simpson':
+            total = total + 2 * np.sum(chunk[0::2], axis=0) + 4 * np.sum(chunk[1::2], axis=0)
+        else:
+            total = total + np.sum(chunk, axis=0)
+
+    ends = values[first] + values[last]
+    if method == 'simpson':
+        return total - ends
+    return total - ends / 2
+
+
+def _partial_sum(source, first, last, method, block, result, slot):
+    """Считает часть интеграла и записывает ее в result[slot] рабочего буфера"""
+    with attached(source) as values:
+        partial = _rule_sum(values, first, last, method, block)
+    with attached(result) as out:
+        out[slot] = partial
+
+
+def _sample_ranges(n_intervals, n_jobs, chunk_size, step=1):
+    """
+    Диапазоны отсчетов (first, last) для кусков, соседние куски делят общий отсчет.
+    Границы кратны step (для Симпсона step = 2).
+    """
+    n_units = n_intervals // step
+    unit_size = chunk_size and max(1, chunk_size // step)
+    ranges = []
+    for start, end, _ in split_work(0, n_units, n_units, n_jobs=n_jobs, chunk_size=unit_size):
+        ranges.append((round(start) * step, round(end) * step))
+    return ranges
+
+
+def _result_value(total):
+    return float(total) if np.ndim(total) == 0 else total
+
+
+def _simpson_tail(values, first, dx):
+    """Формула 3/8 на трех последних интервалах (для нечетного числа интервалов)"""
+    y = values[first:first + 4]
+    return (y[0] + 3 * y[1] + 3 * y[2] + y[3]) * 3 * dx / 8
+
+
+def _integrate_source(source, dx, method, n_jobs, chunk_size, block, pool):
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"Неизвестный метод: {method}. Доступны: {', '.join(SAMPLE_METHODS)}")
+
+    with attached(source) as values:
+        n_intervals = len(values) - 1
+        tail_shape = values.shape[1:]
+        if n_intervals < 1:
+            raise ValueError("Нужно хотя бы два отсчета")
+
+        tail = 0.0
+        if method == 'simpson':
+            if n_intervals == 1:
+                method = 'trapezoid'
+            elif n_intervals % 2:
+                # Четная часть - Симпсоном, последние три интервала - формулой 3/8
+                n_intervals -= 3
+                tail = _simpson_tail(values, n_intervals, dx)
+                if n_intervals == 0:
+                    return _result_value(tail)
+        scale = dx / 3 if method == 'simpson' else dx
+
+        if n_jobs == 1 and chunk_size is None:
+            return _result_value(_rule_sum(values, 0, n_intervals, method, block) * scale + tail)
+
+    ranges = _sample_ranges(n_intervals, n_jobs, chunk_size, step=2 if method == 'simpson' else 1)
+
+    with SharedArray((len(ranges),) + tail_shape) as result:
+        if n_jobs == 1:
+            for slot, (first, last) in enumerate(ranges):
+                _partial_sum(source, first, last, method, block, result.descriptor, slot)
+        else:
+            pool = pool or get_shared_pool()
+            futures = [pool.submit(n_jobs, _partial_sum, source, first, last, method, block,
+                                   result.descriptor, slot)
+                       for slot, (first, last) in enumerate(ranges)]
+            for future in futures:
+                future.result()
+        return _result_value(result.array.sum(axis=0) * scale + tail)
+
+
+def integrate_samples(samples, dx=1.0, *, method='trapezoid', n_jobs=2, chunk_size=None,
+                      block=BLOCK_SIZE, pool=None):
+    """
+    Интеграл табличной функции по формуле трапеций или Симпсона.
+
+    Отсчеты лежат в общей памяти (SharedArray) или в файле .npy, который
+    открывается через memmap; рабочие процессы читают свои куски без копирования,
+    а частичные суммы записывают в общий буфер результатов, который затем
+    складывается в фиксированном порядке. Обычный массив один раз копируется
+    во временный SharedArray. Для двумерной выборки интегрируется каждый
+    столбец (по оси 0) и возвращается вектор.
+
+    Аргументы:
+    samples - SharedArray, путь к файлу .npy или массив значений
+    dx - шаг между отсчетами
+    method - 'trapezoid' или 'simpson' (при нечетном числе интервалов
+             последние три считаются формулой 3/8)
+    n_jobs - количество процессов (1 - без процессов)
+    chunk_size - интервалов в одном куске работы (см. scheduler.split_work)
+    block - сколько отсчетов читать за раз внутри куска
+    pool - WorkerPool (по умолчанию общий пул)
+
+    Возвращает:
+    Приближенное значение интеграла (число или массив)
+
+    >>> integrate_samples([0.0, 1.0, 2.0, 3.0], dx=0.5, n_jobs=1)
+    2.25
+    >>> integrate_samples([0.0, 1.0, 4.0], method='simpson', n_jobs=1)
+    2.6666666666666665
+    """
+    if np is None:
+        raise ImportError("Для работы с выборками нужен NumPy")
+
+    if not isinstance(samples, (SharedArray, str, os.PathLike)):
+        with SharedArray.from_array(samples) as shared:
+            return integrate_samples(shared, dx, method=method, n_jobs=n_jobs,
+                                     chunk_size=chunk_size, block=block, pool=pool)
+
+    return _integrate_source(source_descriptor(samples), dx, method, n_jobs, chunk_size, block, pool)
+
+
+def integrate_file(path, dx=1.0, *, dtype='float64', offset=0, method='trapezoid', n_jobs=1,
+                   chunk_size=None, block=BLOCK_SIZE, pool=None):
+    """
+    Интеграл по отсчетам из файла, который не загружается в память целиком.
+
+    Файл .npy открывается через np.load(mmap_mode='r'), любой другой считается
+    сырым массивом dtype начиная с байта offset и открывается через np.memmap.
+    Суммирование идет блоками по block отсчетов; при n_jobs > 1 куски файла
+    обрабатываются в рабочих процессах, каждый из которых открывает файл сам.
+
+    Аргументы:
+    path - путь к файлу
+    dx - шаг между отсчетами
+    dtype - тип отсчетов сырого файла
+    offset - смещение данных в сыром файле (байт)
+    method - 'trapezoid' или 'simpson'
+    n_jobs - количество процессов (1 - потоково в текущем процессе)
+    chunk_size - интервалов в одном куске работы
+    block - сколько отсчетов читать за раз
+    pool - WorkerPool (по умолчанию общий пул)
+
+    Возвращает:
+    Приближенное значение интеграла (число)
+    """
+    if np is None:
+        raise ImportError("Для работы с выборками нужен NumPy")
+
+    source = source_descriptor(os.fspath(path), dtype=dtype, offset=offset)
+    return _integrate_source(source, dx, method, n_jobs, chunk_size, block, pool)
+
+
+def measure_shared_samples(n_samples=10000000, n_jobs=4):
+    """
+    Сравнивает передачу кусков выборки в процессы через pickle
+    и чтение из общей памяти.
+    """
+    x, dx = np.linspace(0, math.pi, n_samples, retstep=True)
+    values = np.sin(x)
+    pool = get_shared_pool()
+    ranges = _sample_ranges(n_samples - 1, n_jobs, None)
+
+    def pickled():
+        futures = [pool.submit(n_jobs, _rule_sum, values[first:last + 1], 0, last - first, 'trapezoid')
+                   for first, last in ranges]
+        return sum(future.result() for future in futures) * dx
+
+    with SharedArray.from_array(values) as shared:
+        pickled()
+        pickled_time = min(timeit.repeat(pickled, repeat=3, number=1))
+        shared_time = min(timeit.repeat(lambda: integrate_samples(shared, dx, n_jobs=n_jobs),
+                                        repeat=3, number=1))
+        result = integrate_samples(shared, dx, n_jobs=n_jobs)
+
+    print(f"Интеграл sin по {n_samples} отсчетам, {n_jobs} процесса:")
+    print("-" * 50)
+    print(f"pickle:       {pickled_time:8.4f} сек")
+    print(f"общая память: {shared_time:8.4f} сек, ошибка = {abs(2 - result):.2e}")
+    print("-" * 50)
+
+
+def measure_file_integration(n_samples=50000000, n_jobs=4):
+    """
+    Пишет n_samples отсчетов sin во временный сырой файл и сравнивает
+    потоковое интегрирование в одном процессе и в n_jobs процессах.
+    """
+    import tempfile
+
+    x, dx = np.linspace(0, math.pi, n_samples, retstep=True)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'samples.f64')
+        for first in range(0, n_samples, BLOCK_SIZE):
+            with open(path, 'ab') as file:
+                np.sin(x[first:first + BLOCK_SIZE]).tofile(file)
+        del x
+
+        print(f"Интеграл sin по файлу из {n_samples} отсчетов "
+              f"({os.path.getsize(path) / 2 ** 20:.0f} МБ):")
+        print("-" * 50)
+        for method in SAMPLE_METHODS:
+            for jobs in (1, n_jobs):
+                elapsed = min(timeit.repeat(
+                    lambda: integrate_file(path, dx, method=method, n_jobs=jobs), repeat=3, number=1))
+                result = integrate_file(path, dx, method=method, n_jobs=jobs)
+                print(f"{method:9s} n_jobs = {jobs}: время = {elapsed:8.4f} сек, "
+                      f"ошибка = {abs(2 - result):.2e}")
+        print("-" * 50)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_shared_samples()
+    measure_file_integration()
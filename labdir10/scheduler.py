@@ -0,0 +1,51 @@
+import math
+
+CHUNKS_PER_JOB = 4
+
+
+def split_work(a, b, n_iter, *, n_jobs=1, chunk_size=None):
+    """
+    Делит отрезок [a, b] с n_iter разбиениями на куски для раздачи исполнителям.
+
+    Границы кусков совпадают с узлами общей сетки, а остаток n_iter
+    распределяется по одному разбиению на первые куски, поэтому сумма
+    разбиений по кускам всегда равна n_iter и точки совпадают с точками
+    последовательного integrate.
+
+    Аргументы:
+    a - начало отрезка
+    b - конец отрезка
+    n_iter - общее количество разбиений
+    n_jobs - количество исполнителей; по умолчанию кусков в CHUNKS_PER_JOB раз больше
+    chunk_size - желаемое количество разбиений в куске (задает число кусков явно)
+
+    Возвращает:
+    Список кортежей (start, end, n_iter_part)
+
+    >>> split_work(0, 10, 10, chunk_size=4)
+    [(0.0, 4.0, 4), (4.0, 7.0, 3), (7.0, 10.0, 3)]
+    """
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(f"chunk_size должен быть не меньше 1, получено {chunk_size}")
+    if n_iter <= 0:
+        return []
+
+    if chunk_size is not None:
+        n_chunks = math.ceil(n_iter / chunk_size)
+    else:
+        n_chunks = n_jobs * CHUNKS_PER_JOB
+    n_chunks = max(1, min(n_chunks, n_iter))
+
+    h = (b - a) / n_iter
+    base, remainder = divmod(n_iter, n_chunks)
+
+    chunks = []
+    first = 0
+    for k in range(n_chunks):
+        size = base + (1 if k < remainder else 0)
+        last = first + size
+        end = float(b) if last == n_iter else a + last * h
+        chunks.append((a + first * h, end, size))
+        first = last
+
+    return chunks
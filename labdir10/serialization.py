@@ -0,0 +1,221 @@
+import collections
+import contextlib
+import hashlib
+import importlib
+import math
+import pickle
+import threading
+import time
+from multiprocessing import shared_memory
+
+try:
+    import cloudpickle
+except ImportError:
+    cloudpickle = None
+
+WORKER_CACHE_SIZE = 16
+
+# Именованные подынтегральные функции: имя -> (функция, модуль, где она зарегистрирована)
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Кэш рабочего процесса: ключ содержимого -> восстановленная функция
+_worker_functions = collections.OrderedDict()
+_worker_lock = threading.Lock()
+
+
+def register_integrand(name, f=None):
+    """
+    Регистрирует f под именем name. В процесс передается только имя, а функция
+    находится по нему уже в рабочем процессе, поэтому так можно передавать
+    lambda и другие функции, которые pickle не умеет сохранять.
+
+    Регистрация должна выполняться при импорте модуля: рабочий процесс, не
+    знающий имени, импортирует модуль, в котором функция была зарегистрирована.
+    Можно использовать как декоратор:
+
+    >>> @register_integrand('doc_square')
+    ... def square(x):
+    ...     return x * x
+    >>> cube = register_integrand('doc_cube', lambda x: x ** 3)
+    >>> pickle.loads(pickle.dumps(NamedIntegrand('doc_cube')))(2)
+    8
+    """
+    if f is None:
+        return lambda function: register_integrand(name, function)
+
+    with _registry_lock:
+        _registry[name] = (f, getattr(f, '__module__', None))
+    return f
+
+
+def registered_name(f):
+    """Имя, под которым зарегистрирована f, или None"""
+    with _registry_lock:
+        for name, (function, _) in _registry.items():
+            if function is f:
+                return name
+    return None
+
+
+class NamedIntegrand:
+    """Ссылка на зарегистрированную функцию; при распаковке превращается в саму функцию"""
+
+    def __init__(self, name):
+        self.name = name
+        self.module = _registry[name][1]
+
+    def __call__(self, x):
+        return _registry[self.name][0](x)
+
+    def __reduce__(self):
+        return _lookup_integrand, (self.name, self.module)
+
+
+def _lookup_integrand(name, module):
+    if name not in _registry and module not in (None, '__main__'):
+        importlib.import_module(module)
+    try:
+        return _registry[name][0]
+    except KeyError:
+        raise LookupError(f"Подынтегральная функция {name!r} не зарегистрирована в рабочем процессе; "
+                          f"вызывайте register_integrand при импорте модуля") from None
+
+
+class ShippedFunction:
+    """
+    Функция, сохраненная cloudpickle в блок общей памяти.
+
+    В каждый кусок работы попадает только короткий ключ и имя блока. Рабочий
+    процесс читает и распаковывает функцию один раз, при первом куске, и затем
+    берет ее из своего кэша (WORKER_CACHE_SIZE последних функций).
+    Блок освобождается close() или при выходе из with.
+    """
+
+    def __init__(self, f):
+        payload = cloudpickle.dumps(f)
+        self.key = hashlib.sha1(payload).hexdigest()
+        self.size = len(payload)
+        self._block = shared_memory.SharedMemory(create=True, size=self.size)
+        self._block.buf[:self.size] = payload
+
+    def __reduce__(self):
+        return _load_shipped, (self.key, self._block.name, self.size)
+
+    def close(self):
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _load_shipped(key, block_name, size):
+    with _worker_lock:
+        if key in _worker_functions:
+            _worker_functions.move_to_end(key)
+            return _worker_functions[key]
+
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        f = pickle.loads(bytes(block.buf[:size]))
+    finally:
+        block.close()
+
+    with _worker_lock:
+        _worker_functions[key] = f
+        if len(_worker_functions) > WORKER_CACHE_SIZE:
+            _worker_functions.popitem(last=False)
+    return f
+
+
+def _picklable(f):
+    try:
+        pickle.dumps(f)
+    except Exception:
+        return False
+    return True
+
+
+def _cloudpicklable(f):
+    if cloudpickle is None:
+        return False
+    try:
+        cloudpickle.dumps(f)
+    except Exception:
+        return False
+    return True
+
+
+def can_ship(f):
+    """True, если f можно передать в рабочий процесс (см. shipped)"""
+    return _picklable(f) or registered_name(f) is not None or _cloudpicklable(f)
+
+
+@contextlib.contextmanager
+def shipped(f):
+    """
+    Отдает объект, который можно передавать в процессы вместо f:
+    - саму f, если ее сохраняет обычный pickle (функции уровня модуля);
+    - NamedIntegrand, если f зарегистрирована (register_integrand);
+    - ShippedFunction, если установлен cloudpickle (lambda, замыкания).
+
+    В рабочем процессе любой из них распаковывается в саму функцию, поэтому
+    вычисления идут без лишней обертки.
+    """
+    if _picklable(f):
+        yield f
+        return
+
+    name = registered_name(f)
+    if name is not None:
+        yield NamedIntegrand(name)
+        return
+
+    if cloudpickle is None:
+        raise TypeError(f"{f!r} нельзя передать в процесс: установите cloudpickle "
+                        f"или зарегистрируйте функцию через register_integrand")
+
+    with ShippedFunction(f) as function:
+        yield function
+
+
+def measure_shipping():
+    """
+    Сравнивает размер одного куска работы при передаче замыкания с большими
+    данными целиком (cloudpickle в каждом куске) и через ShippedFunction.
+    """
+    coefficients = [1.0 / (k + 1) for k in range(100000)]
+
+    def series(x):
+        return sum(c * x ** k for k, c in enumerate(coefficients[:8]))
+
+    print("Размер одного куска работы:")
+    print("-" * 50)
+    if cloudpickle is None:
+        print("cloudpickle не установлен")
+    else:
+        start = time.perf_counter()
+        plain = len(cloudpickle.dumps((series, 0.0, 1.0, 1000)))
+        plain_time = time.perf_counter() - start
+        with ShippedFunction(series) as function:
+            start = time.perf_counter()
+            small = len(pickle.dumps((function, 0.0, 1.0, 1000)))
+            small_time = time.perf_counter() - start
+        print(f"функция в каждом куске: {plain:8d} байт, {plain_time * 1e3:8.3f} мс")
+        print(f"ShippedFunction:        {small:8d} байт, {small_time * 1e3:8.3f} мс")
+    print(f"math.sin по ссылке:     {len(pickle.dumps((math.sin, 0.0, 1.0, 1000))):8d} байт")
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_shipping()
@@ -1,12 +1,36 @@
+import os
+import sys
+
 from setuptools import setup
 from setuptools.extension import Extension
 from Cython.Build import cythonize
 
+# OpenMP нужен для prange в integrate_cython_parallel; без него цикл выполняется в одном потоке
+if sys.platform == 'win32':
+    compile_args = ['/O2', '/openmp']
+    link_args = []
+elif sys.platform == 'darwin':
+    # Apple clang включает OpenMP только через -Xpreprocessor и libomp (brew install libomp);
+    # без libomp модуль собирается, но prange выполняется в одном потоке
+    libomp = os.environ.get('LIBOMP_PREFIX') or next(
+        (prefix for prefix in ('/opt/homebrew/opt/libomp', '/usr/local/opt/libomp')
+         if os.path.isdir(prefix)), None)
+    if libomp is not None:
+        compile_args = ['-O3', '-Xpreprocessor', '-fopenmp', f'-I{libomp}/include']
+        link_args = [f'-L{libomp}/lib', '-lomp']
+    else:
+        compile_args = ['-O3']
+        link_args = []
+else:
+    compile_args = ['-O3', '-fopenmp']
+    link_args = ['-fopenmp']
+
 extensions = [
     Extension(
         "cython_integrate",
         ["cython_integrate.pyx"],
-        extra_compile_args=['-O3'],
+        extra_compile_args=compile_args,
+        extra_link_args=link_args,
         language="c",
     )
 ]
@@ -0,0 +1,233 @@
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import math
+import time
+
+from integrate import integrate, _numpy_grid_sum, np
+from pool import get_shared_pool
+from rules import python_grid_sum
+from serialization import shipped
+from summation import reduce_sum
+
+REFINEMENT_FACTOR = 3
+BATCH_SIZE = 65536
+STREAM_BACKENDS = ('thread', 'process')
+
+# Кусок равномерной сетки: точки start, start + step, ..., start + (count - 1) * step
+Segment = collections.namedtuple('Segment', 'start step count')
+
+# Оценка интеграла на очередном шаге уточнения
+Estimate = collections.namedtuple('Estimate', 'n_iter value error')
+
+
+def midpoint_grid(a, b, n_iter):
+    """
+    Середины n_iter отрезков разбиения [a, b] - те же точки, что у integrate.
+    Сетка задается описаниями Segment и не строится в памяти.
+
+    >>> list(midpoint_grid(0, 1, 4))
+    [Segment(start=0.125, step=0.25, count=4)]
+    """
+    if n_iter > 0:
+        h = (b - a) / n_iter
+        yield Segment(a + h / 2, h, n_iter)
+
+
+def refinement_grid(a, b, n_iter, factor=REFINEMENT_FACTOR):
+    """
+    Середины сетки factor * n_iter, которых нет среди середин сетки n_iter
+    (factor нечетный: средняя из factor новых середин совпадает со старой).
+
+    >>> [tuple(round(v, 4) for v in segment) for segment in refinement_grid(0, 1, 2)]
+    [(0.0833, 0.5, 2), (0.4167, 0.5, 2)]
+    """
+    h = (b - a) / (n_iter * factor)
+    for offset in range(factor):
+        if offset != factor // 2:
+            yield Segment(a + (offset + 0.5) * h, factor * h, n_iter)
+
+
+def batched(segments, batch_size=BATCH_SIZE):
+    """Режет куски сетки на пачки не больше batch_size точек"""
+    for segment in segments:
+        for first in range(0, segment.count, batch_size):
+            yield Segment(segment.start + first * segment.step, segment.step,
+                          min(batch_size, segment.count - first))
+
+
+def _segment_sum(f, segment, vectorized):
+    """Сумма значений f в точках пачки (NumPy-блоком или обычным циклом)"""
+    if vectorized and np is not None:
+        return _numpy_grid_sum(segment.count)(f, *segment)
+    return python_grid_sum(f, *segment)
+
+
+def evaluate(batches, f, *, vectorized=False, n_jobs=1, backend='thread', pool=None):
+    """
+    Вычисляет f по пачкам и отдает пары (точек в пачке, сумма значений)
+    в порядке пачек.
+
+    При n_jobs > 1 пачки раздаются потокам или процессам общего пула (backend),
+    но в работе одновременно не больше 2 * n_jobs пачек: генератор batches
+    читается по мере готовности результатов, и вся сетка не материализуется.
+    Если потребитель перестает читать (break, close), еще не начатые пачки отменяются.
+
+    Аргументы:
+    batches - итерируемый набор Segment (см. batched)
+    f - функция, которую интегрируем
+    vectorized - вычислять пачку массивом NumPy (см. integrate_vectorized)
+    n_jobs - количество параллельных исполнителей
+    backend - 'thread' или 'process'
+    pool - WorkerPool для backend='process' (по умолчанию общий пул)
+    """
+    if n_jobs <= 1:
+        for segment in batches:
+            yield segment.count, _segment_sum(f, segment, vectorized)
+        return
+
+    if backend not in STREAM_BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд: {backend}. Доступны: {', '.join(STREAM_BACKENDS)}")
+
+    pending = collections.deque()
+    with contextlib.ExitStack() as resources:
+        if backend == 'process':
+            submit = functools.partial((pool or get_shared_pool()).submit, n_jobs)
+            f = resources.enter_context(shipped(f))
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+            resources.callback(executor.shutdown, wait=False, cancel_futures=True)
+            submit = executor.submit
+
+        try:
+            for segment in batches:
+                pending.append((segment.count, submit(_segment_sum, f, segment, vectorized)))
+                if len(pending) >= 2 * n_jobs:
+                    count, future = pending.popleft()
+                    yield count, future.result()
+            while pending:
+                count, future = pending.popleft()
+                yield count, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def reduce_batches(sums, reduction='naive'):
+    """
+    Складывает суммы пачек способом reduction (см. summation.reduce_sum).
+
+    Возвращает:
+    Кортеж (всего точек, сумма значений)
+    """
+    total_count = 0
+    partials = []
+    for count, value in sums:
+        total_count += count
+        partials.append(value)
+    return total_count, reduce_sum(partials, reduction)
+
+
+def midpoint_estimates(f, a, b, n_start=16, *, batch_size=BATCH_SIZE, vectorized=False, n_jobs=1,
+                       backend='thread', pool=None, reduction='naive'):
+    """
+    Бесконечный генератор оценок интеграла методом средних прямоугольников
+    на сетках n_start, 3 * n_start, 9 * n_start, ...
+
+    Каждая следующая оценка вычисляет f только в новых точках (refinement_grid),
+    старые суммы переиспользуются. Следующий шаг не начинается, пока потребитель
+    не попросит следующую оценку, поэтому остановиться можно в любой момент.
+
+    Возвращает:
+    Генератор Estimate(n_iter, value, error), где error - разница с предыдущей
+    оценкой (для первой - inf)
+
+    >>> estimates = midpoint_estimates(math.sin, 0, math.pi, 10)
+    >>> [(e.n_iter, round(e.value, 4)) for e, _ in zip(estimates, range(3))]
+    [(10, 2.0082), (30, 2.0009), (90, 2.0001)]
+    """
+    def level_sum(segments):
+        sums = evaluate(batched(segments, batch_size), f, vectorized=vectorized, n_jobs=n_jobs,
+                        backend=backend, pool=pool)
+        return reduce_batches(sums, reduction)[1]
+
+    n_iter = n_start
+    total = level_sum(midpoint_grid(a, b, n_iter))
+    previous = None
+    while True:
+        value = total * (b - a) / n_iter
+        yield Estimate(n_iter, value, math.inf if previous is None else abs(value - previous))
+        previous = value
+
+        total += level_sum(refinement_grid(a, b, n_iter))
+        n_iter *= REFINEMENT_FACTOR
+
+
+def integrate_streaming(f, a, b, tol=1e-8, *, n_start=16, max_iter=10 ** 7, batch_size=BATCH_SIZE,
+                        vectorized=False, n_jobs=1, backend='thread', pool=None, reduction='naive'):
+    """
+    Уточняет интеграл функции f от a до b, пока две последние оценки
+    midpoint_estimates не совпадут с точностью tol или следующий шаг
+    не превысит max_iter разбиений.
+
+    Аргументы:
+    f - функция, которую интегрируем
+    a - начало отрезка
+    b - конец отрезка
+    tol - требуемая разница двух последних оценок
+    n_start - разбиений на первом шаге
+    max_iter - наибольшее количество разбиений
+    batch_size - точек в одной пачке
+    vectorized - вычислять пачки через NumPy
+    n_jobs - количество параллельных исполнителей
+    backend - 'thread' или 'process'
+    pool - WorkerPool для backend='process' (по умолчанию общий пул)
+    reduction - способ сложения сумм пачек (см. integrate)
+
+    Возвращает:
+    Кортеж (значение, оценка ошибки, последнее n_iter)
+
+    >>> value, error, n_iter = integrate_streaming(math.sin, 0, math.pi, 1e-6)
+    >>> round(value, 6), n_iter
+    (2.0, 3888)
+    """
+    estimate = None
+    for estimate in midpoint_estimates(f, a, b, n_start, batch_size=batch_size, vectorized=vectorized,
+                                       n_jobs=n_jobs, backend=backend, pool=pool, reduction=reduction):
+        if estimate.error <= tol or estimate.n_iter * REFINEMENT_FACTOR > max_iter:
+            break
+    return estimate.value, estimate.error, estimate.n_iter
+
+
+def measure_streaming():
+    """
+    Сравнивает integrate_streaming с последовательностью вызовов integrate
+    на тех же сетках (каждый вызов вычисляет f заново во всех точках).
+    """
+    tol = 1e-9
+    print(f"Уточнение до tol = {tol}:")
+    print("-" * 60)
+
+    for label, options in (('python', {}), ('vectorized', {'vectorized': True}),
+                           ('threads', {'vectorized': True, 'n_jobs': 2})):
+        start = time.perf_counter()
+        value, error, last_n_iter = integrate_streaming(math.sin, 0, math.pi, tol, **options)
+        elapsed = time.perf_counter() - start
+        print(f"{label:10s}: n_iter = {last_n_iter:8d}, значение = {value:.10f}, {elapsed:8.4f} сек")
+
+    start = time.perf_counter()
+    n_iter = 16
+    while n_iter <= last_n_iter:
+        integrate(math.sin, 0, math.pi, n_iter)
+        n_iter *= REFINEMENT_FACTOR
+    print(f"integrate на тех же сетках: {time.perf_counter() - start:8.4f} сек")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_streaming()
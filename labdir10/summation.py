@@ -0,0 +1,144 @@
+import math
+import timeit
+
+REDUCTIONS = ('naive', 'kahan', 'neumaier', 'pairwise', 'fsum')
+PAIRWISE_BLOCK = 128
+
+
+def naive_sum(values):
+    total = 0.0
+    for value in values:
+        total += value
+    return total
+
+
+def kahan_sum(values):
+    """
+    Суммирование Кэхэна: младшие разряды, потерянные при сложении,
+    накапливаются в поправке и добавляются к следующему слагаемому.
+    """
+    total = 0.0
+    compensation = 0.0
+    for value in values:
+        y = value - compensation
+        t = total + y
+        compensation = (t - total) - y
+        total = t
+    return total
+
+
+def neumaier_sum(values):
+    """
+    Суммирование Ноймайера: как у Кэхэна, но поправка верна и тогда,
+    когда слагаемое больше накопленной суммы.
+
+    >>> neumaier_sum([1.0, 1e100, 1.0, -1e100])
+    2.0
+    """
+    total = 0.0
+    compensation = 0.0
+    for value in values:
+        t = total + value
+        if abs(total) >= abs(value):
+            compensation += (total - t) + value
+        else:
+            compensation += (value - t) + total
+        total = t
+    return total + compensation
+
+
+def pairwise_sum(values, block=PAIRWISE_BLOCK):
+    """
+    Попарное (каскадное) суммирование: ошибка растет как O(log n), а не O(n).
+    Короткие куски до block элементов складываются обычным циклом.
+    """
+    if not isinstance(values, (list, tuple)):
+        values = list(values)
+
+    def _sum(first, last):
+        if last - first <= block:
+            return naive_sum(values[first:last])
+        middle = (first + last) // 2
+        return _sum(first, middle) + _sum(middle, last)
+
+    return _sum(0, len(values))
+
+
+SUMS = {
+    'naive': naive_sum,
+    'kahan': kahan_sum,
+    'neumaier': neumaier_sum,
+    'pairwise': pairwise_sum,
+    'fsum': math.fsum,
+}
+
+
+def reduce_sum(values, reduction='naive'):
+    """
+    Сумма values выбранным способом.
+
+    Аргументы:
+    values - итерируемый набор чисел
+    reduction - 'naive', 'kahan', 'neumaier', 'pairwise' или 'fsum' (точно округленная сумма)
+
+    Возвращает:
+    Сумма (число)
+
+    >>> reduce_sum([0.1] * 10, 'fsum')
+    1.0
+    """
+    try:
+        total = SUMS[reduction]
+    except KeyError:
+        raise ValueError(f"Неизвестный способ суммирования: {reduction}. "
+                         f"Доступны: {', '.join(REDUCTIONS)}") from None
+    return total(values)
+
+
+def make_grid_sum(reduction):
+    """
+    Функция суммирования по равномерной сетке (см. rules.python_grid_sum),
+    которая складывает значения f выбранным способом.
+    """
+    if reduction not in SUMS:
+        raise ValueError(f"Неизвестный способ суммирования: {reduction}. "
+                         f"Доступны: {', '.join(REDUCTIONS)}")
+    total_of = SUMS[reduction]
+
+    def grid_sum(f, start, step, count):
+        return total_of(f(start + i * step) for i in range(count))
+
+    return grid_sum
+
+
+def measure_reductions():
+    """
+    Для каждого способа суммирования печатает время integrate и ошибку округления
+    (отличие от точно округленной суммы тех же слагаемых) на sin от 0 до pi.
+    """
+    from integrate import integrate
+
+    print("Цена и точность способов суммирования (sin на [0, pi]):")
+    print("-" * 70)
+
+    for n_iter in (10000, 100000, 1000000):
+        h = math.pi / n_iter
+        exact = math.fsum(math.sin((i + 0.5) * h) for i in range(n_iter)) * h
+        for reduction in REDUCTIONS:
+            elapsed = min(timeit.repeat(
+                lambda: integrate(math.sin, 0, math.pi, n_iter, reduction=reduction),
+                repeat=3, number=1))
+            result = integrate(math.sin, 0, math.pi, n_iter, reduction=reduction)
+            print(f"n_iter = {n_iter:8d} {reduction:9s}: время = {elapsed:8.4f} сек, "
+                  f"ошибка округления = {abs(result - exact):.2e}, ошибка = {abs(result - 2):.2e}")
+        print()
+
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    measure_reductions()
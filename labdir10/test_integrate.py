@@ -1,11 +1,45 @@
 from integrate import integrate, integrate_async, integrate_process
 from integrate import integrate_processes_mp, worker
+from integrate import integrate_vectorized, async_mode, gil_disabled, np
+from adaptive import integrate_adaptive
+from rules import METHODS, gauss_legendre_nodes
+from pool import WorkerPool, get_shared_pool
+from scheduler import split_work
+from batch import integrate_many
+from summation import REDUCTIONS, reduce_sum
+import benchmark
+import autotune
+from multidim import integrate_product, integrate_monte_carlo, integrate_nd
+from evalcache import EvaluationCache, integrate_refined
+from jit import CompiledIntegrand, compile_integrand, integrate_jit
+from sampled import SharedArray, integrate_samples, integrate_file
+from jobs import IntegrationJob
+from streaming import midpoint_grid, batched, evaluate, reduce_batches, midpoint_estimates, integrate_streaming
+from profiling import Profile, profile_backend, SAMPLE_EVERY
+from serialization import register_integrand, NamedIntegrand, ShippedFunction, can_ship, cloudpickle
 try:
     from cython_integrate import integrate_cython
 except ImportError:
     from integrate import integrate as integrate_cython
+try:
+    from cython_integrate import integrate_cython_parallel, Polynomial
+except ImportError:
+    integrate_cython_parallel = None
+try:
+    import resource
+except ImportError:
+    resource = None
 import unittest
 import math
+from unittest import mock
+import concurrent.futures
+import os
+import pickle
+import tempfile
+import threading
+import time
+import warnings
+import weakref
 
 
 class TestIntegrateFirst(unittest.TestCase):
@@ -28,6 +62,24 @@ class TestIntegrateAsync(unittest.TestCase):
         self.assertAlmostEqual(result, 1.0, delta=0.001)
 
 
+class TestAsyncMode(unittest.TestCase):
+    def test_mode_selection(self):
+        self.assertEqual(async_mode(math.sin), 'thread' if gil_disabled() else 'vectorized')
+        self.assertEqual(async_mode(lambda x: x), 'thread' if cloudpickle is None else 'process')
+        lock = threading.Lock()
+        self.assertEqual(async_mode(lambda x: x if lock else 0.0), 'thread')
+        if not gil_disabled():
+            self.assertEqual(async_mode(integrate), 'process')
+
+    def test_modes_agree(self):
+        expected = integrate(math.cos, 0, math.pi / 2, n_iter=1000)
+        for mode in ('auto', 'thread', 'vectorized', 'process'):
+            result = integrate_async(math.cos, 0, math.pi / 2, n_jobs=2, n_iter=1000, mode=mode)
+            self.assertAlmostEqual(result, expected, delta=1e-12, msg=mode)
+        with self.assertRaises(ValueError):
+            integrate_async(math.cos, 0, 1, mode='gpu')
+
+
 class TestIntegrateProcess(unittest.TestCase):
     def test_log2(self):
         result = integrate_process(math.log2, 1, 2, n_iter=1000, n_jobs=2)
@@ -48,6 +100,33 @@ class TestIntegrateCython(unittest.TestCase):
         self.assertAlmostEqual(result, 1.0, delta=0.001)
 
 
+@unittest.skipIf(integrate_cython_parallel is None, "cython_integrate не собран")
+class TestIntegrateCythonParallel(unittest.TestCase):
+    def test_log2(self):
+        result = integrate_cython_parallel(math.log2, 1, 2, n_iter=1000, n_threads=2)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+
+    def test_cos(self):
+        result = integrate_cython_parallel('cos', 0, math.pi / 2, n_iter=1000, method='simpson')
+        self.assertAlmostEqual(result, 1.0, delta=0.001)
+
+    def test_polynomial_and_python_fallback(self):
+        result = integrate_cython_parallel(Polynomial([3, 0, 0]), 0, 1, n_iter=1000, n_threads=2)
+        self.assertAlmostEqual(result, 1.0, delta=1e-6)
+        result = integrate_cython_parallel(lambda x: 3 * x * x, 0, 1, n_iter=1000)
+        self.assertAlmostEqual(result, 1.0, delta=1e-6)
+
+    def test_reduction_independent_of_threads(self):
+        for reduction in ('naive', 'fsum'):
+            results = {integrate_cython_parallel(math.sin, 0, math.pi, n_iter=100000, n_threads=n_threads,
+                                                 reduction=reduction)
+                       for n_threads in (1, 2, 4)}
+            self.assertEqual(len(results), 1)
+        exact = integrate(math.sin, 0, math.pi, n_iter=100000, reduction='fsum')
+        result = integrate_cython_parallel(math.sin, 0, math.pi, n_iter=100000, reduction='fsum')
+        self.assertAlmostEqual(result, exact, delta=1e-14)
+
+
 class TestIntegrateNoGIL(unittest.TestCase):
     def test_log2(self):
         result = integrate_processes_mp(math.log2, 1, 2, n_jobs=2, n_iter=1000)
@@ -58,13 +137,677 @@ class TestIntegrateNoGIL(unittest.TestCase):
         self.assertAlmostEqual(result, 1.0, delta=0.001)
 
 
+class TestIntegrateVectorized(unittest.TestCase):
+    def test_log2(self):
+        result = integrate_vectorized(math.log2, 1, 2, n_iter=1000)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+
+    def test_cos(self):
+        result = integrate_vectorized(math.cos, 0, math.pi / 2, n_iter=1000)
+        self.assertAlmostEqual(result, 1.0, delta=0.001)
+
+    def test_scalar_only_function(self):
+        result = integrate_vectorized(lambda x: math.sin(x) if x > 0 else 0.0, 0, math.pi,
+                                      n_iter=1000, chunk_size=64)
+        self.assertAlmostEqual(result, integrate(math.sin, 0, math.pi, n_iter=1000), places=10)
+        result = integrate_vectorized(lambda x: x if x > 0 else -x, -1, 1, n_iter=1000, method='romberg')
+        self.assertAlmostEqual(result, 1.0, delta=1e-6)
+
+    @unittest.skipIf(np is None, "NumPy не установлен")
+    def test_single_evaluation_per_point(self):
+        evaluated = []
+
+        def counted_sin(x):
+            evaluated.append(np.size(x))
+            return np.sin(x)
+
+        integrate_vectorized(counted_sin, 0, math.pi, n_iter=200000)
+        self.assertEqual(sum(evaluated), 200000)
+
+
+class TestIntegrateAdaptive(unittest.TestCase):
+    def test_log2(self):
+        result, error = integrate_adaptive(math.log2, 1, 2, tol=1e-10)
+        self.assertAlmostEqual(result, 2 - 1 / math.log(2), delta=1e-10)
+        self.assertLess(error, 1e-10)
+
+    def test_cos(self):
+        for method in ('gauss_kronrod', 'simpson'):
+            result, error = integrate_adaptive(math.cos, 0, math.pi / 2, tol=1e-10, method=method)
+            self.assertAlmostEqual(result, 1.0, delta=1e-10)
+
+    def test_fewer_evaluations(self):
+        result, error, info = integrate_adaptive(math.sin, 0, math.pi, tol=1e-10, full_output=True)
+        self.assertAlmostEqual(result, 2.0, delta=1e-10)
+        self.assertLess(info['n_evals'], 1000)
+
+
+class TestIntegrateMethods(unittest.TestCase):
+    def test_log2(self):
+        for method in METHODS:
+            result = integrate(math.log2, 1, 2, n_iter=1000, method=method)
+            self.assertAlmostEqual(result, 0.55730, delta=0.001, msg=method)
+
+    def test_cos(self):
+        for method in METHODS:
+            result = integrate_vectorized(math.cos, 0, math.pi / 2, n_iter=1000, method=method)
+            self.assertAlmostEqual(result, 1.0, delta=0.001, msg=method)
+
+    def test_parallel_backends(self):
+        for backend in (integrate_async, integrate_process, integrate_processes_mp):
+            result = backend(math.sin, 0, math.pi, n_jobs=2, n_iter=100, method='simpson')
+            self.assertAlmostEqual(result, 2.0, delta=1e-6, msg=backend.__name__)
+
+    def test_higher_order_is_more_accurate(self):
+        midpoint_error = abs(integrate(math.sin, 0, math.pi, 64) - 2)
+        for method in ('simpson', 'romberg', 'gauss_legendre'):
+            error = abs(integrate(math.sin, 0, math.pi, 64, method=method) - 2)
+            self.assertLess(error, midpoint_error, msg=method)
+
+    def test_gauss_legendre_nodes_cached(self):
+        self.assertIs(gauss_legendre_nodes(7), gauss_legendre_nodes(7))
+        nodes, weights = gauss_legendre_nodes(7)
+        self.assertAlmostEqual(sum(weights), 2.0, places=12)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_shared_pool_reused(self):
+        integrate_process(math.sin, 0, math.pi, n_jobs=2, n_iter=100)
+        executor = get_shared_pool().executor(2)
+        integrate_process(math.sin, 0, math.pi, n_jobs=2, n_iter=100)
+        self.assertIs(get_shared_pool().executor(2), executor)
+
+    def test_explicit_pool(self):
+        with WorkerPool(2) as pool:
+            result = integrate_processes_mp(math.cos, 0, math.pi / 2, n_jobs=2, n_iter=1000, pool=pool)
+            self.assertAlmostEqual(result, 1.0, delta=0.001)
+            result = integrate_process(math.log2, 1, 2, n_jobs=2, n_iter=1000, pool=pool)
+            self.assertAlmostEqual(result, 0.55730, delta=0.001)
+        self.assertIsNone(pool._executor)
+        self.assertIsNone(pool._mp_pool)
+
+    def test_grows_on_demand(self):
+        with WorkerPool(3) as pool:
+            small = pool.executor(1)
+            self.assertEqual(pool._executor_size, 1)
+            larger = pool.executor(2)
+            self.assertIsNot(larger, small)
+            self.assertIs(pool.executor(1), larger)
+            self.assertIs(pool.executor(8), pool.executor(3))
+            self.assertEqual(pool._executor_size, 3)
+            pool.mp_pool(8)
+            self.assertEqual(pool._mp_pool_size, 3)
+
+    def test_grow_keeps_handed_out_pools(self):
+        with WorkerPool(2) as pool:
+            small = pool.executor(1)
+            pool.executor(2)
+            self.assertEqual(small.submit(abs, -3).result(), 3)
+
+            pool.mp_pool(1)
+            results = pool.imap(2, abs, [-1, -2, -3])
+            self.assertEqual(list(results), [1, 2, 3])
+            retired, = pool._retired
+            retired.join(timeout=10)
+            self.assertFalse(retired.is_alive())
+
+    def test_broken_executor_replaced(self):
+        with WorkerPool(1) as pool:
+            broken = pool.executor(1)
+            with self.assertRaises(concurrent.futures.BrokenExecutor):
+                pool.submit(1, os._exit, 1).result()
+            self.assertEqual(pool.submit(1, abs, -3).result(), 3)
+            self.assertIsNot(pool.executor(1), broken)
+
+
+class TestSplitWork(unittest.TestCase):
+    def test_remainder_distributed(self):
+        chunks = split_work(0, 1, 1003, n_jobs=3)
+        self.assertEqual(sum(part for _, _, part in chunks), 1003)
+        self.assertEqual(len(chunks), 12)
+        self.assertEqual(chunks[-1][1], 1)
+
+    def test_chunk_size(self):
+        chunks = split_work(0, 1, 10, chunk_size=3)
+        self.assertEqual([part for _, _, part in chunks], [3, 3, 2, 2])
+        self.assertEqual(split_work(0, 1, 2, n_jobs=4), [(0.0, 0.5, 1), (0.5, 1, 1)])
+        for chunk_size in (0, -5):
+            with self.assertRaises(ValueError):
+                split_work(0, 1, 10, chunk_size=chunk_size)
+
+    def test_backends_match_serial(self):
+        expected = integrate(math.sin, 0, math.pi, n_iter=1001)
+        for backend in (integrate_async, integrate_process, integrate_processes_mp):
+            result = backend(math.sin, 0, math.pi, n_jobs=2, n_iter=1001, chunk_size=50)
+            self.assertAlmostEqual(result, expected, delta=1e-12, msg=backend.__name__)
+
+
+class TestIntegrateMany(unittest.TestCase):
+    def test_log2(self):
+        tasks = [(math.log2, 1, 2)] * 20
+        for backend in ('process', 'thread', 'serial'):
+            results = dict(integrate_many(tasks, backend=backend, n_jobs=2))
+            self.assertEqual(sorted(results), list(range(20)))
+            for value in results.values():
+                self.assertAlmostEqual(value, 0.55730, delta=0.001)
+
+    def test_cos(self):
+        tasks = [(math.cos, 0, math.pi / 2, 1000), (math.sin, 0, math.pi, 1000)] * 30
+        results = dict(integrate_many(iter(tasks), n_jobs=2, batch_size=7, window=16))
+        self.assertEqual(len(results), 60)
+        self.assertAlmostEqual(results[0], 1.0, delta=0.001)
+        self.assertAlmostEqual(results[1], 2.0, delta=0.001)
+
+    @unittest.skipIf(cloudpickle is None, "cloudpickle не установлен")
+    @unittest.skipIf(resource is None or not os.path.isdir('/dev/fd'), "нет ограничения числа файлов")
+    def test_distinct_lambdas_within_file_limit(self):
+        # Пул запускается до снижения лимита
+        list(integrate_many([(math.sin, 0, 1)] * 4, n_jobs=2))
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        limit = len(os.listdir('/dev/fd')) + 100
+        tasks = ((lambda x, k=k: x + k, 0, 1, 10) for k in range(2 * limit))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+        try:
+            results = dict(integrate_many(tasks, n_jobs=2))
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        self.assertEqual(len(results), 2 * limit)
+        self.assertAlmostEqual(results[7], 7.5, delta=1e-9)
+
+
+@unittest.skipIf(np is None, "NumPy не установлен")
+class TestIntegrateSamples(unittest.TestCase):
+    def test_log2(self):
+        x, dx = np.linspace(1, 2, 1001, retstep=True)
+        with SharedArray.from_array(np.log2(x)) as shared:
+            result = integrate_samples(shared, dx, n_jobs=2, chunk_size=100)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+
+    def test_cos(self):
+        x, dx = np.linspace(0, math.pi / 2, 1001, retstep=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cos.npy')
+            np.save(path, np.cos(x))
+            result = integrate_samples(path, dx, n_jobs=2)
+        self.assertAlmostEqual(result, 1.0, delta=0.001)
+
+    def test_vector_valued(self):
+        x, dx = np.linspace(0, math.pi, 1001, retstep=True)
+        values = np.stack([np.sin(x), x], axis=1)
+        parallel = integrate_samples(values, dx, n_jobs=2, chunk_size=64)
+        serial = integrate_samples(values, dx, n_jobs=1)
+        self.assertTrue(np.allclose(parallel, serial, rtol=0, atol=1e-12))
+        self.assertAlmostEqual(parallel[1], math.pi ** 2 / 2, delta=1e-9)
+
+
+@unittest.skipIf(np is None, "NumPy не установлен")
+class TestIntegrateFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_log2(self):
+        x, dx = np.linspace(1, 2, 1002, retstep=True)
+        path = os.path.join(self.directory.name, 'log2.f64')
+        with open(path, 'wb') as file:
+            file.write(b'header--')
+            np.log2(x).tofile(file)
+        result = integrate_file(path, dx, offset=8, method='simpson', block=100)
+        self.assertAlmostEqual(result, 2 - 1 / math.log(2), delta=1e-10)
+
+    def test_cos(self):
+        x, dx = np.linspace(0, math.pi / 2, 1001, retstep=True)
+        path = os.path.join(self.directory.name, 'cos.npy')
+        np.save(path, np.cos(x))
+        for method in ('trapezoid', 'simpson'):
+            serial = integrate_file(path, dx, method=method)
+            parallel = integrate_file(path, dx, method=method, n_jobs=2, chunk_size=90, block=16)
+            self.assertAlmostEqual(parallel, serial, delta=1e-12, msg=method)
+            self.assertAlmostEqual(serial, 1.0, delta=1e-6, msg=method)
+
+
+class TestReductions(unittest.TestCase):
+    def test_log2(self):
+        for reduction in REDUCTIONS:
+            result = integrate(math.log2, 1, 2, n_iter=1000, reduction=reduction)
+            self.assertAlmostEqual(result, 0.55730, delta=0.001, msg=reduction)
+
+    def test_cos(self):
+        for backend in (integrate_async, integrate_process, integrate_processes_mp):
+            result = backend(math.cos, 0, math.pi / 2, n_jobs=2, n_iter=1000, reduction='neumaier')
+            self.assertAlmostEqual(result, 1.0, delta=0.001, msg=backend.__name__)
+
+    def test_compensated_is_more_accurate(self):
+        values = [0.1] * 100000
+        exact = math.fsum(values)
+        naive_error = abs(reduce_sum(values) - exact)
+        for reduction in ('kahan', 'neumaier', 'pairwise'):
+            self.assertLess(abs(reduce_sum(values, reduction) - exact), naive_error, msg=reduction)
+        with self.assertRaises(ValueError):
+            reduce_sum(values, 'magic')
+
+    def test_parallel_deterministic(self):
+        for backend in (integrate_async, integrate_process, integrate_processes_mp):
+            results = {backend(math.sin, 0, math.pi, n_jobs=2, n_iter=10000, chunk_size=100,
+                               reduction='fsum')
+                       for _ in range(3)}
+            self.assertEqual(len(results), 1, msg=backend.__name__)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_suite_sweep(self):
+        results = benchmark.run_suite(['serial', 'threads'], ['log2', 'sin'], n_iters=(100,),
+                                      n_jobs_values=(1, 2), repeat=2)
+        self.assertEqual(len(results), 2 + 2 * 2)
+        for case in results:
+            self.assertGreater(case['evals_per_sec'], 0)
+            self.assertGreaterEqual(case['iqr'], 0)
+
+    def test_regression_detection(self):
+        case = benchmark.run_case('serial', 'sin', 100, repeat=2)
+        fast = dict(case, median=case['median'] / 10, iqr=0.0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            benchmark.save_report(benchmark.make_report([fast]), path)
+            baseline = benchmark.load_report(path)
+        self.assertEqual(benchmark.find_regressions([case], baseline), [(case, fast)])
+        self.assertEqual(benchmark.find_regressions([fast], benchmark.make_report([case])), [])
+
+
+class TestIntegrateAuto(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model = autotune.calibrate(n_iters=(100, 1000), repeat=1)
+
+    def test_log2(self):
+        result = autotune.integrate_auto(math.log2, 1, 2, n_iter=1000, model=self.model)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+
+    def test_lambda_avoids_process_backends_when_unshippable(self):
+        result = autotune.integrate_auto(lambda x: math.cos(x), 0, math.pi / 2, n_iter=10000,
+                                         model=self.model)
+        self.assertAlmostEqual(result, 1.0, delta=0.001)
+        lock = threading.Lock()
+        backend, _, _ = autotune.choose_backend(lambda x: x if lock else 0.0, 0, 1, 10 ** 6, self.model)
+        self.assertNotIn(backend, ('processes', 'mp'))
+
+    def test_model_persisted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.json')
+            self.model.save(path)
+            loaded = autotune.CostModel.load(path)
+        self.assertEqual(loaded.entries, self.model.entries)
+        self.assertEqual(loaded.signature, autotune.machine_signature())
+        self.assertEqual(loaded.best('native', 1000), self.model.best('native', 1000))
+
+    def test_default_model_without_calibration(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.json')
+            with mock.patch.object(autotune, '_model', None), \
+                    mock.patch.object(autotune, 'calibrate') as calibrate, \
+                    mock.patch.dict(os.environ, {autotune.CALIBRATE_ENV: ''}):
+                model = autotune.get_cost_model(path)
+            calibrate.assert_not_called()
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(set(model.entries['native']), set(self.model.entries['native']))
+        _, n_jobs, _ = autotune.choose_backend(math.sin, 0, 1, 100, model)
+        self.assertEqual(n_jobs, 1)
+        self.assertAlmostEqual(autotune.integrate_auto(math.sin, 0, math.pi, 1000, model=model), 2.0, delta=1e-5)
+
+    def test_backends_follow_benchmark(self):
+        self.assertEqual(set(autotune.BACKENDS), set(benchmark.BACKENDS))
+        self.assertIs(autotune.BACKENDS['serial'][0], benchmark.BACKENDS['serial'][0])
+
+
+def _exp_sum(*x):
+    return np.exp(-sum(x))
+
+
+@unittest.skipIf(np is None, "NumPy не установлен")
+class TestMultidim(unittest.TestCase):
+    exact = (1 - math.exp(-1)) ** 3
+
+    def test_product(self):
+        for rule in ('midpoint', 'gauss_legendre'):
+            value, error = integrate_product(_exp_sum, [(0, 1)] * 3, 20, rule=rule, n_jobs=2,
+                                             chunk_size=1000)
+            self.assertAlmostEqual(value, self.exact, delta=1e-3, msg=rule)
+            self.assertLess(abs(value - self.exact), max(error, 1e-14), msg=rule)
+
+    def test_scalar_only_function(self):
+        value, _ = integrate_product(lambda x, y: math.log2(x) * math.cos(y), [(1, 2), (0, math.pi / 2)], 50)
+        self.assertAlmostEqual(value, 0.55730, delta=0.001)
+
+    def test_monte_carlo(self):
+        for sequence in ('random', 'halton', 'sobol'):
+            value, error = integrate_monte_carlo(_exp_sum, [(0, 1)] * 3, 20000, sequence=sequence, seed=3)
+            self.assertLess(abs(value - self.exact), 5 * error, msg=sequence)
+
+    def test_parallel_streams_reproducible(self):
+        serial = integrate_monte_carlo(_exp_sum, [(0, 1)] * 5, 10000, seed=7, chunk_size=1000)
+        parallel = integrate_monte_carlo(_exp_sum, [(0, 1)] * 5, 10000, seed=7, chunk_size=1000, n_jobs=2)
+        self.assertEqual(serial, parallel)
+        value, _ = integrate_nd(_exp_sum, [(0, 1)] * 5, 8192, seed=7, n_jobs=2)
+        self.assertAlmostEqual(value, (1 - math.exp(-1)) ** 5, delta=1e-3)
+
+    @unittest.skipIf(cloudpickle is None, "cloudpickle не установлен")
+    def test_lambda_in_processes(self):
+        value, _ = integrate_product(lambda x, y: x * y, [(0, 1), (0, 2)], 16, n_jobs=2)
+        self.assertAlmostEqual(value, 1.0, delta=1e-12)
+        serial = integrate_monte_carlo(lambda x, y: x + y, [(0, 1)] * 2, 4096, seed=1, chunk_size=512)
+        parallel = integrate_monte_carlo(lambda x, y: x + y, [(0, 1)] * 2, 4096, seed=1, chunk_size=512, n_jobs=2)
+        self.assertEqual(serial, parallel)
+
+
+class TestEvaluationCache(unittest.TestCase):
+    def test_log2(self):
+        cache = EvaluationCache()
+        first = integrate(math.log2, 1, 2, n_iter=1000, cache=cache)
+        self.assertAlmostEqual(first, 0.55730, delta=0.001)
+        self.assertEqual(integrate(math.log2, 1, 2, n_iter=1000, cache=cache), first)
+        self.assertEqual(cache.stats()['hits'], 1000)
+
+    def test_refined_grid_evaluates_only_new_nodes(self):
+        cache = EvaluationCache()
+        for method, n_iter, refined in (('midpoint', 100, 300), ('trapezoid', 100, 200), ('simpson', 100, 200)):
+            cache.clear()
+            integrate(math.cos, 0, math.pi / 2, n_iter=n_iter, method=method, cache=cache)
+            result = integrate(math.cos, 0, math.pi / 2, n_iter=refined, method=method, cache=cache)
+            self.assertAlmostEqual(result, 1.0, delta=0.001, msg=method)
+            self.assertEqual(cache.misses, refined + (method != 'midpoint'), msg=method)
+
+    def test_reduction_for_uncached_methods(self):
+        cache = EvaluationCache()
+        result = integrate(math.sin, 0, math.pi, n_iter=1000, method='romberg', reduction='fsum', cache=cache)
+        self.assertEqual(result, integrate(math.sin, 0, math.pi, n_iter=1000, method='romberg', reduction='fsum'))
+        with self.assertRaises(ValueError):
+            integrate(math.sin, 0, math.pi, n_iter=1000, method='romberg', reduction='unknown', cache=cache)
+
+    def test_lru_eviction(self):
+        cache = EvaluationCache(maxsize=3)
+        square = cache.wrap(lambda x: x * x)
+        for x in (1.0, 2.0, 3.0, 1.0, 4.0, 2.0):
+            square(x)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 5, 2))
+        self.assertEqual(len(cache), 3)
+
+    def test_refinement(self):
+        cache = EvaluationCache()
+        value, error, n_iter = integrate_refined(math.sin, 0, math.pi, 1e-8, method='simpson', cache=cache)
+        self.assertAlmostEqual(value, 2.0, delta=1e-8)
+        self.assertEqual(cache.misses, n_iter + 1)
+
+    def test_functions_not_pinned(self):
+        cache = EvaluationCache()
+        f = lambda x: x + 1
+        self.assertEqual(cache.evaluate(f, 1.0), 2.0)
+        ref = weakref.ref(f)
+        del f
+        self.assertIsNone(ref())
+        self.assertEqual(cache._functions, {})
+        # Новые функции могут получить id удаленной, но не ее значения
+        for shift in range(2, 10):
+            self.assertEqual(cache.evaluate(lambda x: x + shift, 1.0), 1.0 + shift)
+        self.assertEqual(cache.hits, 0)
+
+    def test_bound_method_key(self):
+        cache = EvaluationCache()
+        values = [2.0, 3.0]
+        cache.evaluate(values.index, 3.0)
+        self.assertEqual(cache.evaluate(values.index, 3.0), 1)
+        self.assertEqual(cache.hits, 1)
+
+
+class TestIntegrateJit(unittest.TestCase):
+    def test_log2(self):
+        result = integrate_jit('log2(x)', 1, 2, n_iter=1000)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+
+    def test_cos(self):
+        result = integrate_jit(lambda x: math.cos(x), 0, math.pi / 2, n_iter=1000, method='simpson')
+        self.assertAlmostEqual(result, 1.0, delta=0.001)
+
+    def test_lambda_with_closure(self):
+        scale = 3
+        f = compile_integrand(lambda t: scale * (t + 1)
+                              ** 2)
+        self.assertEqual(f.expression, '3 * (t + 1) ** 2')
+        self.assertAlmostEqual(integrate_jit(f, 0, 1, 1000), 7.0, delta=1e-5)
+
+    def test_fallback(self):
+        with self.assertRaises(ValueError):
+            compile_integrand('__import__("os")')
+        result = integrate_jit(lambda x: x if x > 1 else 0.0, 0, 2, n_iter=1000)
+        self.assertAlmostEqual(result, 1.5, delta=0.01)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            # Комплексные значения при x < 0: сверка с f не должна падать с TypeError
+            integrate_jit(lambda x: x ** 0.5, -1, 1, n_iter=100)
+
+    def test_constructor_validates_expression(self):
+        for expression, variable in (('__import__("os").getcwd()', 'x'), ('x', 'x: 0 or x'), ('x; y', 'x')):
+            with self.assertRaises(ValueError, msg=expression):
+                CompiledIntegrand(expression, variable)
+        f = CompiledIntegrand('x**2 + math.sin(x)')
+        self.assertEqual(f.expression, 'x ** 2 + sin(x)')
+        self.assertEqual(pickle.loads(pickle.dumps(f)).expression, f.expression)
+        # Выполняется тот же проверенный текст, что в expression
+        for expression, expected in (('x**2 + math.sin(x)', lambda x: x ** 2 + math.sin(x)),
+                                     ('np.sin(x) + pi', lambda x: math.sin(x) + math.pi)):
+            for backend in ('python', 'numpy'):
+                f = CompiledIntegrand(expression, backend=backend)
+                self.assertAlmostEqual(f(0.5), expected(0.5), places=12, msg=expression)
+                self.assertAlmostEqual(f.grid_sum(None, 0.0, 0.25, 4), sum(expected(0.25 * i) for i in range(4)),
+                                       places=12, msg=expression)
+
+    def test_process_backend(self):
+        result = integrate_process(compile_integrand('x**3 + sin(x)'), 0, 1, n_jobs=2, n_iter=1000)
+        self.assertAlmostEqual(result, 0.25 + 1 - math.cos(1), delta=1e-6)
+
+
+def _slow_sin(x):
+    time.sleep(0.001)
+    return math.sin(x)
+
+
+class TestIntegrationJob(unittest.TestCase):
+    def test_log2(self):
+        updates = []
+        with IntegrationJob(math.log2, 1, 2, n_iter=1000, backend='thread', chunk_size=100,
+                            on_progress=lambda completed, total: updates.append((completed, total))) as job:
+            self.assertAlmostEqual(job.result(), 0.55730, delta=0.001)
+        self.assertEqual(updates, [(i, 10) for i in range(1, 11)])
+        self.assertEqual(job.progress, 1.0)
+
+    def test_cos(self):
+        job = IntegrationJob(math.cos, 0, math.pi / 2, n_iter=1000, backend='process')
+        expected = integrate_async(math.cos, 0, math.pi / 2, n_iter=1000, n_jobs=2, mode='thread')
+        self.assertEqual(job.result(), expected)
+        self.assertTrue(job.done())
+
+    def test_deadline(self):
+        start = time.perf_counter()
+        job = IntegrationJob(_slow_sin, 0, math.pi, n_iter=10000, backend='thread', chunk_size=50, timeout=0.2)
+        with self.assertRaises(TimeoutError):
+            job.result()
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertLess(job.completed, job.total)
+        self.assertTrue(job._executor._shutdown)
+
+    def test_cancel(self):
+        job = IntegrationJob(_slow_sin, 0, math.pi, n_iter=10000, backend='process', chunk_size=50)
+        with self.assertRaises(TimeoutError):
+            job.result(timeout=0.1)
+        self.assertTrue(job.cancel())
+        with self.assertRaises(concurrent.futures.CancelledError):
+            job.result(timeout=2)
+        self.assertFalse(job.cancel())
+
+    def test_backend_timeouts(self):
+        for backend in (integrate_async, integrate_process, integrate_processes_mp):
+            with self.assertRaises(TimeoutError):
+                backend(_slow_sin, 0, math.pi, n_iter=1000, n_jobs=2, chunk_size=50, timeout=0.1)
+        self.assertAlmostEqual(integrate_process(math.sin, 0, math.pi, timeout=10), 2.0, delta=0.001)
+
+
+_registered_cube = register_integrand('test_cube', lambda x: x ** 3)
+
+
+@unittest.skipIf(cloudpickle is None, "cloudpickle не установлен")
+class TestSerialization(unittest.TestCase):
+    def test_log2(self):
+        result = integrate_process(lambda x: math.log2(x), 1, 2, n_iter=1000, n_jobs=2)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+
+    def test_cos(self):
+        scale = 2.0
+        result = integrate_processes_mp(lambda x: scale * math.cos(x), 0, math.pi / 2, n_iter=1000, n_jobs=2)
+        self.assertAlmostEqual(result, 2.0, delta=0.001)
+        results = dict(integrate_many([(lambda x: scale * x, 0, 1)] * 4, backend='process', n_iter=100))
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        job = IntegrationJob(lambda x: scale, 0, 1, n_iter=100, backend='process')
+        self.assertAlmostEqual(job.result(), 2.0)
+
+    def test_registry(self):
+        self.assertEqual(pickle.loads(pickle.dumps(NamedIntegrand('test_cube'))), _registered_cube)
+        self.assertAlmostEqual(integrate_process(_registered_cube, 0, 1, n_iter=1000), 0.25, delta=0.001)
+
+    def test_shipped_once(self):
+        coefficients = list(range(100000))
+        f = lambda x: coefficients[1] * x
+        with ShippedFunction(f) as function:
+            chunk = pickle.dumps((function, 0.0, 1.0, 1000))
+            self.assertLess(len(chunk), 300)
+            self.assertGreater(len(cloudpickle.dumps(f)), 100000)
+            first, second = pickle.loads(chunk)[0], pickle.loads(chunk)[0]
+        self.assertIs(first, second)
+        self.assertEqual(first(3.0), 3.0)
+
+    def test_unshippable(self):
+        lock = threading.Lock()
+        f = lambda x: x if lock else 0.0
+        self.assertFalse(can_ship(f))
+        with self.assertRaises(TypeError):
+            integrate_process(f, 0, 1)
+        self.assertTrue(can_ship(math.sin))
+
+
+class TestStreaming(unittest.TestCase):
+    def test_log2(self):
+        value, error, n_iter = integrate_streaming(math.log2, 1, 2, 1e-8)
+        self.assertAlmostEqual(value, 2 - 1 / math.log(2), delta=1e-8)
+        self.assertLessEqual(error, 1e-8)
+
+    def test_cos(self):
+        expected = integrate(math.cos, 0, math.pi / 2, n_iter=1000)
+        h = math.pi / 2 / 1000
+        for options in ({}, {'vectorized': True}, {'n_jobs': 2}, {'n_jobs': 2, 'backend': 'process'}):
+            sums = evaluate(batched(midpoint_grid(0, math.pi / 2, 1000), 64), math.cos, **options)
+            count, total = reduce_batches(sums)
+            self.assertEqual(count, 1000)
+            self.assertAlmostEqual(total * h, expected, delta=1e-12)
+
+    def test_refinement_reuses_points(self):
+        calls = []
+
+        def f(x):
+            calls.append(x)
+            return x * x
+
+        estimates = midpoint_estimates(f, 0, 1, 10)
+        for _, estimate in zip(range(3), estimates):
+            pass
+        self.assertEqual(len(calls), 90)
+        self.assertEqual(len(set(calls)), 90)
+        self.assertAlmostEqual(estimate.value, 1 / 3, delta=1e-4)
+
+    def test_early_termination(self):
+        start = time.perf_counter()
+        sums = evaluate(batched(midpoint_grid(0, 1, 10 ** 12), 1000), math.sin, n_jobs=2)
+        first = [next(sums) for _ in range(3)]
+        sums.close()
+        self.assertEqual([count for count, _ in first], [1000] * 3)
+        self.assertLess(time.perf_counter() - start, 1)
+
+
+class TestProfiling(unittest.TestCase):
+    def test_log2(self):
+        with Profile() as profile:
+            result = integrate(profile.wrap(math.log2), 1, 2, n_iter=1000)
+        self.assertAlmostEqual(result, 0.55730, delta=0.001)
+        report = profile.report()
+        self.assertEqual(report['evaluations'], 1000)
+        self.assertEqual(len(report['workers']), 1)
+        self.assertLessEqual(report['f_time'], report['wall'])
+        self.assertFalse(os.path.exists(profile.directory))
+
+    def test_cos(self):
+        result, report = profile_backend('processes', math.cos, 0, math.pi / 2, n_iter=1000, n_jobs=2)
+        self.assertAlmostEqual(result, 1.0, delta=0.001)
+        # Процесс пула может не успеть записать вычисления после последнего замера
+        self.assertLessEqual(report['evaluations'], 1000)
+        self.assertGreater(report['evaluations'], 1000 - SAMPLE_EVERY * len(report['workers']))
+        self.assertGreater(report['shipments'], 0)
+        self.assertGreater(report['serialized_bytes'], 0)
+        self.assertNotIn(os.getpid(), [worker['pid'] for worker in report['workers']])
+
+    def test_backends(self):
+        for backend in ('threads', 'mp', 'vectorized'):
+            result, report = profile_backend(backend, math.sin, 0, math.pi, n_iter=1000, n_jobs=2)
+            self.assertAlmostEqual(result, 2.0, delta=0.001)
+            self.assertGreater(report['evaluations'], 1000 - SAMPLE_EVERY * len(report['workers']))
+            for worker in report['workers']:
+                self.assertGreaterEqual(worker['idle'], 0.0)
+                self.assertLessEqual(worker['f_time'], worker['busy'])
+                self.assertLessEqual(worker['busy'], report['wall'])
+
+    def test_idle_from_gaps(self):
+        with Profile() as profile:
+            f = profile.wrap(math.sin)
+            integrate(f, 0, math.pi, n_iter=2000)
+            time.sleep(0.05)
+            integrate(f, 0, math.pi, n_iter=2000)
+        report = profile.report()
+        self.assertEqual(report['evaluations'], 4000)
+        self.assertGreaterEqual(report['idle'], 0.04)
+        self.assertLessEqual(report['f_time'], report['workers'][0]['busy'])
+
+    @unittest.skipIf(cloudpickle is None, "cloudpickle не установлен")
+    def test_lambda_in_processes(self):
+        scale = 3.0
+        with Profile(sample_every=1) as profile:
+            result = integrate_process(profile.wrap(lambda x: scale * x), 0, 1, n_iter=1000)
+        self.assertAlmostEqual(result, 1.5, delta=1e-9)
+        self.assertEqual(profile.report()['evaluations'], 1000)
+
+
 def run_all_tests():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(TestIntegrateFirst))
     suite.addTest(unittest.makeSuite(TestIntegrateAsync))
+    suite.addTest(unittest.makeSuite(TestAsyncMode))
     suite.addTest(unittest.makeSuite(TestIntegrateProcess))
     suite.addTest(unittest.makeSuite(TestIntegrateCython))
+    suite.addTest(unittest.makeSuite(TestIntegrateCythonParallel))
     suite.addTest(unittest.makeSuite(TestIntegrateNoGIL))
+    suite.addTest(unittest.makeSuite(TestIntegrateVectorized))
+    suite.addTest(unittest.makeSuite(TestIntegrateAdaptive))
+    suite.addTest(unittest.makeSuite(TestIntegrateMethods))
+    suite.addTest(unittest.makeSuite(TestWorkerPool))
+    suite.addTest(unittest.makeSuite(TestSplitWork))
+    suite.addTest(unittest.makeSuite(TestIntegrateMany))
+    suite.addTest(unittest.makeSuite(TestReductions))
+    suite.addTest(unittest.makeSuite(TestBenchmark))
+    suite.addTest(unittest.makeSuite(TestIntegrateAuto))
+    suite.addTest(unittest.makeSuite(TestMultidim))
+    suite.addTest(unittest.makeSuite(TestEvaluationCache))
+    suite.addTest(unittest.makeSuite(TestIntegrateJit))
+    suite.addTest(unittest.makeSuite(TestIntegrateSamples))
+    suite.addTest(unittest.makeSuite(TestIntegrateFile))
+    suite.addTest(unittest.makeSuite(TestIntegrationJob))
+    suite.addTest(unittest.makeSuite(TestSerialization))
+    suite.addTest(unittest.makeSuite(TestStreaming))
+    suite.addTest(unittest.makeSuite(TestProfiling))
 
     runner = unittest.TextTestRunner(verbosity=2)
     runner.run(suite)